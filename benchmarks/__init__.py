@@ -0,0 +1,5 @@
+"""
+基准测试模块
+
+使用本地模拟服务器运行真实下载器，测量吞吐量、延迟、内存与写库耗时
+"""
@@ -0,0 +1,281 @@
+"""
+本地模拟服务器：模拟 Wallhaven 搜索接口、Reddit 列表/帖子接口以及图片 CDN
+
+基准测试用它代替真实网站，避免访问外网和触发限流。
+所有路径都带有一个运行标识前缀（/<run>/...），不同测试场景互不干扰：
+
+    /<run>/api/v1/search?page=N                Wallhaven 搜索结果（每页 24 张）
+    /<run>/r/<sub>/.json?limit=N&after=t3_x    Reddit 子版块列表（带 Desktop flair）
+    /<run>/r/<sub>/comments/<id>/<slug>/.json  Reddit 帖子 JSON
+    /<run>/api/info.json?id=t3_a,t3_b          Reddit 批量获取帖子
+    /<run>/img/<name>.jpg                      合成的 JPEG 图片（大小与延迟可配置，支持 Range / If-Range）
+    /<run>/a/<id>                              Imgur 相册页面
+    /<run>/3/album/<id>/images                 Imgur 相册 JSON 接口
+    /<run>/flaky/<n>/<name>                    前 n 次请求返回 503
+
+单独运行: python -m benchmarks.mock_server --port 8000 --image-size 512 --latency 20
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WALLHAVEN_PAGE_SIZE = 24
+SEND_CHUNK_SIZE = 64 * 1024
+
+
+def synthetic_jpeg(name, size, width=1920, height=1080, filler=b''):
+    """生成一张结构合法的 JPEG（SOI + APP0 + COM + SOF0 + 填充数据 + EOI）
+
+    COM 段写入图片名，保证每张图片的内容（以及 MD5）都不相同；
+    填充数据使用共享的随机字节，生成大图时不需要每次重新分配。
+    """
+    comment = name.encode('utf-8')[:60000]
+    header = (
+        b'\xff\xd8'
+        + b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+        + b'\xff\xfe' + struct.pack('>H', len(comment) + 2) + comment
+        + b'\xff\xc0' + struct.pack('>HBHHB', 17, 8, height, width, 3)
+        + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+    )
+    body_size = max(0, size - len(header) - 2)
+    if len(filler) < body_size:
+        filler = os.urandom(body_size)
+    return header + filler[:body_size] + b'\xff\xd9'
+
+
+class MockServer:
+    """在后台线程中运行的模拟服务器
+
+    Args:
+        image_size: 每张图片的字节数
+        latency: 图片请求的首字节延迟（秒），模拟 CDN 往返时间
+        total_posts: 模拟的 Reddit 帖子总数（列表分页到此为止）
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, image_size=512 * 1024, latency=0.0, total_posts=10000):
+        self.image_size = image_size
+        self.latency = latency
+        self.total_posts = total_posts
+        self.image_version = 1  # 图片版本：修改后所有图片的内容与 ETag 都会变化（模拟源文件被替换）
+        self._filler = os.urandom(image_size)
+        self._arrivals = {}
+        self._hits = {}  # 路径 -> 请求次数（flaky 路由使用）
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='MockServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def arrivals(self, prefix=''):
+        """返回图片请求的到达时间 {路径: time.time()}（同一路径只记录第一次）"""
+        with self._lock:
+            return {path: t for path, t in self._arrivals.items() if path.startswith(prefix)}
+
+    def _record_arrival(self, path):
+        with self._lock:
+            self._arrivals.setdefault(path, time.time())
+
+    def hit(self, path):
+        """记录一次请求并返回该路径的累计请求次数"""
+        with self._lock:
+            self._hits[path] = self._hits.get(path, 0) + 1
+            return self._hits[path]
+
+    # ---- 响应内容 ----
+
+    def image_body(self, name):
+        """图片 <name>.jpg 当前版本的内容"""
+        label = name if self.image_version == 1 else f"{name}@v{self.image_version}"
+        return synthetic_jpeg(label, self.image_size, filler=self._filler)
+
+    def image_etag(self, name):
+        return f'"{name}-v{self.image_version}"'
+
+    def wallhaven_page(self, run, page):
+        items = []
+        for i in range(WALLHAVEN_PAGE_SIZE):
+            wallhaven_id = f"{run}p{page}i{i}"
+            items.append({
+                'id': wallhaven_id,
+                'url': f"https://wallhaven.cc/w/{wallhaven_id}",
+                'short_url': f"https://whvn.cc/{wallhaven_id}",
+                'path': f"{self.base_url}/{run}/img/wallhaven-{wallhaven_id}.jpg",
+                'resolution': '1920x1080',
+                'file_size': self.image_size,
+                'file_type': 'image/jpeg',
+            })
+        return {'data': items, 'meta': {'current_page': page, 'last_page': 1000, 'per_page': WALLHAVEN_PAGE_SIZE}}
+
+    def reddit_post(self, run, subreddit, index):
+        post_id = f"{run}x{index}"
+        return {
+            'id': post_id,
+            'name': f"t3_{post_id}",
+            'title': f"Benchmark wallpaper {index} [1920x1080]",
+            'permalink': f"/r/{subreddit}/comments/{post_id}/bench/",
+            'link_flair_text': 'Desktop',
+            'post_hint': 'image',
+            'url': f"{self.base_url}/{run}/img/reddit-{post_id}.jpg",
+        }
+
+    def reddit_listing(self, run, subreddit, limit, after):
+        start = int(after.rsplit('x', 1)[1]) + 1 if after and 'x' in after else 0
+        end = min(start + limit, self.total_posts)
+        children = [{'kind': 't3', 'data': self.reddit_post(run, subreddit, i)} for i in range(start, end)]
+        next_after = f"t3_{run}x{end - 1}" if end < self.total_posts and children else None
+        return {'kind': 'Listing', 'data': {'children': children, 'after': next_after}}
+
+    def imgur_album(self, album, count=3):
+        """Imgur 相册的图片列表（与 /3/album/<id>/images 的 data 字段一致）"""
+        return [{'id': f"{album[:3]}{i:04d}", 'link': f"https://i.imgur.com/{album[:3]}{i:04d}.jpg",
+                 'width': 1920 + i, 'height': 1080, 'animated': False} for i in range(count)]
+
+    def imgur_album_page(self, album):
+        """Imgur 相册页面：og:image、缩略图与页面数据中的图片直链，后面是大段无关内容"""
+        images = self.imgur_album(album)
+        head = (f'<html><head><meta property="og:image" content="{images[0]["link"]}?fb">'
+                f'<link rel="preload" href="https://i.imgur.com/{images[0]["id"]}h.jpg"></head><body>'
+                f'<script>window.postDataJSON={json.dumps(json.dumps({"media": images}))}</script>')
+        return (head + '<div>padding</div>' * 100000 + '</body></html>').encode('utf-8')
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive，与真实 CDN 一致
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端读到需要的部分后提前关闭连接
+
+            def _send(self, status, body, content_type, extra_headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                for key, value in (extra_headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                view = memoryview(body)
+                try:
+                    for offset in range(0, len(body), SEND_CHUNK_SIZE):
+                        self.wfile.write(view[offset:offset + SEND_CHUNK_SIZE])
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # 客户端读到需要的部分后提前关闭（如只扫描页面开头）
+
+            def _send_json(self, data):
+                self._send(200, json.dumps(data).encode('utf-8'), 'application/json; charset=utf-8')
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                segments = parts.path.strip('/').split('/')
+                run, route = segments[0], segments[1:]
+
+                try:
+                    if route[:1] == ['img'] and len(route) == 2:
+                        server._record_arrival(parts.path)
+                        if server.latency:
+                            time.sleep(server.latency)
+                        name = route[1].rsplit('.', 1)[0]
+                        body, etag = server.image_body(name), server.image_etag(name)
+                        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+                        if_range = self.headers.get('If-Range')
+                        if match and if_range is not None and if_range != etag:
+                            match = None  # 文件已变化：忽略 Range，返回完整内容
+                        if match and int(match.group(1)) >= len(body):
+                            self._send(416, b'', 'text/plain', {'Content-Range': f'bytes */{len(body)}'})
+                        elif match:
+                            # 支持 Range（分辨率探测只读取文件开头）
+                            start = int(match.group(1))
+                            end = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+                            self._send(206, body[start:end + 1], 'image/jpeg',
+                                       {'Content-Range': f'bytes {start}-{end}/{len(body)}', 'ETag': etag})
+                        else:
+                            self._send(200, body, 'image/jpeg', {'ETag': etag})
+                    elif route[:1] == ['flaky'] and len(route) == 3:
+                        # /flaky/<失败次数>/<名称>：前若干次请求返回 503，之后返回 200
+                        if server.hit(parts.path) <= int(route[1]):
+                            self._send(503, b'service unavailable', 'text/plain')
+                        else:
+                            self._send(200, b'ok', 'text/plain')
+                    elif route[:3] == ['api', 'v1', 'search']:
+                        page = int(query.get('page', ['1'])[0])
+                        self._send_json(server.wallhaven_page(run, page))
+                    elif route[:1] == ['r'] and len(route) == 3 and route[2] == '.json':
+                        limit = min(int(query.get('limit', ['25'])[0]), 100)
+                        after = query.get('after', [None])[0]
+                        self._send_json(server.reddit_listing(run, route[1], limit, after))
+                    elif route == ['api', 'info.json']:
+                        # 批量获取帖子：id=t3_<run>x<index>,t3_...
+                        ids = [name for name in query.get('id', [''])[0].split(',') if name]
+                        posts = [server.reddit_post(run, 'Animewallpaper', int(name.rsplit('x', 1)[1])) for name in ids]
+                        self._send_json({'kind': 'Listing', 'data': {
+                            'children': [{'kind': 't3', 'data': post} for post in posts], 'after': None}})
+                    elif route[:1] == ['a'] and len(route) == 2:
+                        self._send(200, server.imgur_album_page(route[1]), 'text/html; charset=utf-8')
+                    elif route[:2] == ['3', 'album'] and len(route) == 4 and route[3] == 'images':
+                        self._send_json({'data': server.imgur_album(route[2]), 'success': True, 'status': 200})
+                    elif route[:1] == ['r'] and len(route) >= 4 and route[2] == 'comments':
+                        index = int(route[3].rsplit('x', 1)[1])
+                        post = server.reddit_post(run, route[1], index)
+                        self._send_json([{'kind': 'Listing', 'data': {'children': [{'kind': 't3', 'data': post}]}}])
+                    else:
+                        self._send(404, b'not found', 'text/plain')
+                except (ValueError, IndexError):
+                    self._send(400, b'bad request', 'text/plain')
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 Wallhaven / Reddit 服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--image-size', type=int, default=512, help='图片大小（KB）')
+    parser.add_argument('--latency', type=float, default=0, help='图片首字节延迟（毫秒）')
+    args = parser.parse_args()
+
+    server = MockServer(args.host, args.port, args.image_size * 1024, args.latency / 1000)
+    print(f"🧪 模拟服务器已启动: {server.base_url}（Ctrl+C 退出）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+下载器基准测试：用本地模拟服务器运行真实的 Wallhaven / Reddit 下载器
+
+每个场景（来源 × 引擎 × 并发数）在独立的子进程和临时目录中运行，互不影响，
+统计吞吐量（张/秒、MB/秒）、单张图片延迟 p50/p99、峰值内存（RSS）与写库耗时。
+
+单张图片延迟 = 模拟服务器收到图片请求 → 文件提交并交给写库线程（_finalize_download 返回）。
+
+用法:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sources wallhaven --engines thread async --workers 5 16 32
+    python benchmarks/run_benchmarks.py --images 300 --image-size 1024 --latency 50 --json result.json
+    python benchmarks/run_benchmarks.py --engines thread --workers 32 --adaptive  # 自适应并发，32 为上限
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import MockServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def percentile(values, fraction):
+    """最近秩法求百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# ---- 子进程：运行单个场景 ----
+
+def _configure(spec):
+    """在导入下载器之前改写配置：临时目录、模拟服务器地址、关闭响应缓存"""
+    from config import CATALOG_CONFIG, HTTP_CONFIG, REDDIT_CONFIG, WALLHAVEN_CONFIG
+
+    workdir = spec['workdir']
+    workers = spec['workers']
+    run_base = f"{spec['base_url']}/{spec['run']}"
+
+    HTTP_CONFIG['cache'] = dict(HTTP_CONFIG.get('cache') or {}, enabled=False)
+    # 固定并发时每个主机正好使用 workers 个名额；自适应时 workers 为上限
+    concurrency = dict(HTTP_CONFIG.get('concurrency') or {}, adaptive=spec['adaptive'])
+    concurrency['default_host_limit'] = max(concurrency.get('default_host_limit', 16), workers)
+    HTTP_CONFIG['concurrency'] = concurrency
+    CATALOG_CONFIG['db_path'] = os.path.join(workdir, 'catalog.db')
+
+    common = {
+        'save_dir': os.path.join(workdir, 'images'),
+        'db_path': os.path.join(workdir, f"{spec['source']}.db"),
+        'max_images': spec['images'],
+        'max_workers': workers,
+        'async_max_concurrency': workers,
+        'async_per_host_limit': workers,
+    }
+    if spec['source'] == 'wallhaven':
+        WALLHAVEN_CONFIG.update(common)
+        WALLHAVEN_CONFIG.update({
+            'api_url': f"{run_base}/api/v1/search",
+            'api_key': None,
+            'default_pages': 1,
+            'max_pages': spec['images'] // 24 + 2,
+            'sleep_time': 0,
+            'download_queue_size': max(WALLHAVEN_CONFIG.get('download_queue_size', 24), workers),
+        })
+    else:
+        REDDIT_CONFIG.update(common)
+        REDDIT_CONFIG.update({'api_base': run_base, 'max_posts': spec['images'], 'after': None})
+        # 列表解析只接受 i.redd.it / i.imgur.com 的直链，基准测试中加入模拟服务器的地址
+        import src.utils
+        host = re.escape(spec['base_url'].split('://', 1)[1])
+        src.utils.DIRECT_IMAGE_PATTERN = re.compile(
+            rf'https?://(i\.redd\.it|i\.imgur\.com|{host})/.+\.(jpg|jpeg|png|webp)', re.IGNORECASE)
+
+
+def run_scenario(spec):
+    """子进程入口：运行一次下载并把原始测量数据写入 spec['result_path']"""
+    os.chdir(spec['workdir'])  # 下载器的日志目录等相对路径落在临时目录中
+    # 先配置根日志，下载器内部的 basicConfig 不再生效，避免日志输出影响测量
+    logging.basicConfig(level=logging.WARNING, format='%(name)s - %(levelname)s - %(message)s')
+    _configure(spec)
+
+    from src.db_writer import BatchedDBWriter
+    if spec['source'] == 'wallhaven':
+        from src.WallhavenImageDownloader import WallhavenImageDownloader as Downloader
+    else:
+        from src.RedditImageDownloader import RedditImageDownloader as Downloader
+
+    db_stats = {'seconds': 0.0, 'flushes': 0}
+    original_flush = BatchedDBWriter._flush
+
+    def timed_flush(writer, batch):
+        start = time.perf_counter()
+        try:
+            return original_flush(writer, batch)
+        finally:
+            db_stats['seconds'] += time.perf_counter() - start
+            db_stats['flushes'] += 1
+
+    BatchedDBWriter._flush = timed_flush
+
+    downloader = Downloader()
+    finished = {}
+    original_finalize = downloader._finalize_download
+
+    def timed_finalize(*args, **kwargs):
+        result = original_finalize(*args, **kwargs)
+        if result:
+            url = kwargs['url'] if 'url' in kwargs else args[2]
+            finished[url] = time.time()
+        return result
+
+    downloader._finalize_download = timed_finalize
+
+    start = time.perf_counter()
+    downloader.run(use_async=spec['engine'] == 'async')
+    elapsed = time.perf_counter() - start
+    host = spec['base_url'].split('://', 1)[1].rsplit(':', 1)[0]
+    final_limit = None
+    if spec['engine'] == 'thread' and host in downloader.concurrency.limits():
+        final_limit = min(downloader.concurrency.limits()[host], spec['workers'])
+
+    save_dir = downloader.save_dir
+    total_bytes = sum(entry.stat().st_size for entry in os.scandir(save_dir)
+                      if entry.is_file() and not entry.name.startswith('.') and not entry.name.endswith('.part'))
+
+    with open(spec['result_path'], 'w', encoding='utf-8') as f:
+        json.dump({
+            'elapsed': elapsed,
+            'finished': finished,
+            'bytes': total_bytes,
+            'db_seconds': db_stats['seconds'],
+            'db_flushes': db_stats['flushes'],
+            'peak_rss_mb': peak_rss_mb(),
+            'final_limit': final_limit,
+        }, f)
+
+
+# ---- 父进程：启动模拟服务器并依次运行各场景 ----
+
+def run_benchmark(server, source, engine, workers, images, run_id, timeout, adaptive=False):
+    """在子进程中运行一个场景，返回汇总结果"""
+    with tempfile.TemporaryDirectory(prefix='wallhub_bench_') as workdir:
+        spec = {
+            'run': run_id,
+            'base_url': server.base_url,
+            'source': source,
+            'engine': engine,
+            'workers': workers,
+            'images': images,
+            'adaptive': adaptive,
+            'workdir': workdir,
+            'result_path': os.path.join(workdir, 'result.json'),
+        }
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--scenario', json.dumps(spec)],
+            capture_output=True, text=True, timeout=timeout
+        )
+        if process.returncode != 0 or not os.path.exists(spec['result_path']):
+            raise RuntimeError(f"场景运行失败（退出码 {process.returncode}）:\n{process.stderr[-2000:]}")
+        with open(spec['result_path'], encoding='utf-8') as f:
+            raw = json.load(f)
+
+    arrivals = server.arrivals(f"/{run_id}/")
+    latencies = []
+    for url, finished_at in raw['finished'].items():
+        arrived_at = arrivals.get('/' + url.split('/', 3)[3])
+        if arrived_at is not None:
+            latencies.append(finished_at - arrived_at)
+
+    downloaded = len(raw['finished'])
+    elapsed = raw['elapsed']
+    return {
+        'source': source,
+        'engine': engine,
+        'workers': workers,
+        'images': downloaded,
+        'elapsed_s': round(elapsed, 3),
+        'images_per_s': round(downloaded / elapsed, 2) if elapsed else None,
+        'mb_per_s': round(raw['bytes'] / elapsed / (1024 * 1024), 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'peak_rss_mb': round(raw['peak_rss_mb'], 1) if raw['peak_rss_mb'] is not None else None,
+        'db_ms': round(raw['db_seconds'] * 1000, 1),
+        'db_flushes': raw['db_flushes'],
+        'final_limit': raw['final_limit'],
+    }
+
+
+def print_table(results):
+    columns = ['source', 'engine', 'workers', 'images', 'elapsed_s', 'images_per_s', 'mb_per_s',
+               'p50_ms', 'p99_ms', 'peak_rss_mb', 'db_ms', 'db_flushes', 'final_limit']
+    rows = [[('-' if row[c] is None else str(row[c])) for c in columns] for row in results]
+    widths = [max(len(c), *(len(r[i]) for r in rows)) if rows else len(c) for i, c in enumerate(columns)]
+    print('  '.join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WallHub 下载器基准测试（本地模拟服务器）')
+    parser.add_argument('--sources', nargs='+', choices=['wallhaven', 'reddit'], default=['wallhaven', 'reddit'])
+    parser.add_argument('--engines', nargs='+', choices=['thread', 'async'], default=['thread', 'async'])
+    parser.add_argument('--workers', nargs='+', type=int, default=[5, 16], help='线程数 / 异步并发数')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='线程池使用自适应并发（--workers 为上限），默认固定为 --workers 个并发')
+    parser.add_argument('--images', type=int, default=100, help='每个场景下载的图片数')
+    parser.add_argument('--image-size', type=int, default=512, help='图片大小（KB）')
+    parser.add_argument('--latency', type=float, default=20, help='图片首字节延迟（毫秒）')
+    parser.add_argument('--timeout', type=float, default=600, help='单个场景的超时时间（秒）')
+    parser.add_argument('--json', dest='json_path', help='将结果另存为 JSON 文件')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)  # 子进程内部使用
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(json.loads(args.scenario))
+        return
+
+    results = []
+    with MockServer(image_size=args.image_size * 1024, latency=args.latency / 1000) as server:
+        print(f"🧪 模拟服务器: {server.base_url}，图片 {args.image_size}KB，延迟 {args.latency:g}ms，"
+              f"每个场景 {args.images} 张")
+        scenarios = itertools.product(args.sources, args.engines, args.workers)
+        for number, (source, engine, workers) in enumerate(scenarios, 1):
+            print(f"▶️ {source} / {engine} / {workers} 并发 ...", flush=True)
+            try:
+                results.append(run_benchmark(server, source, engine, workers, args.images, f"b{number}",
+                                             args.timeout, args.adaptive))
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                print(f"❌ {source} / {engine} / {workers}: {e}")
+
+    print()
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存到 {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,5 +6,10 @@
 
 from .wallhaven_config import WALLHAVEN_CONFIG
 from .reddit_config import REDDIT_CONFIG
+from .http_config import HTTP_CONFIG
+from .catalog_config import CATALOG_CONFIG
+from .metrics_config import METRICS_CONFIG
+from .logging_config import LOGGING_CONFIG
+from .cpu_config import CPU_CONFIG
 
-__all__ = ['WALLHAVEN_CONFIG', 'REDDIT_CONFIG']
+__all__ = ['WALLHAVEN_CONFIG', 'REDDIT_CONFIG', 'HTTP_CONFIG', 'CATALOG_CONFIG', 'METRICS_CONFIG', 'LOGGING_CONFIG', 'CPU_CONFIG']
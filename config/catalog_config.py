@@ -0,0 +1,9 @@
+"""
+统一图片目录配置（汇总所有下载源的记录）
+"""
+
+# 统一目录配置
+CATALOG_CONFIG = {
+    'enabled': True,  # 下载时同步写入目录，并按哈希跨来源判断图片是否已存在
+    'db_path': 'catalog.db',  # 统一目录数据库，可用 python main.py catalog-migrate 从各来源数据库导入
+}
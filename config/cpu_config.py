@@ -0,0 +1,14 @@
+"""
+CPU 阶段配置（下载后的 MD5 与完整性校验）
+"""
+
+# CPU 阶段配置
+CPU_CONFIG = {
+    # True 时下载线程只写文件，MD5 与文件头校验在独立的进程池中按文件路径执行；
+    # False 时在下载线程中边写边计算 MD5
+    'enabled': True,
+    'workers': None,  # 进程数，None 表示 CPU 核数
+    # 按文件尾的结束标记（JPEG EOI / PNG IEND / GIF trailer）判断图片是否被截断；
+    # 结束标记之后附加了较多数据的有效图片也会被拒绝，因此默认关闭
+    'check_truncation': False,
+}
@@ -0,0 +1,57 @@
+"""
+HTTP 连接池与重试配置（所有下载器共用）
+"""
+
+# HTTP 配置
+HTTP_CONFIG = {
+    # 连接池
+    'pool_connections': 10,  # 缓存的主机连接池数量（reddit.com / i.redd.it / wallhaven.cc / w.wallhaven.cc ...）
+    'pool_maxsize': 16,  # 每个主机的最大保持连接数；实际取该值与各下载器 max_workers 中的较大值
+
+    # 重试与退避（仅针对连接错误与 502/503/504）
+    'retries': 3,  # 最大重试次数
+    'backoff_factor': 0.5,  # 退避系数：第 n 次重试前等待 backoff_factor * 2^(n-1) 秒
+    'status_forcelist': [502, 503, 504],  # 需要自动重试的状态码
+
+    # 按主机的令牌桶限流（所有线程与下载源共享）
+    # rate: 每秒请求数，burst: 最多可连续发出的请求数；未列出的主机不主动限流，
+    # 但仍会遵守服务端返回的 Retry-After / X-RateLimit-* 响应头
+    'rate_limits': {
+        'wallhaven.cc': {'rate': 45 / 60, 'burst': 5},  # Wallhaven API: 45 次/分钟
+        'www.reddit.com': {'rate': 1.0, 'burst': 10},
+    },
+
+    # 自适应并发（AIMD，按主机）：吞吐量提升且延迟稳定时逐步增加同时下载数，
+    # 遇到 429 / 5xx / 超时减半；上限为各主机的 host_limits 与下载器线程池大小（max_workers）中的较小值
+    'concurrency': {
+        'adaptive': True,  # False 时每个主机固定使用 min(host_limits, max_workers)
+        'initial': 4,  # 每个主机的初始并发数
+        'min': 1,
+        'host_limits': {  # 单个主机的并发上限
+            'w.wallhaven.cc': 16,
+            'i.redd.it': 16,
+            'i.imgur.com': 8,
+            'www.reddit.com': 4,
+        },
+        'default_host_limit': 16,
+        'increase_step': 1,  # 加性增步长
+        'decrease_factor': 0.5,  # 乘性减系数
+        'latency_tolerance': 2.0,  # 平均延迟超过历史最低值的该倍数时视为排队，减少并发
+        # 多个下载源同时运行（main.py all / db-all）时所有下载源共享的总并发数，按下载源公平分配
+        'global_budget': 32,
+    },
+
+    # 磁盘 HTTP 响应缓存（列表页 / 帖子 JSON 等 API 响应）
+    # 未过期的响应直接复用；过期后发送 If-None-Match / If-Modified-Since 条件请求，304 时继续复用
+    'cache': {
+        'enabled': True,
+        'db_path': 'http_cache.db',
+        'max_bytes': 64 * 1024 * 1024,  # 总大小上限，超出后按最近访问时间（LRU）淘汰
+        'ttl': {  # 各类接口的有效期（秒），0 表示不缓存
+            'wallhaven_search': 30 * 60,  # 搜索 / 排行榜分页
+            'reddit_listing': 5 * 60,  # 子版块列表，新帖更新较快
+            'reddit_post': 30 * 24 * 3600,  # 帖子 JSON（/api/info.json），基本不会变化
+            'imgur_album': 7 * 24 * 3600,  # Imgur 相册图片列表
+        },
+    },
+}
@@ -0,0 +1,16 @@
+"""
+日志配置（所有下载器共用）
+"""
+
+# 日志配置
+LOGGING_CONFIG = {
+    'log_dir': 'logs',
+    'file_prefix': 'wallhub',  # 每个进程一个日志文件: logs/<file_prefix>_<时间戳>.log
+    'level': 'INFO',  # 写入日志文件的级别
+    'console_level': 'INFO',  # 控制台输出级别（控制台较慢时可设为 WARNING）
+    'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    # 下载进度汇总的最短间隔（秒）：逐张图片的成功信息记为 DEBUG，进度每隔该时间汇总输出一行
+    'progress_interval': 5.0,
+    # 第三方库日志级别设为 WARNING，避免过多调试信息
+    'quiet_loggers': ['requests', 'urllib3', 'aiohttp'],
+}
@@ -0,0 +1,14 @@
+"""
+运行指标配置（各阶段耗时直方图与计数器）
+"""
+
+# 指标配置
+METRICS_CONFIG = {
+    'enabled': True,
+    # run() 结束时把 JSON 摘要写入该目录（文件名: <来源>_metrics_<时间戳>.json），None 表示只写日志
+    'summary_dir': 'logs',
+    # 运行期间提供 Prometheus 文本格式的指标接口 http://<http_host>:<http_port>/metrics
+    # None 表示不启动（例如设为 9108 后可用 curl http://127.0.0.1:9108/metrics 查看）
+    'http_host': '127.0.0.1',
+    'http_port': None,
+}
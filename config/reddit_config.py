@@ -8,6 +8,7 @@ import os
 REDDIT_CONFIG = {
     'save_dir': os.path.expanduser("~/Pictures/背景/reddit"),
     'reddit_url': "https://www.reddit.com/r/Animewallpaper/?f=flair_name%3A%22Desktop%22",
+    'api_base': "https://www.reddit.com",  # 列表与帖子 JSON 接口的地址（基准测试时指向本地模拟服务器）
     'max_posts': 100,
     'max_images': 100,
     # 超时与无进展限制：如果长时间没有找到新图片则停止搜索
@@ -16,8 +17,29 @@ REDDIT_CONFIG = {
     'request_timeout': 10,
     'download_timeout': 20,
     'sleep_time': 2,
+    'max_workers': 16,  # 线程池大小即并发上限，实际并发由 HTTP_CONFIG['concurrency'] 自适应调整
+    # 异步下载（python main.py reddit --async）的并发限制
+    'async_max_concurrency': 100,  # 同时进行的下载总数
+    'async_per_host_limit': 16,    # 单个主机（如 i.redd.it）的最大并发连接数
+    # 分辨率与宽高比过滤（写法与 Wallhaven 的 atleast / ratios 相同），None 表示不过滤
+    'min_resolution': None,  # 例如: '1920x1080' 或 '2560x1440'
+    'ratios': None,  # 例如: 'landscape'、'portrait' 或 '16x9,21x9'
+    # 下载前用 Range 请求只读取图片开头的 probe_bytes 字节解析宽高，不符合过滤规则的图片不再完整下载
+    'probe_resolution': True,
+    'probe_bytes': 16384,
+    # 列表数据不足的帖子（图集数据缺失、链接到图集等）通过 /api/info.json 批量获取，每次请求最多 100 个
+    'info_batch_size': 100,
+    # Imgur 相册解析：配置 client_id 时使用官方 JSON 接口，否则只读取相册页面开头 scan_bytes 字节提取图片直链
+    'imgur': {
+        'client_id': os.environ.get('IMGUR_CLIENT_ID'),
+        'timeout': (3, 5),  # (连接, 读取) 超时秒数，读取页面的总时长不超过两者之和
+        'scan_bytes': 256 * 1024,
+    },
     'after': None,
     'db_path': 'reddit_images.db',
+    # 批量写库：攒够多少条记录或间隔多少秒提交一次事务
+    'db_batch_size': 50,
+    'db_flush_interval': 1.0,
     'headers': {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
@@ -14,6 +14,8 @@ WALLHAVEN_CONFIG = {
     'max_images': 100,
     'default_pages': 1,  # 默认开始页数
     'max_pages': 100,  # 最大页数，用于控制下载数量
+    'download_queue_size': 24,  # 边搜索边下载时，排队/下载中的最大图片数
+    'max_workers': 16,  # 线程池大小即并发上限，实际并发由 HTTP_CONFIG['concurrency'] 自适应调整
     
     # 搜索参数
     'search_query': None,  # 搜索关键词，例如: 'anime', 'landscape', 'abstract'
@@ -29,9 +31,16 @@ WALLHAVEN_CONFIG = {
     
     # 数据库配置
     'db_path': 'wallhaven_images.db',  # Wallhaven专用数据库
+    'db_batch_size': 50,  # 批量写库：攒够多少条记录提交一次事务
+    'db_flush_interval': 1.0,  # 批量写库：最长多少秒提交一次事务
     
     # 网络配置
     'request_timeout': 10,  # 请求超时（秒）
     'download_timeout': 20,  # 下载超时（秒）
-    'sleep_time': 2,  # 请求之间的延迟（秒）
+    'download_retries': 3,  # 下载中断后的续传次数（未完成部分保存为 .part 文件）
+    'sleep_time': 2,  # 翻页间隔（秒），仅在 HTTP_CONFIG['rate_limits'] 未配置 wallhaven.cc 时使用
+
+    # 异步下载（python main.py wallhaven --async）的并发限制
+    'async_max_concurrency': 100,  # 同时进行的下载总数
+    'async_per_host_limit': 16,  # 单个主机（如 w.wallhaven.cc）的最大并发连接数
 }
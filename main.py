@@ -1,14 +1,7 @@
-from src.RedditImageDownloader import RedditImageDownloader
-from src.WallhavenImageDownloader import WallhavenImageDownloader
-from src.DatabaseImageDownloader import (
-    DatabaseImageDownloader,
-    RedditDatabaseDownloader,
-    WallhavenDatabaseDownloader
-)
-from config import REDDIT_CONFIG, WALLHAVEN_CONFIG
-import os
 import sys
-import sqlite3
+from config import REDDIT_CONFIG, WALLHAVEN_CONFIG
+
+# 各子命令在执行时才导入所需模块：轻量命令（如 restore-stable）无需加载 requests / aiohttp 与下载器
 
 def print_usage():
     """打印使用说明"""
@@ -16,172 +9,267 @@ def print_usage():
     print("📖 使用说明")
     print("=" * 60)
     print("\n下载新图片:")
+    print("  在命令后加 --async 使用 aiohttp 异步引擎下载（适用于所有下载命令）")
     print("  python main.py reddit          - 从 Reddit 下载")
     print("  python main.py wallhaven       - 从 Wallhaven 下载")
-    print("  python main.py all             - 从所有源下载")
+    print("  python main.py all             - 从所有源并发下载（加 --sequential 依次下载）")
     print("\n下载数据库中的图片:")
     print("  python main.py reddit-db       - 下载 Reddit 数据库中的图片")
     print("  python main.py wallhaven-db    - 下载 Wallhaven 数据库中的图片")
-    print("  python main.py db-all          - 下载所有数据库中的图片")
+    print("  python main.py db-all          - 并发下载所有数据库中的图片（加 --sequential 依次下载）")
     print("\n标记缺失图片为 unstable:")
     print("  python main.py mark-unstable           - 标记所有源数据库中缺失的本地图片为 unstable")
     print("  python main.py reddit-mark-unstable    - 仅标记 Reddit 源")
     print("  python main.py wallhaven-mark-unstable - 仅标记 Wallhaven 源")
+    print("\n统一目录:")
+    print("  python main.py catalog-migrate         - 将 Reddit 与 Wallhaven 数据库批量导入统一目录（可重复执行以同步状态）")
+    print("\n近似重复检测（感知哈希，需要 numpy 与 Pillow）:")
+    print("  python main.py dedupe                  - 报告 Reddit 与 Wallhaven 之间的近似重复图片")
+    print("  python main.py dedupe --mark           - 同时把重复项标记为 stable=2（不再下载）")
+    print("  python main.py dedupe --threshold 6    - 指定汉明距离阈值（默认 6）")
     print("\n还原标记:")
     print("  python main.py restore-stable          - 将所有 unstable 记录还原为 stable")
     print("=" * 60 + "\n")
 
+def cmd_reddit(args, use_async):
+    from src.RedditImageDownloader import RedditImageDownloader
+
+    print("🎬 选择 Reddit 下载器")
+    downloader = RedditImageDownloader()
+    downloader.run(use_async=use_async)
+
+
+def cmd_wallhaven(args, use_async):
+    from src.WallhavenImageDownloader import WallhavenImageDownloader
+
+    print("🎬 选择 Wallhaven 下载器")
+    downloader = WallhavenImageDownloader()
+    downloader.run(use_async=use_async)
+
+
+def cmd_all(args, use_async):
+    from src.RedditImageDownloader import RedditImageDownloader
+    from src.WallhavenImageDownloader import WallhavenImageDownloader
+
+    print("🎬 选择所有下载源")
+    if '--sequential' in args:
+        print("\n=== 开始 Reddit 下载 ===")
+        RedditImageDownloader().run(use_async=use_async)
+
+        print("\n=== 开始 Wallhaven 下载 ===")
+        WallhavenImageDownloader().run(use_async=use_async)
+        return
+
+    from src.orchestrator import SourceOrchestrator
+
+    # 各下载源访问不同的主机与数据库，并发运行并共享总并发数
+    SourceOrchestrator([RedditImageDownloader(), WallhavenImageDownloader()]).run(use_async=use_async)
+
+
+def cmd_reddit_db(args, use_async):
+    from src.DatabaseImageDownloader import RedditDatabaseDownloader
+
+    print("🎬 选择 Reddit 数据库下载器")
+    db_downloader = RedditDatabaseDownloader(
+        db_path=REDDIT_CONFIG['db_path'],
+        save_dir=REDDIT_CONFIG['save_dir']
+    )
+    db_downloader.run(use_async=use_async)
+
+
+def cmd_wallhaven_db(args, use_async):
+    from src.DatabaseImageDownloader import WallhavenDatabaseDownloader
+
+    print("🎬 选择 Wallhaven 数据库下载器")
+    db_downloader = WallhavenDatabaseDownloader(
+        db_path=WALLHAVEN_CONFIG['db_path'],
+        save_dir=WALLHAVEN_CONFIG['save_dir']
+    )
+    db_downloader.run(use_async=use_async)
+
+
+def cmd_db_all(args, use_async):
+    from src.DatabaseImageDownloader import RedditDatabaseDownloader, WallhavenDatabaseDownloader
+
+    print("🎬 选择从所有数据库下载图片")
+    reddit_db_downloader = RedditDatabaseDownloader(
+        db_path=REDDIT_CONFIG['db_path'],
+        save_dir=REDDIT_CONFIG['save_dir']
+    )
+    wallhaven_db_downloader = WallhavenDatabaseDownloader(
+        db_path=WALLHAVEN_CONFIG['db_path'],
+        save_dir=WALLHAVEN_CONFIG['save_dir']
+    )
+    if '--sequential' in args:
+        print("\n=== 开始下载 Reddit 数据库图片 ===")
+        reddit_db_downloader.run(use_async=use_async)
+
+        print("\n=== 开始下载 Wallhaven 数据库图片 ===")
+        wallhaven_db_downloader.run(use_async=use_async)
+        return
+
+    from src.orchestrator import SourceOrchestrator
+
+    SourceOrchestrator([reddit_db_downloader, wallhaven_db_downloader]).run(use_async=use_async)
+
+
+def run_folder_sync():
+    """在当前进程中同步 Wallhaven 文件夹到数据库"""
+    from sync_folder_to_db import sync_folder_to_db
+
+    try:
+        sync_folder_to_db()
+        print("同步完成")
+    except Exception as e:
+        print(f"同步出错: {e}")
+
+
+def cmd_mark_unstable(args, use_async):
+    from src.RedditImageDownloader import RedditImageDownloader
+    from src.WallhavenImageDownloader import WallhavenImageDownloader
+
+    print("🔎 标记所有源缺失的本地图片为 unstable...")
+    print("--- Reddit ---")
+    reddit_downloader = RedditImageDownloader()
+    r_updated = reddit_downloader.mark_missing_images_unstable()
+    print(f"Reddit: 标记 {r_updated} 条记录为 unstable")
+
+    print("--- Wallhaven ---")
+    wallhaven_downloader = WallhavenImageDownloader()
+    w_updated = wallhaven_downloader.mark_missing_images_unstable()
+    print(f"Wallhaven: 标记 {w_updated} 条记录为 unstable")
+
+    print("--- 同步文件夹到数据库 ---")
+    run_folder_sync()
+
+
+def cmd_reddit_mark_unstable(args, use_async):
+    from src.RedditImageDownloader import RedditImageDownloader
+
+    print("🔎 标记 Reddit 源缺失的本地图片为 unstable...")
+    reddit_downloader = RedditImageDownloader()
+    updated = reddit_downloader.mark_missing_images_unstable()
+    print(f"Reddit: 标记 {updated} 条记录为 unstable")
+
+
+def cmd_wallhaven_mark_unstable(args, use_async):
+    from src.WallhavenImageDownloader import WallhavenImageDownloader
+
+    print("🔎 标记 Wallhaven 源缺失的本地图片为 unstable...")
+    wallhaven_downloader = WallhavenImageDownloader()
+    updated = wallhaven_downloader.mark_missing_images_unstable()
+    print(f"Wallhaven: 标记 {updated} 条记录为 unstable")
+
+    print("--- 同步 Wallhaven 文件夹到数据库 ---")
+    run_folder_sync()
+
+
+def cmd_catalog_migrate(args, use_async):
+    from src.catalog import Catalog
+    from config import CATALOG_CONFIG
+
+    catalog = Catalog(CATALOG_CONFIG['db_path'])
+    print(f"📚 导入各来源数据库到统一目录: {CATALOG_CONFIG['db_path']}")
+    for label, db_path in (('reddit', REDDIT_CONFIG['db_path']), ('wallhaven', WALLHAVEN_CONFIG['db_path'])):
+        added, updated = catalog.import_source(label, db_path)
+        print(f"{label}: 新增 {added} 条，同步 {updated} 条")
+    for label, (total, stable) in catalog.counts().items():
+        print(f"📊 {label}: 共 {total} 条，stable {stable} 条")
+
+
+def cmd_dedupe(args, use_async):
+    from src.dedupe import find_near_duplicates
+    from src.phash import DEFAULT_THRESHOLD
+
+    threshold = DEFAULT_THRESHOLD
+    if '--threshold' in args:
+        threshold = int(args[args.index('--threshold') + 1])
+    mark = '--mark' in args
+    print(f"🔍 检测近似重复图片（汉明距离 ≤ {threshold}）...")
+    duplicates = find_near_duplicates(
+        [
+            ('Reddit', REDDIT_CONFIG['db_path'], REDDIT_CONFIG['save_dir']),
+            ('Wallhaven', WALLHAVEN_CONFIG['db_path'], WALLHAVEN_CONFIG['save_dir']),
+        ],
+        threshold=threshold,
+        mark=mark
+    )
+    for keep, others in duplicates:
+        print(f"\n保留 [{keep[0]}] {keep[2]} ({keep[3] // 1024} KB)")
+        for other in others:
+            print(f"  重复 [{other[0]}] {other[2]} ({other[3] // 1024} KB)")
+    total = sum(len(others) for _, others in duplicates)
+    print(f"\n共发现 {len(duplicates)} 组、{total} 张近似重复图片" + ("，已标记为 stable=2" if mark and total else ""))
+
+
+def cmd_restore_stable(args, use_async):
+    import sqlite3
+
+    print("🔄 还原所有 unstable 记录为 stable...")
+
+    restored_count = 0
+
+    # 还原 Reddit 与 Wallhaven 数据库
+    for label, db_path in (('Reddit', REDDIT_CONFIG['db_path']), ('Wallhaven', WALLHAVEN_CONFIG['db_path'])):
+        try:
+            conn = sqlite3.connect(db_path)
+            cursor = conn.cursor()
+            cursor.execute("UPDATE images SET stable = 1 WHERE stable = 0")
+            count = cursor.rowcount
+            conn.commit()
+            conn.close()
+            print(f"{label}: 还原 {count} 条记录")
+            restored_count += count
+        except Exception as e:
+            print(f"{label} 数据库还原失败: {e}")
+
+    # 还原统一目录
+    try:
+        from src.catalog import get_catalog
+        catalog = get_catalog()
+        if catalog is not None:
+            print(f"统一目录: 还原 {catalog.restore_stable()} 条记录")
+    except Exception as e:
+        print(f"统一目录还原失败: {e}")
+
+    print(f"总共还原 {restored_count} 条记录为 stable")
+
+
+# 子命令注册表：命令名 -> 处理函数(args, use_async)
+COMMANDS = {
+    'reddit': cmd_reddit,
+    'wallhaven': cmd_wallhaven,
+    'all': cmd_all,
+    'reddit-db': cmd_reddit_db,
+    'wallhaven-db': cmd_wallhaven_db,
+    'db-all': cmd_db_all,
+    'mark-unstable': cmd_mark_unstable,
+    'reddit-mark-unstable': cmd_reddit_mark_unstable,
+    'wallhaven-mark-unstable': cmd_wallhaven_mark_unstable,
+    'catalog-migrate': cmd_catalog_migrate,
+    'dedupe': cmd_dedupe,
+    'restore-stable': cmd_restore_stable,
+}
+
+
 def main():
     try:
         # 检查命令行参数
+        args = sys.argv[1:]
+        # --async: 使用 aiohttp 异步引擎下载
+        use_async = '--async' in args
+        args = [arg for arg in args if arg != '--async']
+
         source = 'reddit'  # 默认源
-        if len(sys.argv) > 1:
-            source = sys.argv[1].lower()
-        
-        if source == 'reddit':
-            print("🎬 选择 Reddit 下载器")
-            downloader = RedditImageDownloader()
-            downloader.run()
-        
-        elif source == 'wallhaven':
-            print("🎬 选择 Wallhaven 下载器")
-            downloader = WallhavenImageDownloader()
-            downloader.run()
-        
-        elif source == 'all':
-            print("🎬 选择所有下载源")
-            # 运行所有下载器
-            print("\n=== 开始 Reddit 下载 ===")
-            reddit_downloader = RedditImageDownloader()
-            reddit_downloader.run()
-            
-            print("\n=== 开始 Wallhaven 下载 ===")
-            wallhaven_downloader = WallhavenImageDownloader()
-            wallhaven_downloader.run()
-        
-        elif source == 'reddit-db':
-            print("🎬 选择 Reddit 数据库下载器")
-            db_downloader = RedditDatabaseDownloader(
-                db_path=REDDIT_CONFIG['db_path'],
-                save_dir=REDDIT_CONFIG['save_dir']
-            )
-            db_downloader.run()
-        
-        elif source == 'wallhaven-db':
-            print("🎬 选择 Wallhaven 数据库下载器")
-            db_downloader = WallhavenDatabaseDownloader(
-                db_path=WALLHAVEN_CONFIG['db_path'],
-                save_dir=WALLHAVEN_CONFIG['save_dir']
-            )
-            db_downloader.run()
-        
-        elif source == 'db-all':
-            print("🎬 选择从所有数据库下载图片")
-            
-            print("\n=== 开始下载 Reddit 数据库图片 ===")
-            reddit_db_downloader = RedditDatabaseDownloader(
-                db_path=REDDIT_CONFIG['db_path'],
-                save_dir=REDDIT_CONFIG['save_dir']
-            )
-            reddit_db_downloader.run()
-            
-            print("\n=== 开始下载 Wallhaven 数据库图片 ===")
-            wallhaven_db_downloader = WallhavenDatabaseDownloader(
-                db_path=WALLHAVEN_CONFIG['db_path'],
-                save_dir=WALLHAVEN_CONFIG['save_dir']
-            )
-            wallhaven_db_downloader.run()
-
-        elif source == 'mark-unstable':
-            print("🔎 标记所有源缺失的本地图片为 unstable...")
-            print("--- Reddit ---")
-            reddit_downloader = RedditImageDownloader()
-            r_updated = reddit_downloader.mark_missing_images_unstable()
-            print(f"Reddit: 标记 {r_updated} 条记录为 unstable")
-
-            print("--- Wallhaven ---")
-            wallhaven_downloader = WallhavenImageDownloader()
-            w_updated = wallhaven_downloader.mark_missing_images_unstable()
-            print(f"Wallhaven: 标记 {w_updated} 条记录为 unstable")
-
-            print("--- 同步文件夹到数据库 ---")
-            import subprocess
-            try:
-                result = subprocess.run([sys.executable, 'sync_folder_to_db.py'], capture_output=True, text=True)
-                if result.returncode == 0:
-                    print("同步完成")
-                    if result.stdout.strip():
-                        print(result.stdout.strip())
-                    if result.stderr.strip():
-                        print(result.stderr.strip())
-                else:
-                    print(f"同步失败: {result.stderr}")
-            except Exception as e:
-                print(f"同步出错: {e}")
-
-        elif source == 'reddit-mark-unstable':
-            print("🔎 标记 Reddit 源缺失的本地图片为 unstable...")
-            reddit_downloader = RedditImageDownloader()
-            updated = reddit_downloader.mark_missing_images_unstable()
-            print(f"Reddit: 标记 {updated} 条记录为 unstable")
-
-        elif source == 'wallhaven-mark-unstable':
-            print("🔎 标记 Wallhaven 源缺失的本地图片为 unstable...")
-            wallhaven_downloader = WallhavenImageDownloader()
-            updated = wallhaven_downloader.mark_missing_images_unstable()
-            print(f"Wallhaven: 标记 {updated} 条记录为 unstable")
-
-            print("--- 同步 Wallhaven 文件夹到数据库 ---")
-            import subprocess
-            try:
-                result = subprocess.run([sys.executable, 'sync_folder_to_db.py'], capture_output=True, text=True)
-                if result.returncode == 0:
-                    print("同步完成")
-                    if result.stdout.strip():
-                        print(f"同步输出: {result.stdout.strip()}")
-                else:
-                    print(f"同步失败: {result.stderr}")
-            except Exception as e:
-                print(f"同步出错: {e}")
-
-        elif source == 'restore-stable':
-            print("🔄 还原所有 unstable 记录为 stable...")
-            
-            
-            restored_count = 0
-            
-            # 还原 Reddit 数据库
-            try:
-                conn = sqlite3.connect(REDDIT_CONFIG['db_path'])
-                cursor = conn.cursor()
-                cursor.execute("UPDATE images SET stable = 1 WHERE stable = 0")
-                r_count = cursor.rowcount
-                conn.commit()
-                conn.close()
-                print(f"Reddit: 还原 {r_count} 条记录")
-                restored_count += r_count
-            except Exception as e:
-                print(f"Reddit 数据库还原失败: {e}")
-            
-            # 还原 Wallhaven 数据库
-            try:
-                conn = sqlite3.connect(WALLHAVEN_CONFIG['db_path'])
-                cursor = conn.cursor()
-                cursor.execute("UPDATE images SET stable = 1 WHERE stable = 0")
-                w_count = cursor.rowcount
-                conn.commit()
-                conn.close()
-                print(f"Wallhaven: 还原 {w_count} 条记录")
-                restored_count += w_count
-            except Exception as e:
-                print(f"Wallhaven 数据库还原失败: {e}")
-            
-            print(f"总共还原 {restored_count} 条记录为 stable")
-        
-        else:
+        if args:
+            source = args[0].lower()
+
+        command = COMMANDS.get(source)
+        if command is None:
             print(f"❌ 未知的命令: {source}")
             print_usage()
             sys.exit(1)
+        command(args, use_async)
 
     except KeyboardInterrupt:
         print("\n程序被用户中断")
@@ -191,4 +279,4 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  main()
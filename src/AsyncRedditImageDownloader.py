@@ -1,32 +1,12 @@
-import aiohttp
-import asyncio
-from aiohttp import ClientTimeout
-from RedditImageDownloader import RedditImageDownloader
-class AsyncRedditImageDownloader(RedditImageDownloader):
-    async def download_images_async(self, urls):
-        """异步下载图片"""
-        timeout = ClientTimeout(total=self.download_timeout)
-        connector = aiohttp.TCPConnector(limit=20, limit_per_host=5)
+from src.RedditImageDownloader import RedditImageDownloader
+
 
-        async with aiohttp.ClientSession(
-            timeout=timeout,
-            connector=connector,
-            headers=self.headers
-        ) as session:
-            tasks = [self.download_single_image(session, url) for url in urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+class AsyncRedditImageDownloader(RedditImageDownloader):
+    """始终使用 aiohttp 异步引擎下载图片的 Reddit 下载器
 
-            successful = sum(1 for r in results if r is True)
-            return successful
+    等价于 RedditImageDownloader().run(use_async=True)，下载逻辑见 src/async_engine.py
+    """
 
-    async def download_single_image(self, session, url):
-        """下载单张图片"""
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    image_data = await response.read()
-                    # ... 其余处理逻辑与原来相同
-                    return await self.process_image_data(image_data, url)
-        except Exception as e:
-            print(f"异步下载失败: {url} - {e}")
-            return False
+    def run(self, use_async=True):
+        """运行下载任务（默认异步）"""
+        return super().run(use_async=use_async)
@@ -2,18 +2,24 @@ import sqlite3
 import requests
 import os
 import logging
-import hashlib
 import time
 import concurrent.futures
-from datetime import datetime
+import functools
 from contextlib import contextmanager
-from src.utils import is_valid_image
+from config import REDDIT_CONFIG, WALLHAVEN_CONFIG
+from src.http_client import get_session
+from src.log_setup import ProgressReporter, setup_logging
+from src.concurrency import get_concurrency_controller
+from src.cpu_stage import get_cpu_stage
+from src.db_pool import get_pool
+from src.metrics import get_metrics, report_summary, start_metrics_server
+from src.stream_writer import ResumableImageWriter, InvalidImageError, part_path_for
 
 
 class DatabaseImageDownloader:
     """从数据库中下载图片的下载器"""
     
-    def __init__(self, db_path, save_dir, source='all'):
+    def __init__(self, db_path, save_dir, source='all', max_workers=16):
         """
         初始化数据库图片下载器
         
@@ -21,12 +27,14 @@ class DatabaseImageDownloader:
             db_path: SQLite数据库路径
             save_dir: 图片保存目录
             source: 图片源 ('reddit', 'wallhaven', 'all')
+            max_workers: 下载线程池大小，子类使用对应来源配置中的 max_workers
         """
-        self._setup_logging()
+        setup_logging()
         self.logger = logging.getLogger('DatabaseImageDownloader')
         self.logger.info(f"🚀 初始化数据库图片下载器... (源: {source})")
         
         self.db_path = db_path
+        self.conn_pool = get_pool(self.db_path)
         self.save_dir = save_dir
         self.source = source
         
@@ -35,8 +43,15 @@ class DatabaseImageDownloader:
         }
         self.request_timeout = 10
         self.download_timeout = 20
-        self.sleep_time = 1
-        self.max_workers = 5
+        self.download_retries = 3  # 下载中断后的续传次数
+        self.session = get_session()  # 共享的 HTTP 连接池（keep-alive + 重试 + 按主机限流）
+        self.max_workers = max_workers  # 线程池大小（并发上限），实际并发由自适应控制器按主机调整
+        self.concurrency = get_concurrency_controller()
+        self.cpu_stage = get_cpu_stage()  # 完整性校验的进程池（未启用时为 None）
+        self.async_max_concurrency = 100
+        self.async_per_host_limit = 16
+        self.progress = None  # 运行中的进度汇总（供多源调度器读取合并进度）
+        self.metrics = get_metrics(f"database_{source}")  # 各阶段耗时与计数
         
         # 创建保存目录
         os.makedirs(self.save_dir, exist_ok=True)
@@ -44,29 +59,10 @@ class DatabaseImageDownloader:
         
         self.logger.info("✅ 下载器初始化完成")
 
-    def _setup_logging(self):
-        """设置日志系统"""
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        log_filename = f"{log_dir}/database_downloader_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_filename, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
-        
-        logging.getLogger('requests').setLevel(logging.WARNING)
-        logging.getLogger('urllib3').setLevel(logging.WARNING)
-
     @contextmanager
     def get_db_connection(self):
-        """数据库连接上下文管理器"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
+        """数据库连接上下文管理器（从有界连接池获取连接）"""
+        conn = self.conn_pool.acquire()
         try:
             yield conn
             conn.commit()
@@ -75,7 +71,7 @@ class DatabaseImageDownloader:
             self.logger.error(f"❌ 数据库事务回滚: {e}")
             raise
         finally:
-            conn.close()
+            self.conn_pool.release(conn)
 
     def get_images_from_db(self):
         """从数据库获取所有未下载的图片记录"""
@@ -131,57 +127,101 @@ class DatabaseImageDownloader:
         else:
             return 'jpg'  # 默认使用jpg
 
+    def get_local_path(self, image_data):
+        """数据库记录对应的本地文件路径"""
+        filename = self.generate_filename(image_data['hash'], image_data['url'], image_data.get('wallhaven_id'))
+        return os.path.join(self.save_dir, filename)
+
+    def _finalize_download(self, writer, content_type, filepath):
+        """下载完成后原子重命名为目标文件"""
+        writer.commit(filepath)
+        self.logger.debug(f"✅ 下载完成: {os.path.basename(filepath)}")
+        return True
+
     def download_image(self, image_data):
         """下载单个图片"""
         url = image_data['url']
-        image_hash = image_data['hash']
-        wallhaven_id = image_data.get('wallhaven_id')
-        filename = self.generate_filename(image_hash, url, wallhaven_id)
-        filepath = os.path.join(self.save_dir, filename)
+        filepath = self.get_local_path(image_data)
+        filename = os.path.basename(filepath)
         
         # 检查文件是否已存在
         if os.path.exists(filepath):
             self.logger.debug(f"⏭️ 图片已存在，跳过: {filename}")
             return True
         
-        try:
-            self.logger.info(f"⬇️ 开始下载: {filename} <- {url}")
-            response = requests.get(
-                url,
-                headers=self.headers,
-                timeout=self.download_timeout,
-                stream=True
-            )
-            response.raise_for_status()
-            
-            # 验证是否为有效图片
-            content_type = response.headers.get('content-type', '')
-            if not is_valid_image(response.content, content_type):
+        self.logger.debug(f"⬇️ 开始下载: {filename} <- {url}")
+        for attempt in range(1, self.download_retries + 1):
+            try:
+                # 断点续传：未完成的数据按 URL 保存在 .part 文件中（与 Wallhaven 下载器共用），重试或下次运行时继续下载
+                # 文件名已由数据库记录确定，不需要 MD5，下载线程与 CPU 阶段都不计算哈希
+                with ResumableImageWriter(part_path_for(self.save_dir, url), url, inline_hash=False) as writer:
+                    if writer.resume_from:
+                        self.logger.info(f"⏯️ 从 {writer.resume_from} 字节处续传: {filename}")
+                    started = time.perf_counter()
+                    content_type = writer.fetch(self.session, url, self.headers, self.download_timeout)
+                    elapsed = time.perf_counter() - started
+                    if self.cpu_stage is not None:
+                        self.cpu_stage.process(writer, compute_hash=False)
+                    self._finalize_download(writer, content_type, filepath)
+                    self.metrics.record_download(writer, elapsed)
+                return True
+
+            except InvalidImageError:
                 self.logger.warning(f"⚠️ 无效的图片格式，跳过: {url}")
                 return False
-            
-            # 保存文件
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            self.logger.info(f"✅ 下载完成: {filename}")
-            time.sleep(self.sleep_time)  # 速率限制
-            return True
-        
-        except requests.exceptions.RequestException as e:
-            self.logger.warning(f"⚠️ 下载失败: {url} - {e}")
-            return False
-        except Exception as e:
-            self.logger.error(f"❌ 保存文件错误: {filepath} - {e}")
-            return False
+            except requests.exceptions.RequestException as e:
+                self.concurrency.record_exception(url, e)
+                if attempt < self.download_retries:
+                    self.logger.warning(f"⏳ 下载中断，准备续传（第 {attempt}/{self.download_retries} 次）: {url} - {e}")
+                    continue
+                self.logger.warning(f"⚠️ 下载失败: {url} - {e}")
+                return False
+            except Exception as e:
+                self.logger.error(f"❌ 保存文件错误: {filepath} - {e}")
+                return False
+        return False
+
+    def download_images_async(self, images, progress=None):
+        """使用 aiohttp 异步引擎并发下载，本地已存在的文件直接计为成功，返回成功数量"""
+        from src.async_engine import AsyncDownloadEngine, DownloadJob
+
+        jobs = []
+        existing_count = 0
+        for image_data in images:
+            filepath = self.get_local_path(image_data)
+            if os.path.exists(filepath):
+                self.logger.debug(f"⏭️ 图片已存在，跳过: {os.path.basename(filepath)}")
+                existing_count += 1
+                if progress is not None:
+                    progress.update(True)
+                continue
+            jobs.append(DownloadJob(image_data['url'], self.save_dir,
+                                    functools.partial(self._finalize_download, filepath=filepath)))
+
+        engine = AsyncDownloadEngine(
+            headers=self.headers,
+            download_timeout=self.download_timeout,
+            max_concurrency=self.async_max_concurrency,
+            per_host_limit=self.async_per_host_limit,
+            metrics=self.metrics,
+            progress=progress,
+            cpu_stage=self.cpu_stage,
+            compute_hash=False,
+            logger=self.logger
+        )
+        return existing_count + sum(engine.run(jobs))
 
-    def run(self):
-        """运行下载器"""
+    def run(self, use_async=False):
+        """运行下载器
+
+        Args:
+            use_async: 为 True 时使用 aiohttp 异步引擎下载，否则使用线程池
+        """
         self.logger.info("=" * 60)
         self.logger.info("🎬 开始下载数据库中的图片")
         self.logger.info("=" * 60)
+        self.metrics.reset()
+        start_metrics_server(self.logger)
         
         # 获取数据库中的图片
         images = self.get_images_from_db()
@@ -195,20 +235,34 @@ class DatabaseImageDownloader:
         # 并行下载
         downloaded_count = 0
         failed_count = 0
+        self.progress = ProgressReporter(self.logger, total=len(images))
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(self.download_image, img): img for img in images}
-            
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        downloaded_count += 1
-                    else:
+        if use_async:
+            downloaded_count = self.download_images_async(images, self.progress)
+            failed_count = len(images) - downloaded_count
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {}
+                for img in images:
+                    if os.path.exists(self.get_local_path(img)):
+                        # 本地已有的文件不占用下载并发名额
+                        futures[self.progress.track(executor.submit(self.download_image, img))] = img
+                        continue
+                    slot = self.concurrency.acquire(img['url'], ceiling=self.max_workers,
+                                                    source=self.metrics.source)
+                    futures[self.progress.track(executor.submit(slot.run, self.download_image, img))] = img
+                
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        result = future.result()
+                        if result:
+                            downloaded_count += 1
+                        else:
+                            failed_count += 1
+                    except Exception as e:
+                        self.logger.error(f"❌ 下载线程异常: {e}")
                         failed_count += 1
-                except Exception as e:
-                    self.logger.error(f"❌ 下载线程异常: {e}")
-                    failed_count += 1
+        self.progress.finish()
         
         # 输出统计信息
         self.logger.info("=" * 60)
@@ -218,17 +272,20 @@ class DatabaseImageDownloader:
         self.logger.info(f"❌ 失败: {failed_count}")
         self.logger.info(f"📁 保存目录: {self.save_dir}")
         self.logger.info("=" * 60)
+        self.metrics.inc('images_downloaded', downloaded_count)
+        self.metrics.inc('images_failed', failed_count)
+        report_summary(self.metrics, self.logger)
 
 
 class RedditDatabaseDownloader(DatabaseImageDownloader):
     """Reddit数据库图片下载器"""
     
     def __init__(self, db_path, save_dir):
-        super().__init__(db_path, save_dir, source='reddit')
+        super().__init__(db_path, save_dir, source='reddit', max_workers=REDDIT_CONFIG.get('max_workers', 16))
 
 
 class WallhavenDatabaseDownloader(DatabaseImageDownloader):
     """Wallhaven数据库图片下载器"""
     
     def __init__(self, db_path, save_dir):
-        super().__init__(db_path, save_dir, source='wallhaven')
+        super().__init__(db_path, save_dir, source='wallhaven', max_workers=WALLHAVEN_CONFIG.get('max_workers', 16))
@@ -2,89 +2,104 @@ import re
 import requests
 import os
 import logging
-from datetime import datetime
 from config import REDDIT_CONFIG
-from src.utils import get_existing_hashes, extract_image_url, is_valid_image
+from src.utils import get_existing_hashes, extract_info_images, extract_listing_images, info_fullname
 import hashlib
 import time
 import concurrent.futures
-import random
+import functools
 import sqlite3
 from contextlib import contextmanager
 from src.utils import existed_picture
+from src.http_client import get_session
+from src.log_setup import ProgressReporter, setup_logging
+from src.http_cache import cached_get
+from src.rate_limiter import get_rate_limiter
+from src.concurrency import get_concurrency_controller
+from src.cpu_stage import get_cpu_stage
+from src.image_probe import ResolutionFilter, format_resolution, probe_dimensions
+from src.imgur import album_id, get_imgur_resolver
+from src.db_pool import get_pool
+from src.db_writer import BatchedDBWriter
+from src.file_index import FileIndex
+from src.catalog import get_catalog
+from src.membership import get_membership_index
+from src.metrics import get_metrics, report_summary, start_metrics_server
+from src.stream_writer import ImageStreamWriter, InvalidImageError, DEFAULT_CHUNK_SIZE
 class RedditImageDownloader:
     def __init__(self):
-        # 初始化日志系统
-        self._setup_logging()
+        # 初始化日志系统（进程内共享，多次调用只配置一次）
+        setup_logging()
 
         self.logger = logging.getLogger('RedditImageDownloader')
         self.logger.info("🚀 初始化 Reddit 图片下载器...")
 
         self.save_dir = REDDIT_CONFIG['save_dir']
         self.reddit_url = REDDIT_CONFIG['reddit_url']
+        self.api_base = REDDIT_CONFIG.get('api_base', 'https://www.reddit.com').rstrip('/')
         self.max_posts = REDDIT_CONFIG['max_posts']
         self.headers = REDDIT_CONFIG['headers']
         self.request_timeout = REDDIT_CONFIG['request_timeout']
         self.download_timeout = REDDIT_CONFIG['download_timeout']
         self.sleep_time = REDDIT_CONFIG['sleep_time']
+        self.max_workers = REDDIT_CONFIG.get('max_workers', 16)
+        # 分辨率与宽高比过滤：下载前读取文件头探测宽高，下载后再按实际宽高检查一次
+        self.resolution_filter = ResolutionFilter(REDDIT_CONFIG.get('min_resolution'), REDDIT_CONFIG.get('ratios'))
+        self.probe_resolution = REDDIT_CONFIG.get('probe_resolution', True)
+        self.probe_bytes = REDDIT_CONFIG.get('probe_bytes', 16384)
+        self.probed_dimensions = {}  # url -> 已知的 (宽, 高)（列表元数据或 Range 探测），写库时记录分辨率
+        # 列表数据不足的帖子通过 /api/info.json 批量获取，每次请求最多 100 个帖子
+        self.info_batch_size = min(REDDIT_CONFIG.get('info_batch_size', 100), 100)
+        self.concurrency = get_concurrency_controller()  # 按主机的自适应并发控制（所有线程共享）
+        self.cpu_stage = get_cpu_stage()  # MD5 与完整性校验的进程池（未启用时为 None）
+        self.session = get_session()  # 共享的 HTTP 连接池（keep-alive + 重试 + 限流）
+        self.imgur = get_imgur_resolver()  # Imgur 相册解析（按相册 ID 缓存）
+        self.rate_limiter = get_rate_limiter()  # 按主机的令牌桶限流器（所有线程共享）
         self.db_path = REDDIT_CONFIG['db_path']
-        self.conn_pool = []
         self.after = REDDIT_CONFIG['after']  # 用于分页的after参数
         self.max_connections = 5
+        self.conn_pool = get_pool(self.db_path, self.max_connections)
+        # 批量写库：攒够 db_batch_size 条或每 db_flush_interval 秒提交一次
+        self.db_batch_size = REDDIT_CONFIG.get('db_batch_size', 50)
+        self.db_flush_interval = REDDIT_CONFIG.get('db_flush_interval', 1.0)
+        self.db_writer = None  # 仅在 run() 期间存在
+        self.catalog = get_catalog()  # 跨来源统一目录（未启用时为 None）
+        self.catalog_writer = None  # 仅在 run() 期间存在
+        self.progress = None  # 运行中的进度汇总（供多源调度器读取合并进度）
+        self.metrics = get_metrics('reddit')  # 各阶段耗时与计数
         self.max_images = REDDIT_CONFIG['max_images']
         # 搜索超时与无进展限制
         self.max_search_seconds = REDDIT_CONFIG.get('max_search_seconds', 300)
         self.max_empty_batches = REDDIT_CONFIG.get('max_empty_batches', 5)
+        # 异步下载并发限制
+        self.async_max_concurrency = REDDIT_CONFIG.get('async_max_concurrency', 100)
+        self.async_per_host_limit = REDDIT_CONFIG.get('async_per_host_limit', 16)
 
         # 创建保存目录
         os.makedirs(self.save_dir, exist_ok=True)
         self.logger.info(f"📁 图片保存目录: {self.save_dir}")
         # 初始化数据库
         self.init_database()
-
-        # 获取现有图片哈希值
-        self.existing_hashes = get_existing_hashes(self.save_dir, self.db_path)
-        self.logger.info(f"🔍 发现 {len(self.existing_hashes)} 个已存在的图片文件")
-        self.existed_picture=existed_picture(self.db_path)
-        self.logger.info(f"🔍 文件中有 {len(self.existed_picture)} 个图片")
+        self.file_index = FileIndex(self.conn_pool, self.save_dir, logger=self.logger)  # 保存目录的文件索引
+        # 已有图片的哈希索引在首次使用时才从数据库加载（见 existing_hashes / existed_picture）
 
         self.logger.info("✅ 下载器初始化完成")
 
-    def _setup_logging(self):
-        """设置日志系统"""
-        # 创建日志目录
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-
-        # 设置日志文件名（带时间戳）
-        log_filename = f"{log_dir}/reddit_downloader_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-
-        # 配置日志
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_filename, encoding='utf-8'),
-                logging.StreamHandler()  # 同时输出到控制台
-            ]
-        )
+    @property
+    def existing_hashes(self):
+        """数据库中所有图片哈希的成员索引（首次访问时加载，进程内共享）"""
+        return get_existing_hashes(self.save_dir, self.db_path)
 
-        # 设置第三方库的日志级别为WARNING，避免过多调试信息
-        logging.getLogger('requests').setLevel(logging.WARNING)
-        logging.getLogger('urllib3').setLevel(logging.WARNING)
-        logging.getLogger('aiohttp').setLevel(logging.WARNING)
+    @property
+    def existed_picture(self):
+        """stable=1 的图片哈希的成员索引（首次访问时加载，进程内共享）"""
+        return existed_picture(self.db_path)
 
     @contextmanager
     def get_db_connection(self):
-        """数据库连接上下文管理器"""
-        if self.conn_pool:
-            conn = self.conn_pool.pop()
-            self.logger.debug("♻️ 从连接池获取数据库连接")
-        else:
-            conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
-            self.logger.debug("🆕 创建新的数据库连接")
-
+        """数据库连接上下文管理器（从有界连接池获取连接）"""
+        conn = self.conn_pool.acquire()
+        self.logger.debug("♻️ 从连接池获取数据库连接")
         try:
             yield conn
             conn.commit()
@@ -94,41 +109,42 @@ class RedditImageDownloader:
             self.logger.error(f"❌ 数据库事务回滚: {e}")
             raise
         finally:
-            self.conn_pool.append(conn)
+            self.conn_pool.release(conn)
             self.logger.debug("🔙 数据库连接归还到连接池")
 
     def init_database(self):
         """初始化数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS images (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    hash TEXT NOT NULL UNIQUE,
-                    url TEXT NOT NULL UNIQUE,
-                    stable INTEGER NOT NULL DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_url ON images(url)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_hash ON images(hash)')
-            conn.commit()
-            conn.close()
+            with self.conn_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS images (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        hash TEXT NOT NULL UNIQUE,
+                        url TEXT NOT NULL UNIQUE,
+                        stable INTEGER NOT NULL DEFAULT 1,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        resolution TEXT DEFAULT 'unknown'
+                    )
+                ''')
+                # 旧数据库没有 resolution 列时补上
+                columns = {row[1] for row in cursor.execute("PRAGMA table_info(images)")}
+                if 'resolution' not in columns:
+                    cursor.execute("ALTER TABLE images ADD COLUMN resolution TEXT DEFAULT 'unknown'")
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_url ON images(url)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_hash ON images(hash)')
             self.logger.info("✅ 数据库初始化完成")
         except sqlite3.Error as e:
             self.logger.error(f"❌ 数据库初始化错误: {e}")
 
-    def insert_image(self, name, hash_value, url):
+    def insert_image(self, name, hash_value, url, resolution='unknown'):
         """插入图片信息到数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO images (name, hash, url) VALUES (?, ?, ?)", (name, hash_value, url))
-            conn.commit()
-            conn.close()
-            self.logger.info(f"💾 图片信息已保存到数据库: {name}")
+            with self.conn_pool.connection() as conn:
+                conn.execute("INSERT INTO images (name, hash, url, resolution) VALUES (?, ?, ?, ?)",
+                             (name, hash_value, url, resolution))
+            self.logger.debug(f"💾 图片信息已保存到数据库: {name}")
             return True
         except sqlite3.IntegrityError as e:
             if "hash" in str(e):
@@ -140,6 +156,64 @@ class RedditImageDownloader:
             self.logger.error(f"❌ 插入数据库错误: {e}")
             return False
 
+    def _create_db_writer(self):
+        """创建批量写库线程，记录格式为 (name, hash, url, resolution)"""
+        return BatchedDBWriter(
+            self.conn_pool,
+            "INSERT INTO images (name, hash, url, resolution) VALUES (?, ?, ?, ?)",
+            batch_size=self.db_batch_size,
+            flush_interval=self.db_flush_interval,
+            on_inserted=self._on_record_inserted,
+            on_conflict=self._report_db_conflict,
+            after_flush=lambda conn, inserted: self.file_index.record_names(conn, [(record[0], record[1]) for record in inserted]),
+            metrics=self.metrics,
+            logger=self.logger
+        )
+
+    def _on_record_inserted(self, record):
+        """记录写入本来源数据库后，同步到统一目录"""
+        self.logger.debug(f"💾 图片信息已保存到数据库: {record[0]}")
+        name, hash_value, url = record[:3]
+        self.existing_hashes.add(hash_value)
+        self.existed_picture.add(hash_value)
+        self.get_existing_urls().add(url)
+        if self.catalog is None:
+            return
+        catalog_record = self._catalog_record(record)
+        if self.catalog_writer is not None:
+            self.catalog_writer.submit(catalog_record)
+        else:
+            self.catalog.add(catalog_record)
+
+    @staticmethod
+    def _catalog_record(record):
+        """把本来源的记录 (name, hash, url, resolution) 转换为统一目录的记录格式"""
+        name, hash_value, url, resolution = record
+        return ('reddit', None, name, hash_value, url, None, resolution)
+
+    def _report_db_conflict(self, record, error):
+        """逐条报告批量写库时的唯一键冲突"""
+        url = record[2]
+        if "hash" in str(error):
+            self.logger.warning(f"⏭️ 图片hash已存在，跳过: {url}")
+        elif "url" in str(error):
+            self.logger.warning(f"⏭️ 图片URL已存在，跳过: {url}")
+
+    def save_image_record(self, name, hash_value, url, resolution='unknown'):
+        """保存图片记录：运行中交给批量写库线程，否则直接写入
+
+        交给写库线程时立即返回 True（只表示已排队，写入结果由 on_inserted / on_conflict 回调处理）；
+        直接写入时返回是否插入成功。
+        """
+        if self.db_writer is not None:
+            self.db_writer.submit((name, hash_value, url, resolution))
+            return True
+        self.file_index.record(name, hash_value)
+        inserted = self.insert_image(name, hash_value, url, resolution)
+        if inserted:
+            self._on_record_inserted((name, hash_value, url, resolution))
+        return inserted
+
     def get_file_extension(self, content_type, url):
         """从内容类型或URL中获取文件扩展名"""
         # 从内容类型获取扩展名
@@ -195,6 +269,7 @@ class RedditImageDownloader:
        # self.logger.info(f"🔍 after 为 {after if after else 0}")
 
         existing_urls = self.get_existing_urls()
+        seen_urls = set()  # 本次搜索中已找到的URL
         self.logger.info(f"📊 数据库中已有 {len(existing_urls)} 个图片记录")
        # existed_picture=src.utils.existed_picture(self.db_path)
        # self.logger.info(f"📊 文件中已有 {len(existed_picture)} 个图片文件")
@@ -205,49 +280,87 @@ class RedditImageDownloader:
         max_search_seconds = getattr(self, 'max_search_seconds', 300)
         max_empty_batches = getattr(self, 'max_empty_batches', 5)
 
+        def add_url(batch_urls, image_url, source):
+            if image_url and image_url not in existing_urls and image_url not in seen_urls:
+                batch_urls.append(image_url)
+                seen_urls.add(image_url)
+                self.logger.debug(f"✅ 发现新图片URL: {image_url}")
+            else:
+                self.logger.debug(f"⏭️ 跳过重复或无效URL: {source}")
+
         def process_post_batch(posts_batch):
-            """并行处理一批帖子"""
+            """处理一批帖子：优先直接从列表数据提取图片URL，数据不足的帖子通过 /api/info.json 批量获取"""
+            nonlocal listing_resolved, fallback_posts
             batch_urls = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+            fallback = []
+            for child in posts_batch:
+                if len(batch_urls) >= target_count - len(unique_urls):
+                    break
+
+                post = child['data']
+                flair = post.get('link_flair_text', '')
+                if not (flair and ('Desktop' in flair or '桌面' in flair)):
+                    continue
+
+                images = extract_listing_images(post)
+                if images is None:
+                    fallback.append(post)
+                    continue
+                listing_resolved += 1
+                for image_url, dimensions in images:
+                    self.remember_dimensions(image_url, dimensions)
+                    add_url(batch_urls, image_url, post.get('permalink'))
+
+            if not fallback:
+                return batch_urls
+
+            fallback_posts += len(fallback)
+            albums = [post for post in fallback if album_id(post.get('url'))]
+            posts = [post for post in fallback if not album_id(post.get('url'))]
+            if posts:
+                resolved = self.resolve_posts_info([info_fullname(post) for post in posts])
+                for post in posts:
+                    for image_url, dimensions in resolved.get(info_fullname(post), []):
+                        self.remember_dimensions(image_url, dimensions)
+                        add_url(batch_urls, image_url, post.get('permalink'))
+
+            if not albums:
+                return batch_urls
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
                 futures = {}
-                for child in posts_batch:
-                    if len(batch_urls) >= target_count - len(unique_urls):
-                        break
-
-                    flair = child['data'].get('link_flair_text', '')
-                    if flair and ('Desktop' in flair or '桌面' in flair):
-                        permalink = child['data']['permalink']
-                        full_url = f"https://www.reddit.com{permalink}"
-                        future = executor.submit(self.fetch_post_image_url, full_url)
-                        futures[future] = full_url
-                        self.logger.debug(f"🔍 提交帖子处理任务: {full_url}")
+                for post in albums:
+                    slot = self.concurrency.acquire(post['url'], ceiling=self.max_workers, source=self.metrics.source)
+                    future = executor.submit(slot.run, self.imgur.resolve, post['url'])
+                    futures[future] = post['url']
+                    self.logger.debug(f"🔍 解析 Imgur 相册: {post['url']}")
 
                 for future in concurrent.futures.as_completed(futures):
                     url = futures[future]
                     try:
-                        image_url = future.result(timeout=10)
-                        if image_url and image_url not in existing_urls:
-                            batch_urls.append(image_url)
-                            existing_urls.add(image_url)
-                            self.logger.debug(f"✅ 发现新图片URL: {image_url}")
-                        else:
-                            self.logger.debug(f"⏭️ 跳过重复或无效URL: {url}")
+                        for image_url, dimensions in future.result(timeout=10):
+                            self.remember_dimensions(image_url, dimensions)
+                            add_url(batch_urls, image_url, url)
                     except Exception as e:
                         self.logger.warning(f"⚠️ 处理帖子失败: {url} - {e}")
 
             return batch_urls
 
+        listing_resolved = 0
+        fallback_posts = 0
         batch_count = 0
         while len(unique_urls) < self.max_images:
             batch_count += 1
             self.logger.info(f"📥 获取第 {batch_count} 批帖子...")
 
-            api_url = f"https://www.reddit.com/r/Animewallpaper/.json?limit={target_count}"
+            api_url = f"{self.api_base}/r/Animewallpaper/.json?limit={target_count}"
             if after:
                 api_url += f"&after={after}"
 
             try:
-                response = requests.get(api_url, headers=self.headers)
+                with self.metrics.timer('api_page'):
+                    response = cached_get(self.session, api_url, headers=self.headers,
+                                          timeout=self.request_timeout, kind='reddit_listing')
+                self.metrics.inc('api_cache_hits' if getattr(response, 'from_cache', False) else 'api_requests')
                 if response.status_code != 200:
                     self.logger.error(f"❌ API请求失败，状态码: {response.status_code}")
                     break
@@ -260,17 +373,12 @@ class RedditImageDownloader:
                     self.logger.warning("⚠️ 没有更多帖子可获取")
                     break
 
-                batch_size = 10
+                # 整页一起处理，列表数据不足的帖子合并为一次 /api/info.json 请求
                 prev_count = len(unique_urls)
-                for i in range(0, len(posts), batch_size):
-                    batch = posts[i:i+batch_size]
-                    batch_urls = process_post_batch(batch)
-                    unique_urls.extend(batch_urls)
-                    self.logger.info(f"📊 当前唯一URL数量: {len(unique_urls)}/{self.max_images}")
-
-                    if len(unique_urls) >= self.max_images:
-                        self.logger.info("✅ 已达到目标URL数量")
-                        break
+                unique_urls.extend(process_post_batch(posts))
+                self.logger.info(f"📊 当前唯一URL数量: {len(unique_urls)}/{self.max_images}")
+                if len(unique_urls) >= self.max_images:
+                    self.logger.info("✅ 已达到目标URL数量")
 
                 # 检查是否有进展
                 if len(unique_urls) == prev_count:
@@ -301,33 +409,41 @@ class RedditImageDownloader:
                 break
 
         self.logger.info(f"✅ URL获取完成，共找到 {len(unique_urls)} 个唯一图片URL")
+        self.logger.info(f"📊 直接从列表解析 {listing_resolved} 个帖子，批量请求 {fallback_posts} 个帖子")
         return unique_urls[:target_count]
 
-    def fetch_post_image_url(self, post_url):
-        """获取单个帖子的图片URL"""
-        try:
-            self.logger.debug(f"🌐 获取帖子内容: {post_url}")
-            response = requests.get(post_url + ".json", headers=self.headers, timeout=8)
-            if response.status_code == 200:
-                image_url = extract_image_url(response.json())
-                if image_url:
-                    self.logger.debug(f"✅ 成功提取图片URL: {image_url}")
-                return image_url
-            else:
-                self.logger.warning(f"⚠️ 帖子请求失败，状态码: {response.status_code}")
-        except Exception as e:
-            self.logger.warning(f"⚠️ 获取帖子图片URL失败: {post_url} - {e}")
-        return None
+    def resolve_posts_info(self, fullnames):
+        """通过 /api/info.json?id=t3_a,t3_b,... 批量获取帖子，每 info_batch_size 个帖子一次请求
+
+        返回 {帖子全名: [(URL, 宽高), ...]}（图集展开为全部图片），请求失败的帖子不在结果中。
+        """
+        names = list(dict.fromkeys(name for name in fullnames if name))
+        results = {}
+        for i in range(0, len(names), self.info_batch_size):
+            batch = names[i:i + self.info_batch_size]
+            info_url = f"{self.api_base}/api/info.json?id={','.join(batch)}"
+            try:
+                self.logger.debug(f"🌐 批量获取 {len(batch)} 个帖子: {info_url}")
+                with self.metrics.timer('post_json'):
+                    response = cached_get(self.session, info_url, headers=self.headers,
+                                          timeout=self.request_timeout, kind='reddit_post')
+                self.metrics.inc('api_cache_hits' if getattr(response, 'from_cache', False) else 'api_requests')
+                if response.status_code != 200:
+                    self.logger.warning(f"⚠️ 批量获取帖子失败，状态码: {response.status_code}")
+                    continue
+                results.update(extract_info_images(response.json()))
+            except Exception as e:
+                self.logger.warning(f"⚠️ 批量获取帖子失败: {len(batch)} 个帖子 - {e}")
+        return results
+
+    def remember_dimensions(self, url, dimensions):
+        """记录列表元数据中已知的宽高，下载前据此过滤，不再发送 Range 探测请求"""
+        if dimensions:
+            self.probed_dimensions[url] = dimensions
 
     def get_existing_urls(self):
-        """从数据库获取所有已存在的图片URL"""
-        existing_urls = set()
-        with self.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT url FROM images")
-            existing_urls = {row[0] for row in cursor.fetchall()}
-        self.logger.debug(f"📋 从数据库加载 {len(existing_urls)} 个现有URL")
-        return existing_urls
+        """获取数据库中已存在图片URL的成员索引（进程内共享，写库时增量更新）"""
+        return get_membership_index(self.db_path, 'url')
 
     def is_likely_duplicate(self, image_url):
         """基于URL特征判断图片是否可能重复"""
@@ -338,15 +454,11 @@ class RedditImageDownloader:
             return True
         return False
 
-    def rate_limit_delay(self):
-        """控制请求频率"""
-        current_time = time.time()
-        elapsed = current_time - self.last_request_time
-        if elapsed < self.min_request_interval:
-            sleep_time = self.min_request_interval - elapsed + random.uniform(0.1, 0.5)
-            print(f"⏳ 请求间隔控制: 等待 {sleep_time:.1f} 秒")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
+    def rate_limit_delay(self, url=None):
+        """控制请求频率：等待共享令牌桶放行（通过 self.session 发出的请求已自动限流）"""
+        waited = self.rate_limiter.acquire(url or f"{self.api_base}/")
+        if waited:
+            self.logger.debug(f"⏳ 请求间隔控制: 等待 {waited:.1f} 秒")
 
     def is_valid_image_url(self, url):
         """检查URL是否指向有效图片"""
@@ -361,11 +473,101 @@ class RedditImageDownloader:
 
         return True
 
+    def owned_elsewhere(self, hash_value=None, url=None):
+        """统一目录中其他来源已有该图片时返回来源名（哈希优先，其次 URL 与跳过记录），否则返回 None"""
+        if self.catalog is None:
+            return None
+        owner = self.catalog.find(hash_value=hash_value, url=url, source='reddit')
+        return owner if owner not in (None, 'reddit') else None
+
+    def precheck_catalog(self, url):
+        """下载前检查：其他来源已有该 URL 的图片（或之前下载后判定为同一图片）时跳过，返回是否需要下载"""
+        owner = self.owned_elsewhere(url=url)
+        if owner is not None:
+            self.logger.debug(f"⏭️ 图片已存在于 {owner} 来源，跳过下载: {url}")
+            return False
+        return True
+
+    def precheck(self, url):
+        """下载前检查：统一目录与分辨率过滤，返回是否需要下载"""
+        return self.precheck_catalog(url) and self.check_resolution(url)
+
+    def check_resolution(self, url):
+        """下载前检查宽高，不符合分辨率 / 宽高比要求时返回 False
+
+        优先使用列表元数据（media_metadata / preview）中的宽高，未知时用 Range 请求读取图片开头解析。
+        未配置过滤规则、关闭探测或无法解析时返回 True，由完整下载后的检查兜底。
+        """
+        if not self.resolution_filter.active:
+            return True
+        dimensions = self.probed_dimensions.get(url)
+        if dimensions is None:
+            if not self.probe_resolution:
+                return True
+            try:
+                with self.metrics.timer('image_probe'):
+                    dimensions = probe_dimensions(self.session, url, self.headers, self.request_timeout,
+                                                  self.probe_bytes)
+            except requests.exceptions.RequestException as e:
+                self.logger.debug(f"⚠️ 探测分辨率失败，直接下载: {url} - {e}")
+                return True
+            if dimensions is None:
+                return True
+            self.probed_dimensions[url] = dimensions
+        reason = self.resolution_filter.check(*dimensions)
+        if reason:
+            self.probed_dimensions.pop(url, None)
+            self.metrics.inc('images_filtered')
+            self.logger.debug(f"⏭️ {reason}，跳过: {url}")
+            return False
+        return True
+
+    def _finalize_download(self, writer, content_type, url):
+        """下载完成后：按哈希命名、原子重命名并写入数据库"""
+        # 优先使用 CPU 阶段从完整文件解析的宽高，其次是下载前探测的结果
+        probed = self.probed_dimensions.pop(url, None)
+        dimensions = writer.dimensions or probed
+        reason = self.resolution_filter.check(*dimensions) if dimensions else None
+        if reason:
+            self.metrics.inc('images_filtered')
+            self.logger.debug(f"⏭️ {reason}，跳过: {url}")
+            return False
+
+        # 获取文件扩展名
+        file_extension = self.get_file_extension(content_type, url)
+        image_hash = writer.hexdigest
+
+        # 生成安全的文件名
+        filename = self.generate_safe_filename(image_hash, file_extension)
+
+        # 构造保存路径
+        save_path = os.path.join(self.save_dir, filename)
+
+        # 记录路径信息
+        self.logger.debug(f"💾 保存路径: {save_path}")
+
+        # 统一目录中其他来源已有相同图片时跳过并记录别名，下次运行在下载前跳过（未提交的临时文件由调用方清理）
+        owner = self.owned_elsewhere(hash_value=image_hash)
+        if owner is not None:
+            self.logger.info(f"⏭️ 图片已存在于 {owner} 来源，跳过: {url}")
+            self.catalog.add_alias('reddit', url, owner, image_hash)
+            return False
+
+        # 原子重命名为最终文件名
+        writer.commit(save_path)
+        self.save_image_record(filename, image_hash, url, format_resolution(dimensions))
+        # 逐张的成功信息记为 DEBUG，进度由 ProgressReporter 汇总输出
+        self.logger.debug(f"✅ 下载成功: {url} -> {filename}")
+        return True
+
     def download_image_optimized(self, url):
         """优化后的下载方法"""
+        if not self.precheck(url):
+            return False
         try:
             # 发送请求
-            response = requests.get(
+            started = time.perf_counter()
+            response = self.session.get(
                 url,
                 headers=self.headers,
                 stream=True,
@@ -379,34 +581,21 @@ class RedditImageDownloader:
                 self.logger.warning(f"⚠️ 非图片内容类型: {content_type} - {url}")
                 return False
 
-            # 获取文件扩展名
-            file_extension = self.get_file_extension(content_type, url)
-
-            # 读取内容并计算哈希
-            image_data = response.content
-            image_hash = self.calculate_image_hash(image_data)
-
-            # 生成安全的文件名
-            filename = self.generate_safe_filename(image_hash, file_extension)
-
-            # 确保下载目录存在
-            os.makedirs(self.save_dir, exist_ok=True)
-
-            # 构造保存路径
-            save_path = os.path.join(self.save_dir, filename)
-
-            # 记录路径信息
-            self.logger.debug(f"💾 保存路径: {save_path}")
-
-            # 保存图片
-            with open(save_path, 'wb') as f:
-                f.write(image_data)
-            self.insert_image(filename, image_hash, url)
-            # 记录成功信息
-            self.logger.info(f"✅ 下载成功: {url} -> {filename}")
-            return True
-
+            # 流式写入临时文件；未启用 CPU 阶段时同时增量计算哈希
+            with ImageStreamWriter(self.save_dir, content_type, inline_hash=self.cpu_stage is None) as writer:
+                for chunk in response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE):
+                    writer.write(chunk)
+                elapsed = time.perf_counter() - started
+                if self.cpu_stage is not None:
+                    self.cpu_stage.process(writer)
+                result = self._finalize_download(writer, content_type, url)
+                self.metrics.record_download(writer, elapsed)
+                return result
+
+        except InvalidImageError as e:
+            self.logger.warning(f"⚠️ 无效的图片数据: {url} - {e}")
         except requests.exceptions.RequestException as e:
+            self.concurrency.record_exception(url, e)
             self.logger.error(f"❌ 网络错误: {url} - {e}")
         except OSError as e:
             self.logger.error(f"❌ 文件系统错误: {url} - {e}")
@@ -416,41 +605,61 @@ class RedditImageDownloader:
         return False
 
     def mark_missing_images_unstable(self):
-        """扫描保存目录文件，若数据库记录的图片文件不存在则将其 stable 设为 0"""
+        """对比保存目录与文件索引，将文件已不存在的数据库记录的 stable 设为 0
+
+        目录 mtime 未变化时跳过扫描，否则用 os.scandir 扫描一次并差异更新索引，
+        最后用一条集合 UPDATE 完成标记。
+        """
         self.logger.info("🔁 检查数据库记录与本地文件一致性...")
         try:
-            files = {f for f in os.listdir(self.save_dir) if os.path.isfile(os.path.join(self.save_dir, f))}
-        except Exception as e:
+            updated = self.file_index.mark_missing()
+        except OSError as e:
             self.logger.error(f"❌ 无法访问保存目录: {e}")
             return 0
-
-        updated = 0
-        try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name, stable FROM images")
-                rows = cursor.fetchall()
-                for row in rows:
-                    row_id = row['id']
-                    name = row['name']
-                    stable = row['stable']
-                    if name not in files and stable != 0:
-                        cursor.execute("UPDATE images SET stable = 0 WHERE id = ?", (row_id,))
-                        updated += 1
-            if updated:
-                self.logger.info(f"⚠️ 标记 {updated} 条数据库记录为 unstable (stable=0)")
-            else:
-                self.logger.info("✅ 数据库中的图片文件均存在，无需更新")
         except sqlite3.Error as e:
             self.logger.error(f"❌ 更新数据库时出错: {e}")
+            return 0
+
+        if updated:
+            self.logger.info(f"⚠️ 标记 {updated} 条数据库记录为 unstable (stable=0)")
+            if self.catalog is not None:
+                self.catalog.import_source('reddit', self.db_path)  # 同步 stable 状态到统一目录
+        else:
+            self.logger.info("✅ 数据库中的图片文件均存在，无需更新")
         return updated
 
-    def run(self):
-        """运行下载任务"""
+    def download_images_async(self, urls, progress=None):
+        """使用 aiohttp 异步引擎并发下载，返回成功数量"""
+        from src.async_engine import AsyncDownloadEngine, DownloadJob
+
+        engine = AsyncDownloadEngine(
+            headers=self.headers,
+            download_timeout=self.download_timeout,
+            max_concurrency=self.async_max_concurrency,
+            per_host_limit=self.async_per_host_limit,
+            metrics=self.metrics,
+            progress=progress,
+            cpu_stage=self.cpu_stage,
+            logger=self.logger
+        )
+        jobs = [
+            DownloadJob(url, self.save_dir, functools.partial(self._finalize_download, url=url),
+                        precheck=functools.partial(self.precheck, url))
+            for url in urls
+        ]
+        return sum(engine.run(jobs))
+
+    def run(self, use_async=False):
+        """运行下载任务
+
+        Args:
+            use_async: 为 True 时使用 aiohttp 异步引擎下载，否则使用线程池
+        """
         self.logger.info("🎬 开始运行下载任务...")
-        # 重新加载现有的hash和URL集合
-        self.existing_hashes = get_existing_hashes(self.save_dir, self.db_path)
-        self.logger.info(f"🔍 重新加载 {len(self.existing_hashes)} 个现有图片哈希")
+        self.metrics.reset()
+        start_metrics_server(self.logger)
+        # 成员索引在写库时增量更新，无需重新加载
+        self.logger.info(f"🔍 现有 {len(self.existing_hashes)} 个图片哈希")
 
         # 将数据库与磁盘文件同步：标记缺失的图片为 unstable
       #  updated_count = self.mark_missing_images_unstable()
@@ -469,26 +678,48 @@ class RedditImageDownloader:
 
         # 并发下载
         self.logger.info("🚀 开始并发下载图片...")
-        processed = 0
         successful_downloads = 0
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(self.download_image_optimized, url): url for url in image_urls}
-            for future in concurrent.futures.as_completed(futures):
-                url = futures[future]
-                processed += 1
-                try:
-                    if future.result():
-                        successful_downloads += 1
-                        self.logger.info(f"✅ 进度: {successful_downloads}/{len(image_urls)} - {url}")
-                    else:
-                        self.logger.warning(f"⚠️ 下载失败或跳过: {url}")
-                except Exception as e:
-                    self.logger.error(f"❌ 下载异常: {e} - {url}")
-
-                # 每10个进度报告一次
-                if processed % 10 == 0:
-                    self.logger.info(f"📊 处理进度: {processed}/{len(image_urls)}")
+        self.progress = ProgressReporter(self.logger, total=len(image_urls))
+
+        # 启动批量写库线程，下载结束后写入剩余记录
+        if self.catalog is not None:
+            self.catalog_writer = self.catalog.create_writer(self.db_batch_size, self.db_flush_interval, self.logger)
+            self.catalog_writer.start()
+        self.db_writer = self._create_db_writer()
+        self.db_writer.start()
+        try:
+            if use_async:
+                successful_downloads = self.download_images_async(image_urls, self.progress)
+                self.metrics.inc('images_downloaded', successful_downloads)
+                self.metrics.inc('images_failed', len(image_urls) - successful_downloads)
+            else:
+                # 线程池大小为并发上限，实际同时下载数由自适应控制器按主机调整
+                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = {}
+                    for url in image_urls:
+                        slot = self.concurrency.acquire(url, ceiling=self.max_workers,
+                                                        source=self.metrics.source)
+                        futures[self.progress.track(executor.submit(slot.run, self.download_image_optimized, url))] = url
+                    for future in concurrent.futures.as_completed(futures):
+                        url = futures[future]
+                        ok = False
+                        try:
+                            ok = bool(future.result())
+                            if not ok:
+                                self.logger.debug(f"⚠️ 下载失败或跳过: {url}")
+                        except Exception as e:
+                            self.logger.error(f"❌ 下载异常: {e} - {url}")
+                        successful_downloads += ok
+                        self.metrics.inc('images_downloaded' if ok else 'images_failed')
+        finally:
+            self.progress.finish()
+            self.db_writer.close()
+            self.logger.info(f"💾 批量写库完成: 新增 {self.db_writer.inserted_count} 条，"
+                             f"冲突 {self.db_writer.conflict_count} 条，共提交 {self.db_writer.flush_count} 次")
+            self.db_writer = None
+            if self.catalog_writer is not None:
+                self.catalog_writer.close()
+                self.catalog_writer = None
 
         # 最终统计
         total_in_db = len(self.get_existing_urls())
@@ -497,4 +728,6 @@ class RedditImageDownloader:
 
         # 性能统计
         success_rate = (successful_downloads / len(image_urls)) * 100 if image_urls else 0
-        self.logger.info(f"📈 成功率: {success_rate:.1f}%")
\ No newline at end of file
+        self.logger.info(f"📈 成功率: {success_rate:.1f}%")
+        self.logger.info(f"🎛️ 各主机并发上限: {self.concurrency.limits()}")
+        report_summary(self.metrics, self.logger)
\ No newline at end of file
@@ -6,17 +6,31 @@ import time
 import sqlite3
 import re
 import concurrent.futures
-from datetime import datetime
+import functools
+import threading
 from contextlib import contextmanager
 from urllib.parse import urlencode
 from config import WALLHAVEN_CONFIG
-from src.utils import get_existing_hashes, is_valid_image,existed_picture
+from src.utils import get_existing_hashes, existed_picture
+from src.http_client import get_session
+from src.log_setup import ProgressReporter, setup_logging
+from src.http_cache import cached_get
+from src.rate_limiter import get_rate_limiter
+from src.concurrency import get_concurrency_controller
+from src.cpu_stage import get_cpu_stage
+from src.db_pool import get_pool
+from src.db_writer import BatchedDBWriter
+from src.file_index import FileIndex
+from src.catalog import get_catalog
+from src.membership import get_membership_index
+from src.metrics import get_metrics, report_summary, start_metrics_server
+from src.stream_writer import ResumableImageWriter, InvalidImageError, part_path_for
 
 
 class WallhavenImageDownloader:
     def __init__(self):
-        # 初始化日志系统
-        self._setup_logging()
+        # 初始化日志系统（进程内共享，多次调用只配置一次）
+        setup_logging()
 
         self.logger = logging.getLogger('WallhavenImageDownloader')
         self.logger.info("🚀 初始化 Wallhaven 图片下载器...")
@@ -44,10 +58,29 @@ class WallhavenImageDownloader:
         
         self.request_timeout = WALLHAVEN_CONFIG.get('request_timeout')
         self.download_timeout = WALLHAVEN_CONFIG.get('download_timeout')
+        self.download_retries = WALLHAVEN_CONFIG.get('download_retries', 3)
         self.sleep_time = WALLHAVEN_CONFIG.get('sleep_time')
+        self.session = get_session()  # 共享的 HTTP 连接池（keep-alive + 重试 + 限流）
+        self.rate_limiter = get_rate_limiter()  # 按主机的令牌桶限流器（所有线程共享）
         self.db_path = WALLHAVEN_CONFIG.get('db_path')
-        self.conn_pool = []
         self.max_connections = 5
+        self.conn_pool = get_pool(self.db_path, self.max_connections)
+        # 批量写库：攒够 db_batch_size 条或每 db_flush_interval 秒提交一次
+        self.db_batch_size = WALLHAVEN_CONFIG.get('db_batch_size', 50)
+        self.db_flush_interval = WALLHAVEN_CONFIG.get('db_flush_interval', 1.0)
+        self.db_writer = None  # 仅在 run() 期间存在
+        self.catalog = get_catalog()  # 跨来源统一目录（未启用时为 None）
+        self.catalog_writer = None  # 仅在 run() 期间存在
+        self.progress = None  # 运行中的进度汇总（供多源调度器读取合并进度）
+        self.metrics = get_metrics('wallhaven')  # 各阶段耗时与计数
+        # 搜索与下载流水线中等待/正在下载的最大任务数
+        self.download_queue_size = WALLHAVEN_CONFIG.get('download_queue_size', 24)
+        self.max_workers = WALLHAVEN_CONFIG.get('max_workers', 16)  # 线程池大小（并发上限）
+        self.concurrency = get_concurrency_controller()  # 按主机的自适应并发控制（所有线程共享）
+        self.cpu_stage = get_cpu_stage()  # MD5 与完整性校验的进程池（未启用时为 None）
+        # 异步下载并发限制
+        self.async_max_concurrency = WALLHAVEN_CONFIG.get('async_max_concurrency', 100)
+        self.async_per_host_limit = WALLHAVEN_CONFIG.get('async_per_host_limit', 16)
 
         # 创建保存目录
         os.makedirs(self.save_dir, exist_ok=True)
@@ -55,47 +88,25 @@ class WallhavenImageDownloader:
 
         # 初始化数据库
         self.init_database()
-        # 获取现有图片哈希值
-        self.existing_hashes = get_existing_hashes(self.save_dir, self.db_path)
-        self.logger.info(f"🔍 发现 {len(self.existing_hashes)} 个已存在的图片文件")
-        self.existed_picture=existed_picture(self.db_path)
-        self.logger.info(f"🔍 文件中有 {len(self.existed_picture)} 个已存在的图片文件")
+        self.file_index = FileIndex(self.conn_pool, self.save_dir, logger=self.logger)  # 保存目录的文件索引
+        # 已有图片的哈希索引在首次使用时才从数据库加载（见 existing_hashes / existed_picture）
         self.logger.info("✅ Wallhaven下载器初始化完成")
 
-    def _setup_logging(self):
-        """设置日志系统"""
-        # 创建日志目录
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-
-        # 设置日志文件名（带时间戳）
-        log_filename = f"{log_dir}/wallhaven_downloader_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-
-        # 配置日志
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_filename, encoding='utf-8'),
-                logging.StreamHandler()  # 同时输出到控制台
-            ]
-        )
+    @property
+    def existing_hashes(self):
+        """数据库中所有图片哈希的成员索引（首次访问时加载，进程内共享）"""
+        return get_existing_hashes(self.save_dir, self.db_path)
 
-        # 设置第三方库的日志级别为WARNING，避免过多调试信息
-        logging.getLogger('requests').setLevel(logging.WARNING)
-        logging.getLogger('urllib3').setLevel(logging.WARNING)
+    @property
+    def existed_picture(self):
+        """stable=1 的图片哈希的成员索引（首次访问时加载，进程内共享）"""
+        return existed_picture(self.db_path)
 
     @contextmanager
     def get_db_connection(self):
-        """数据库连接上下文管理器"""
-        if self.conn_pool:
-            conn = self.conn_pool.pop()
-            self.logger.debug("♻️ 从连接池获取数据库连接")
-        else:
-            conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
-            self.logger.debug("🆕 创建新的数据库连接")
-
+        """数据库连接上下文管理器（从有界连接池获取连接）"""
+        conn = self.conn_pool.acquire()
+        self.logger.debug("♻️ 从连接池获取数据库连接")
         try:
             yield conn
             conn.commit()
@@ -105,32 +116,30 @@ class WallhavenImageDownloader:
             self.logger.error(f"❌ 数据库事务回滚: {e}")
             raise
         finally:
-            self.conn_pool.append(conn)
+            self.conn_pool.release(conn)
             self.logger.debug("🔙 数据库连接归还到连接池")
 
     def init_database(self):
         """初始化数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS images (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    wallhaven_id TEXT NOT NULL UNIQUE,
-                    name TEXT NOT NULL,
-                    hash TEXT NOT NULL UNIQUE,
-                    url TEXT NOT NULL UNIQUE,
-                    source_url TEXT,
-                    resolution TEXT,
-                    stable INTEGER NOT NULL DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_url ON images(url)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_hash ON images(hash)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_wallhaven_id ON images(wallhaven_id)')
-            conn.commit()
-            conn.close()
+            with self.conn_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS images (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        wallhaven_id TEXT NOT NULL UNIQUE,
+                        name TEXT NOT NULL,
+                        hash TEXT NOT NULL UNIQUE,
+                        url TEXT NOT NULL UNIQUE,
+                        source_url TEXT,
+                        resolution TEXT,
+                        stable INTEGER NOT NULL DEFAULT 1,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_url ON images(url)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_hash ON images(hash)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_wallhaven_id ON images(wallhaven_id)')
             self.logger.info("✅ 数据库初始化完成")
         except sqlite3.Error as e:
             self.logger.error(f"❌ 数据库初始化错误: {e}")
@@ -138,15 +147,12 @@ class WallhavenImageDownloader:
     def insert_image(self, wallhaven_id, name, hash_value, url, source_url, resolution='unknown'):
         """插入图片信息到数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO images (wallhaven_id, name, hash, url, source_url, resolution) VALUES (?, ?, ?, ?, ?, ?)",
-                (wallhaven_id, name, hash_value, url, source_url, resolution)
-            )
-            conn.commit()
-            conn.close()
-            self.logger.info(f"💾 图片信息已保存到数据库: {name}")
+            with self.conn_pool.connection() as conn:
+                conn.execute(
+                    "INSERT INTO images (wallhaven_id, name, hash, url, source_url, resolution) VALUES (?, ?, ?, ?, ?, ?)",
+                    (wallhaven_id, name, hash_value, url, source_url, resolution)
+                )
+            self.logger.debug(f"💾 图片信息已保存到数据库: {name}")
             return True
         except sqlite3.IntegrityError as e:
             if "hash" in str(e):
@@ -160,6 +166,67 @@ class WallhavenImageDownloader:
             self.logger.error(f"❌ 插入数据库错误: {e}")
             return False
 
+    def _create_db_writer(self):
+        """创建批量写库线程，记录格式为 (wallhaven_id, name, hash, url, source_url, resolution)"""
+        return BatchedDBWriter(
+            self.conn_pool,
+            "INSERT INTO images (wallhaven_id, name, hash, url, source_url, resolution) VALUES (?, ?, ?, ?, ?, ?)",
+            batch_size=self.db_batch_size,
+            flush_interval=self.db_flush_interval,
+            on_inserted=self._on_record_inserted,
+            on_conflict=self._report_db_conflict,
+            after_flush=lambda conn, inserted: self.file_index.record_names(conn, [(record[1], record[2]) for record in inserted]),
+            metrics=self.metrics,
+            logger=self.logger
+        )
+
+    def _on_record_inserted(self, record):
+        """记录写入本来源数据库后，同步到统一目录"""
+        self.logger.debug(f"💾 图片信息已保存到数据库: {record[1]}")
+        wallhaven_id, name, hash_value, url = record[:4]
+        self.existing_hashes.add(hash_value)
+        self.existed_picture.add(hash_value)
+        self.get_existing_urls().add(url)
+        self.get_existing_wallhaven_ids().add(wallhaven_id)
+        if self.catalog is None:
+            return
+        catalog_record = self._catalog_record(record)
+        if self.catalog_writer is not None:
+            self.catalog_writer.submit(catalog_record)
+        else:
+            self.catalog.add(catalog_record)
+
+    @staticmethod
+    def _catalog_record(record):
+        """把本来源的记录 (wallhaven_id, name, hash, url, source_url, resolution) 转换为统一目录的记录格式"""
+        wallhaven_id, name, hash_value, url, source_url, resolution = record
+        return ('wallhaven', wallhaven_id, name, hash_value, url, source_url, resolution)
+
+    def _report_db_conflict(self, record, error):
+        """逐条报告批量写库时的唯一键冲突"""
+        wallhaven_id, name, hash_value, url, source_url, resolution = record
+        if "hash" in str(error):
+            self.logger.warning(f"⏭️ 图片hash已存在，跳过: {url}")
+        elif "url" in str(error):
+            self.logger.warning(f"⏭️ 图片URL已存在，跳过: {url}")
+        elif "wallhaven_id" in str(error):
+            self.logger.warning(f"⏭️ Wallhaven ID已存在，跳过: {wallhaven_id}")
+
+    def save_image_record(self, wallhaven_id, name, hash_value, url, source_url, resolution='unknown'):
+        """保存图片记录：运行中交给批量写库线程，否则直接写入
+
+        交给写库线程时立即返回 True（只表示已排队，写入结果由 on_inserted / on_conflict 回调处理）；
+        直接写入时返回是否插入成功。
+        """
+        if self.db_writer is not None:
+            self.db_writer.submit((wallhaven_id, name, hash_value, url, source_url, resolution))
+            return True
+        self.file_index.record(name, hash_value)
+        inserted = self.insert_image(wallhaven_id, name, hash_value, url, source_url, resolution)
+        if inserted:
+            self._on_record_inserted((wallhaven_id, name, hash_value, url, source_url, resolution))
+        return inserted
+
     def get_file_extension(self, content_type, url):
         """从内容类型或URL中获取文件扩展名"""
         # 从内容类型获取扩展名
@@ -227,12 +294,18 @@ class WallhavenImageDownloader:
                 self.logger.debug(f"🔍 请求参数: {params}")
                 full_url = f"{self.api_url}?{urlencode(params)}"
                 self.logger.info(f"🔗 完整请求地址: {full_url}")
-                response = requests.get(
-                    self.api_url,
-                    params=params,
-                    headers=self.headers,
-                    timeout=self.request_timeout
-                )
+                # random 排序每次结果不同，不走缓存
+                cache_kind = None if self.sorting == 'random' else 'wallhaven_search'
+                with self.metrics.timer('api_page'):
+                    response = cached_get(
+                        self.session,
+                        self.api_url,
+                        params=params,
+                        headers=self.headers,
+                        timeout=self.request_timeout,
+                        kind=cache_kind
+                    )
+                self.metrics.inc('api_cache_hits' if getattr(response, 'from_cache', False) else 'api_requests')
 
                 self.logger.debug(f"📡 API 响应状态码: {response.status_code}")
                 
@@ -240,11 +313,9 @@ class WallhavenImageDownloader:
                     self.logger.error(f"❌ API请求失败，状态码: {response.status_code}")
                     self.logger.debug(f"响应内容: {response.text[:200]}")
                     
-                    # 429 太多请求，等待后重试
+                    # 429 太多请求：限流器已按 Retry-After 暂停该主机，下次请求会自动等待
                     if response.status_code == 429:
-                        wait_time = 5 * (attempt + 1)
-                        self.logger.warning(f"⏳ 速率限制，等待 {wait_time} 秒后重试...")
-                        time.sleep(wait_time)
+                        self.logger.warning("⏳ 速率限制，等待限流器放行后重试...")
                         continue
                     
                     # 5xx 服务器错误，等待后重试
@@ -314,19 +385,26 @@ class WallhavenImageDownloader:
 
     def get_unique_image_urls(self, target_count):
         """获取指定数量的唯一图片URL"""
+        return list(self.iter_unique_images(target_count))
+
+    def iter_unique_images(self, target_count):
+        """逐页搜索 Wallhaven，边搜索边产出新图片 (url, wallhaven_id, item)
+
+        每一页的新图片会立即产出，调用方可以在获取下一页的同时开始下载。
+        """
         self.logger.info(f"🎯 开始获取 {target_count} 个唯一图片URL...")
 
-        unique_urls = []
-        unique_wallhaven_ids = set()
+        found_count = 0
         existing_urls = self.get_existing_urls()
         existing_ids = self.get_existing_wallhaven_ids()
+        seen_ids = set()  # 本次搜索中已找到的 Wallhaven ID
 
         self.logger.info(f"📊 数据库中已有 {len(existing_urls)} 个图片记录")
 
         page = self.default_pages 
         max_pages = self.max_pages  # 最多尝试5页
         
-        while len(unique_urls) < target_count and page <= max_pages:
+        while found_count < target_count and page <= max_pages:
             self.logger.info(f"📥 获取第 {page} 页...")
 
             data = self.search_wallhaven(page=page)
@@ -340,193 +418,255 @@ class WallhavenImageDownloader:
                 break
 
             for item in items:
-                if len(unique_urls) >= target_count:
+                if found_count >= target_count:
                     break
 
                 try:
                     wallhaven_id = item.get('id')
                     path = item.get('path')  # 高清壁纸URL
                     
-                    if not path or wallhaven_id in existing_ids or path in existing_urls:
+                    if not path or wallhaven_id in existing_ids or path in existing_urls or wallhaven_id in seen_ids:
                         continue
 
-                    unique_urls.append((path, wallhaven_id, item))
-                    unique_wallhaven_ids.add(wallhaven_id)
+                    seen_ids.add(wallhaven_id)
+                    found_count += 1
                     self.logger.debug(f"✅ 发现新图片: {wallhaven_id}")
 
                 except (KeyError, TypeError) as e:
                     self.logger.warning(f"⚠️ 解析图片数据失败: {e}")
                     continue
 
-            self.logger.info(f"📊 当前唯一URL数量: {len(unique_urls)}/{target_count}")
+                yield path, wallhaven_id, item
+
+            self.logger.info(f"📊 当前唯一URL数量: {found_count}/{target_count}")
             page += 1
-            time.sleep(self.sleep_time)  # 遵守速率限制
+            if found_count < target_count and not self.rate_limiter.has_limit(self.api_url):
+                time.sleep(self.sleep_time)  # 未配置令牌桶时使用固定间隔遵守速率限制
 
-        self.logger.info(f"✅ URL获取完成，共找到 {len(unique_urls)} 个唯一图片URL")
-        return unique_urls[:target_count]
+        self.logger.info(f"✅ URL获取完成，共找到 {found_count} 个唯一图片URL")
 
     def get_existing_urls(self):
-        """从数据库获取所有已存在的图片URL"""
-        existing_urls = set()
-        with self.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT url FROM images")
-            existing_urls = {row[0] for row in cursor.fetchall()}
-        self.logger.debug(f"📋 从数据库加载 {len(existing_urls)} 个现有URL")
-        return existing_urls
+        """获取数据库中已存在图片URL的成员索引（进程内共享，写库时增量更新）"""
+        return get_membership_index(self.db_path, 'url')
 
     def get_existing_wallhaven_ids(self):
-        """从数据库获取所有已存在的Wallhaven ID"""
-        existing_ids = set()
-        with self.get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT wallhaven_id FROM images")
-            existing_ids = {row[0] for row in cursor.fetchall()}
-        self.logger.debug(f"📋 从数据库加载 {len(existing_ids)} 个现有Wallhaven ID")
-        return existing_ids
+        """获取数据库中已存在 Wallhaven ID 的成员索引（进程内共享，写库时增量更新）"""
+        return get_membership_index(self.db_path, 'wallhaven_id')
+
+    def owned_elsewhere(self, hash_value=None, url=None):
+        """统一目录中其他来源已有该图片时返回来源名（哈希优先，其次 URL 与跳过记录），否则返回 None"""
+        if self.catalog is None:
+            return None
+        owner = self.catalog.find(hash_value=hash_value, url=url, source='wallhaven')
+        return owner if owner not in (None, 'wallhaven') else None
+
+    def precheck_catalog(self, url):
+        """下载前检查：其他来源已有该 URL 的图片（或之前下载后判定为同一图片）时跳过，返回是否需要下载"""
+        owner = self.owned_elsewhere(url=url)
+        if owner is not None:
+            self.logger.debug(f"⏭️ 图片已存在于 {owner} 来源，跳过下载: {url}")
+            return False
+        return True
+
+    def _finalize_download(self, writer, content_type, url, wallhaven_id, item_data):
+        """下载完成后：按 Wallhaven ID 命名、原子重命名并写入数据库"""
+        # 获取文件扩展名
+        file_extension = self.get_file_extension(content_type, url)
+
+        # 生成文件名：wallhaven_ + wallhaven_id
+        safe_id = re.sub(r'[^a-zA-Z0-9]', '', wallhaven_id)
+        filename = f"wallhaven_{safe_id}.{file_extension}"
+
+        # 构造保存路径
+        save_path = os.path.join(self.save_dir, filename)
+        # 统一目录中其他来源已有相同图片时跳过并记录别名，下次运行在下载前跳过（未提交的临时文件由调用方清理）
+        owner = self.owned_elsewhere(hash_value=writer.hexdigest)
+        if owner is not None:
+            self.logger.info(f"⏭️ 图片已存在于 {owner} 来源，跳过: {wallhaven_id}")
+            self.catalog.add_alias('wallhaven', url, owner, writer.hexdigest)
+            return False
+
+        image_hash = writer.hexdigest
+        writer.commit(save_path)
+
+        # 获取分辨率信息
+        resolution = item_data.get('resolution', 'unknown')
+        source_url = item_data.get('short_url', url)
+
+        # 保存到数据库
+        self.save_image_record(wallhaven_id, filename, image_hash, url, source_url, resolution)
+
+        # 逐张的成功信息记为 DEBUG，进度由 ProgressReporter 汇总输出
+        self.logger.debug(f"✅ 下载成功: {wallhaven_id} -> {filename}")
+        return True
 
     def download_image_optimized(self, url, wallhaven_id, item_data):
-        """优化后的下载方法"""
-        try:
-            # 发送请求
-            response = requests.get(
-                url,
-                headers=self.headers,
-                stream=True,
-                timeout=self.download_timeout
-            )
-            response.raise_for_status()
-
-            # 验证内容类型
-            content_type = response.headers.get('content-type', '').lower()
-            if 'image' not in content_type:
-                self.logger.warning(f"⚠️ 非图片内容类型: {content_type} - {url}")
-                return False
-
-            # 获取文件扩展名
-            file_extension = self.get_file_extension(content_type, url)
-
-            # 读取内容并计算哈希
-            image_data = response.content
-            
-            # 验证图片有效性
-            if not is_valid_image(image_data, content_type):
-                self.logger.warning(f"⚠️ 无效的图片数据: {url}")
-                return False
-
-            image_hash = self.calculate_image_hash(image_data)
-
-            # 生成文件名：wallhaven_ + wallhaven_id
-            safe_id = re.sub(r'[^a-zA-Z0-9]', '', wallhaven_id)
-            filename = f"wallhaven_{safe_id}.{file_extension}"
-
-            # 确保下载目录存在
-            os.makedirs(self.save_dir, exist_ok=True)
-
-            # 构造保存路径
-            save_path = os.path.join(self.save_dir, filename)
-
-            # 保存图片
-            with open(save_path, 'wb') as f:
-                f.write(image_data)
-
-            # 获取分辨率信息
-            resolution = item_data.get('resolution', 'unknown')
-            source_url = item_data.get('short_url', url)
-
-            # 保存到数据库
-            self.insert_image(wallhaven_id, filename, image_hash, url, source_url, resolution)
-
-            # 记录成功信息
-            self.logger.info(f"✅ 下载成功: {wallhaven_id} -> {filename}")
-            return True
+        """优化后的下载方法（支持断点续传）"""
+        if not self.precheck_catalog(url):
+            return False
+        # 未完成的数据按 URL 保存在 .part 文件中，超时重试或下次运行时用 Range 请求继续下载
+        part_path = part_path_for(self.save_dir, url)
 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"❌ 网络错误: {url} - {e}")
-        except OSError as e:
-            self.logger.error(f"❌ 文件系统错误: {url} - {e}")
-        except Exception as e:
-            self.logger.error(f"❌ 未知错误: {url} - {e}")
+        for attempt in range(1, self.download_retries + 1):
+            try:
+                with ResumableImageWriter(part_path, url, inline_hash=self.cpu_stage is None) as writer:
+                    if writer.resume_from:
+                        self.logger.info(f"⏯️ 从 {writer.resume_from} 字节处续传: {wallhaven_id}")
+                    started = time.perf_counter()
+                    content_type = writer.fetch(self.session, url, self.headers, self.download_timeout)
+                    elapsed = time.perf_counter() - started
+                    if self.cpu_stage is not None:
+                        self.cpu_stage.process(writer)
+                    result = self._finalize_download(writer, content_type, url, wallhaven_id, item_data)
+                    self.metrics.record_download(writer, elapsed)
+                    return result
+
+            except InvalidImageError as e:
+                self.logger.warning(f"⚠️ 无效的图片数据: {url} - {e}")
+            except requests.exceptions.RequestException as e:
+                self.concurrency.record_exception(url, e)
+                if attempt < self.download_retries:
+                    self.logger.warning(f"⏳ 下载中断，准备续传（第 {attempt}/{self.download_retries} 次）: {url} - {e}")
+                    continue
+                self.logger.error(f"❌ 网络错误: {url} - {e}")
+            except OSError as e:
+                self.logger.error(f"❌ 文件系统错误: {url} - {e}")
+            except Exception as e:
+                self.logger.error(f"❌ 未知错误: {url} - {e}")
+            break
 
         return False
 
     def mark_missing_images_unstable(self):
-        """扫描保存目录文件，若数据库记录的图片文件不存在则将其 stable 设为 0"""
+        """对比保存目录与文件索引，将文件已不存在的数据库记录的 stable 设为 0
+
+        目录 mtime 未变化时跳过扫描，否则用 os.scandir 扫描一次并差异更新索引，
+        最后用一条集合 UPDATE 完成标记。
+        """
         self.logger.info("🔁 检查数据库记录与本地文件一致性...")
         try:
-            files = {f for f in os.listdir(self.save_dir) if os.path.isfile(os.path.join(self.save_dir, f))}
-        except Exception as e:
+            updated = self.file_index.mark_missing()
+        except OSError as e:
             self.logger.error(f"❌ 无法访问保存目录: {e}")
             return 0
-
-        updated = 0
-        try:
-            with self.get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name, stable FROM images")
-                rows = cursor.fetchall()
-                for row in rows:
-                    row_id = row['id']
-                    name = row['name']
-                    stable = row['stable']
-                    if name not in files and stable != 0:
-                        cursor.execute("UPDATE images SET stable = 0 WHERE id = ?", (row_id,))
-                        updated += 1
-            if updated:
-                self.logger.info(f"⚠️ 标记 {updated} 条数据库记录为 unstable (stable=0)")
-            else:
-                self.logger.info("✅ 数据库中的图片文件均存在，无需更新")
         except sqlite3.Error as e:
             self.logger.error(f"❌ 更新数据库时出错: {e}")
+            return 0
+
+        if updated:
+            self.logger.info(f"⚠️ 标记 {updated} 条数据库记录为 unstable (stable=0)")
+            if self.catalog is not None:
+                self.catalog.import_source('wallhaven', self.db_path)  # 同步 stable 状态到统一目录
+        else:
+            self.logger.info("✅ 数据库中的图片文件均存在，无需更新")
         return updated
 
-    def run(self):
-        """运行下载任务"""
+    def download_images_async(self, image_urls, progress=None):
+        """使用 aiohttp 异步引擎并发下载，返回成功数量
+
+        image_urls 可以是生成器（如 iter_unique_images），引擎会边取边下载。
+        """
+        from src.async_engine import AsyncDownloadEngine, DownloadJob
+
+        engine = AsyncDownloadEngine(
+            headers=self.headers,
+            download_timeout=self.download_timeout,
+            max_concurrency=self.async_max_concurrency,
+            per_host_limit=self.async_per_host_limit,
+            metrics=self.metrics,
+            progress=progress,
+            cpu_stage=self.cpu_stage,
+            logger=self.logger
+        )
+        jobs = (
+            DownloadJob(url, self.save_dir, functools.partial(
+                self._finalize_download, url=url, wallhaven_id=wallhaven_id, item_data=item_data),
+                precheck=functools.partial(self.precheck_catalog, url))
+            for url, wallhaven_id, item_data in image_urls
+        )
+        return sum(engine.run(jobs))
+
+    def run(self, use_async=False):
+        """运行下载任务
+
+        Args:
+            use_async: 为 True 时使用 aiohttp 异步引擎下载，否则使用线程池
+        """
         self.logger.info("🎬 开始运行Wallhaven下载任务...")
-        # 重新加载现有的hash和URL集合
-        self.existing_hashes = get_existing_hashes(self.save_dir, self.db_path)
-        self.logger.info(f"🔍 重新加载 {len(self.existing_hashes)} 个现有图片哈希")
+        self.metrics.reset()
+        start_metrics_server(self.logger)
+        # 成员索引在写库时增量更新，无需重新加载
+        self.logger.info(f"🔍 现有 {len(self.existing_hashes)} 个图片哈希")
 
         # 将数据库与磁盘文件同步：标记缺失的图片为 unstable
       #  updated_count = self.mark_missing_images_unstable()
       #  if updated_count:
       #      self.logger.info(f"🔧 共标记 {updated_count} 条记录为 unstable")
 
-        # 获取唯一图片URL
+        # 搜索与下载流水线：每页的新图片立即进入下载队列，同时继续获取下一页
         target_count = self.max_images
-        image_urls = self.get_unique_image_urls(target_count)
+        image_urls = []
+
+        def image_stream():
+            for entry in self.iter_unique_images(target_count):
+                image_urls.append(entry)
+                yield entry
+
+        self.logger.info("🚀 开始边搜索边并发下载图片...")
+        successful_downloads = 0
+        # 边搜索边下载，总数随搜索增长
+        self.progress = ProgressReporter(self.logger, total=lambda: len(image_urls))
+
+        # 启动批量写库线程，下载结束后写入剩余记录
+        if self.catalog is not None:
+            self.catalog_writer = self.catalog.create_writer(self.db_batch_size, self.db_flush_interval, self.logger)
+            self.catalog_writer.start()
+        self.db_writer = self._create_db_writer()
+        self.db_writer.start()
+        try:
+            if use_async:
+                successful_downloads = self.download_images_async(image_stream(), self.progress)
+                self.metrics.inc('images_downloaded', successful_downloads)
+                self.metrics.inc('images_failed', len(image_urls) - successful_downloads)
+            else:
+                # 有界下载队列：正在下载和排队的任务达到上限时暂停搜索
+                in_flight = threading.BoundedSemaphore(self.download_queue_size)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = {}
+                    for url, wallhaven_id, item_data in image_stream():
+                        in_flight.acquire()
+                        # 实际同时下载数由自适应控制器按主机调整，线程池大小为上限
+                        slot = self.concurrency.acquire(url, ceiling=self.max_workers,
+                                                        source=self.metrics.source)
+                        future = self.progress.track(executor.submit(slot.run, self.download_image_optimized, url, wallhaven_id, item_data))
+                        future.add_done_callback(lambda _: in_flight.release())
+                        futures[future] = url
+                    for future in concurrent.futures.as_completed(futures):
+                        url = futures[future]
+                        ok = False
+                        try:
+                            ok = bool(future.result())
+                            if not ok:
+                                self.logger.debug(f"⚠️ 下载失败或跳过: {url}")
+                        except Exception as e:
+                            self.logger.error(f"❌ 下载异常: {e}")
+                        successful_downloads += ok
+                        self.metrics.inc('images_downloaded' if ok else 'images_failed')
+        finally:
+            self.progress.finish()
+            self.db_writer.close()
+            self.logger.info(f"💾 批量写库完成: 新增 {self.db_writer.inserted_count} 条，"
+                             f"冲突 {self.db_writer.conflict_count} 条，共提交 {self.db_writer.flush_count} 次")
+            self.db_writer = None
+            if self.catalog_writer is not None:
+                self.catalog_writer.close()
+                self.catalog_writer = None
 
         if len(image_urls) < target_count:
             self.logger.warning(f"⚠️ 只找到 {len(image_urls)} 个唯一图片，目标为 {target_count} 个")
         else:
             self.logger.info(f"✅ 成功找到 {len(image_urls)} 个唯一图片")
 
-        # 并发下载
-        self.logger.info("🚀 开始并发下载图片...")
-        processed = 0
-        successful_downloads = 0
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {
-                executor.submit(self.download_image_optimized, url, wallhaven_id, item_data): url 
-                for url, wallhaven_id, item_data in image_urls
-            }
-            for future in concurrent.futures.as_completed(futures):
-                url = futures[future]
-                processed += 1
-                try:
-                    if future.result():
-                        successful_downloads += 1
-                        self.logger.info(f"✅ 进度: {successful_downloads}/{len(image_urls)}")
-                    else:
-                        self.logger.warning(f"⚠️ 下载失败或跳过: {url}")
-                except Exception as e:
-                    self.logger.error(f"❌ 下载异常: {e}")
-
-                # 每10个进度报告一次
-                if processed % 10 == 0:
-                    self.logger.info(f"📊 处理进度: {processed}/{len(image_urls)}")
-
         # 最终统计
         total_in_db = len(self.get_existing_urls())
         self.logger.info(f"🎉 任务完成！成功下载 {successful_downloads} 个唯一图片")
@@ -535,3 +675,5 @@ class WallhavenImageDownloader:
         # 性能统计
         success_rate = (successful_downloads / len(image_urls)) * 100 if image_urls else 0
         self.logger.info(f"📈 成功率: {success_rate:.1f}%")
+        self.logger.info(f"🎛️ 各主机并发上限: {self.concurrency.limits()}")
+        report_summary(self.metrics, self.logger)
@@ -0,0 +1,165 @@
+import asyncio
+import concurrent.futures
+import logging
+import time
+from urllib.parse import urlsplit
+import aiohttp
+from aiohttp import ClientTimeout
+from src.rate_limiter import get_rate_limiter
+from src.stream_writer import ImageStreamWriter, InvalidImageError, DEFAULT_CHUNK_SIZE
+
+# 响应体在内存中攒够该大小后交给线程池写盘（含未启用 CPU 阶段时的 MD5），写盘不占用事件循环
+WRITE_BUFFER_SIZE = 4 * DEFAULT_CHUNK_SIZE
+
+
+class DownloadJob:
+    """一个待下载的图片任务
+
+    Args:
+        url: 图片地址
+        save_dir: 临时文件所在目录（与最终文件同目录，保证 rename 原子性）
+        finalize: 下载完成后的回调 finalize(writer, content_type) -> bool，
+                  负责决定文件名、commit 以及写数据库，在线程池中执行
+        precheck: 可选的下载前检查 precheck() -> bool（如读取文件头判断分辨率），
+                  在线程池中执行，返回 False 时跳过下载
+    """
+
+    __slots__ = ('url', 'save_dir', 'finalize', 'precheck')
+
+    def __init__(self, url, save_dir, finalize, precheck=None):
+        self.url = url
+        self.save_dir = save_dir
+        self.finalize = finalize
+        self.precheck = precheck
+
+
+class AsyncDownloadEngine:
+    """基于 aiohttp 的异步下载引擎，供 Reddit / Wallhaven / 数据库下载器共用
+
+    - 所有请求共用一个 ClientSession
+    - 总并发与单主机并发由信号量限制：任务取得名额后才开始请求，下载超时从这时开始计算，
+      排队等待连接的任务不会因为超时失败（TCPConnector 的 limit 仅作为兜底）
+    - 响应流式写入临时文件，每个任务最多缓冲 WRITE_BUFFER_SIZE 字节；写盘在线程池中执行，不阻塞其他传输
+    - finalize（重命名、写数据库）放到线程池执行，不阻塞事件循环
+    """
+
+    def __init__(self, headers=None, download_timeout=20, max_concurrency=100,
+                 per_host_limit=8, db_workers=2, metrics=None, progress=None, cpu_stage=None, compute_hash=True,
+                 logger=None):
+        self.headers = headers or {}
+        self.download_timeout = download_timeout
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.db_workers = db_workers
+        self.metrics = metrics  # 可选的 RunMetrics，记录传输 / 校验 / 哈希 / 写盘耗时
+        self.progress = progress  # 可选的 ProgressReporter，每个任务完成后更新一次
+        self.cpu_stage = cpu_stage  # 可选的 CPUStage，MD5 与完整性校验在进程池中按文件路径执行
+        self.compute_hash = compute_hash  # False 时不计算 MD5（文件名已确定的数据库下载）
+        self.logger = logger or logging.getLogger('AsyncDownloadEngine')
+        self.rate_limiter = get_rate_limiter()
+        self._slots = None  # 总并发信号量（download_all 期间存在，需在事件循环中创建）
+        self._host_slots = {}  # 主机 -> 单主机并发信号量
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slot
+
+    async def _download_one(self, session, job, executor):
+        """下载单个任务，返回是否成功"""
+        loop = asyncio.get_running_loop()
+        writer = None
+        try:
+            if job.precheck is not None and not await loop.run_in_executor(None, job.precheck):
+                return False
+            async with self._slots, self._host_slot(job.url):
+                await self.rate_limiter.acquire_async(job.url)
+                started = time.perf_counter()
+                # 超时只计算取得名额之后的请求与传输时间
+                async with session.get(job.url, timeout=ClientTimeout(total=self.download_timeout)) as response:
+                    self.rate_limiter.update_from_response(job.url, response.status, response.headers)
+                    response.raise_for_status()
+
+                    content_type = response.headers.get('content-type', '').lower()
+                    if 'image' not in content_type:
+                        self.logger.warning(f"⚠️ 非图片内容类型: {content_type} - {job.url}")
+                        return False
+
+                    writer = ImageStreamWriter(job.save_dir, content_type,
+                                               inline_hash=self.compute_hash and self.cpu_stage is None)
+                    buffer = bytearray()
+                    async for chunk in response.content.iter_chunked(DEFAULT_CHUNK_SIZE):
+                        buffer += chunk
+                        if len(buffer) >= WRITE_BUFFER_SIZE:
+                            await loop.run_in_executor(None, writer.write, bytes(buffer))
+                            buffer.clear()
+                    if buffer:
+                        await loop.run_in_executor(None, writer.write, bytes(buffer))
+                elapsed = time.perf_counter() - started
+            if self.cpu_stage is not None:
+                # 等待子进程结果时不阻塞事件循环
+                await loop.run_in_executor(None, self.cpu_stage.process, writer, self.compute_hash)
+
+            result = await loop.run_in_executor(executor, job.finalize, writer, content_type)
+            if self.metrics is not None:
+                self.metrics.record_download(writer, elapsed)
+            return result
+
+        except InvalidImageError as e:
+            self.logger.warning(f"⚠️ 无效的图片数据: {job.url} - {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"❌ 网络错误: {job.url} - {e!r}")
+        except OSError as e:
+            self.logger.error(f"❌ 文件系统错误: {job.url} - {e}")
+        except Exception as e:
+            self.logger.error(f"❌ 未知错误: {job.url} - {e}")
+        finally:
+            # finalize 成功后 writer 已 commit，abort 不会删除最终文件
+            if writer is not None and not writer.committed:
+                writer.abort()
+        return False
+
+    async def _download_tracked(self, session, job, executor):
+        """下载单个任务并更新进度"""
+        result = await self._download_one(session, job, executor)
+        if self.progress is not None:
+            self.progress.update(result is True)
+        return result
+
+    async def download_all(self, jobs):
+        """并发下载所有任务，返回与 jobs 顺序一致的结果列表
+
+        jobs 可以是列表，也可以是会阻塞的迭代器（例如逐页请求搜索 API 的生成器）：
+        迭代在线程池中进行，已取到的任务立即开始下载，不必等待整个列表生成。
+        """
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._host_slots = {}
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_limit)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.db_workers)
+        job_iter = iter(jobs)
+        done = object()
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, headers=self.headers) as session:
+                tasks = []
+                while True:
+                    if isinstance(jobs, (list, tuple)):
+                        job = next(job_iter, done)
+                    else:
+                        job = await loop.run_in_executor(None, next, job_iter, done)
+                    if job is done:
+                        break
+                    tasks.append(asyncio.create_task(self._download_tracked(session, job, executor)))
+
+                results = [r is True for r in await asyncio.gather(*tasks, return_exceptions=True)]
+                self.logger.info(f"📊 异步下载完成: {sum(results)}/{len(results)}")
+                return results
+        finally:
+            executor.shutdown(wait=True)
+
+    def run(self, jobs):
+        """同步入口：在新的事件循环中下载所有任务"""
+        return asyncio.run(self.download_all(jobs))
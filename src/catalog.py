@@ -0,0 +1,176 @@
+import logging
+import os
+import sqlite3
+import threading
+from config import CATALOG_CONFIG
+from src.db_pool import get_pool
+from src.db_writer import BatchedDBWriter
+
+# 按 (source, url) 去重，已存在的记录保持不变
+INSERT_SQL = '''
+    INSERT INTO images (source, source_id, name, hash, url, source_url, resolution)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(source, url) DO NOTHING
+'''
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+class Catalog:
+    """跨下载源的统一图片目录（catalog.db）
+
+    各下载源仍保留自己的数据库；目录库汇总所有来源的记录（source 列区分来源），
+    用于一次索引查询判断图片是否已在任意来源中存在，以及跨来源的状态维护。
+    记录格式: (source, source_id, name, hash, url, source_url, resolution)
+
+    aliases 表记录下载后因其他来源已有相同图片而跳过的 URL（source, url -> owner），
+    下次运行时在下载前按 URL 即可跳过，不必再次下载后丢弃。
+    """
+
+    def __init__(self, db_path, logger=None):
+        self.db_path = db_path
+        self.logger = logger or logging.getLogger('Catalog')
+        self.pool = get_pool(db_path)
+        self._init_db()
+
+    def _init_db(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS images (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source TEXT NOT NULL,
+                    source_id TEXT,
+                    name TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    source_url TEXT,
+                    resolution TEXT,
+                    phash TEXT,
+                    stable INTEGER NOT NULL DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (source, url)
+                )
+            ''')
+            # 覆盖索引：存在性查询只读索引即可得到来源
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_source_stable ON images(source, stable)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_hash ON images(hash, source)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_url ON images(url, source)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS aliases (
+                    source TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    hash TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source, url)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_alias_url ON aliases(url)')
+
+    def find(self, hash_value=None, url=None, source=None):
+        """按哈希（优先）或 URL 查找图片，返回所属来源（不存在时返回 None）
+
+        同一图片在多个来源中都有记录时优先返回 source，避免把本来源的重复记录当作其他来源的图片。
+        按 URL 查找时也查询 aliases，返回被跳过 URL 对应的图片所属来源。
+        """
+        with self.pool.connection() as conn:
+            row = None
+            if hash_value is not None:
+                row = conn.execute(
+                    "SELECT source FROM images WHERE hash = ? ORDER BY source = ? DESC LIMIT 1", (hash_value, source)
+                ).fetchone()
+            if row is None and url is not None:
+                row = conn.execute(
+                    "SELECT source FROM images WHERE url = ? ORDER BY source = ? DESC LIMIT 1", (url, source)
+                ).fetchone() or conn.execute(
+                    "SELECT owner FROM aliases WHERE url = ? ORDER BY source = ? DESC LIMIT 1", (url, source)
+                ).fetchone()
+        return row[0] if row else None
+
+    def add_alias(self, source, url, owner, hash_value=None):
+        """记录 source 的 url 与 owner 来源中已有的图片相同（下载后被跳过）"""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO aliases (source, url, owner, hash) VALUES (?, ?, ?, ?)",
+                             (source, url, owner, hash_value))
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 写入统一目录别名失败: {url} - {e}")
+
+    def add(self, record):
+        """直接写入一条记录（未启动批量写入线程时使用）"""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute(INSERT_SQL, record)
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 写入统一目录失败: {record[4]} - {e}")
+
+    def create_writer(self, batch_size=50, flush_interval=1.0, logger=None):
+        """创建写入目录库的批量写库线程"""
+        return BatchedDBWriter(self.pool, INSERT_SQL, batch_size=batch_size, flush_interval=flush_interval,
+                               logger=logger or self.logger)
+
+    def import_source(self, source, db_path):
+        """从某个下载源的数据库批量导入（或刷新）记录，返回 (新增数, 更新数)
+
+        用 ATTACH + INSERT ... SELECT 一次性导入；已存在的记录同步 stable 与 phash。
+        """
+        if not os.path.exists(db_path):
+            self.logger.warning(f"⚠️ 数据库文件不存在，跳过: {db_path}")
+            return 0, 0
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("ATTACH DATABASE ? AS src", (db_path,))
+            columns = {row[1] for row in conn.execute("PRAGMA src.table_info(images)")}
+            if not columns:
+                self.logger.warning(f"⚠️ {db_path} 中没有 images 表，跳过")
+                return 0, 0
+
+            def column(name, default='NULL'):
+                return name if name in columns else default
+
+            before = conn.execute("SELECT COUNT(*) FROM images WHERE source = ?", (source,)).fetchone()[0]
+            cursor = conn.execute(f'''
+                INSERT INTO images (source, source_id, name, hash, url, source_url, resolution, phash, stable, created_at)
+                SELECT ?, {column('wallhaven_id')}, name, hash, url, {column('source_url')},
+                       {column('resolution')}, {column('phash')}, {column('stable', '1')},
+                       {column('created_at', 'CURRENT_TIMESTAMP')}
+                FROM src.images WHERE true
+                ON CONFLICT(source, url) DO UPDATE SET
+                    stable = excluded.stable,
+                    phash = COALESCE(excluded.phash, images.phash)
+            ''', (source,))
+            touched = cursor.rowcount
+            conn.commit()
+            after = conn.execute("SELECT COUNT(*) FROM images WHERE source = ?", (source,)).fetchone()[0]
+            conn.execute("DETACH DATABASE src")
+        finally:
+            conn.close()
+
+        added = after - before
+        return added, touched - added
+
+    def restore_stable(self):
+        """把目录库中所有 stable=0 的记录还原为 1，返回还原条数"""
+        with self.pool.connection() as conn:
+            return conn.execute("UPDATE images SET stable = 1 WHERE stable = 0").rowcount
+
+    def counts(self):
+        """各来源的记录数 {source: (总数, stable 数)}"""
+        with self.pool.connection() as conn:
+            return {row[0]: (row[1], row[2]) for row in conn.execute(
+                "SELECT source, COUNT(*), SUM(stable = 1) FROM images GROUP BY source"
+            )}
+
+
+def get_catalog():
+    """获取进程内共享的统一目录（按 CATALOG_CONFIG 创建），未启用时返回 None"""
+    global _catalog
+    if not CATALOG_CONFIG.get('enabled'):
+        return None
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog(CATALOG_CONFIG.get('db_path', 'catalog.db'))
+    return _catalog
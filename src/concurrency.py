@@ -0,0 +1,270 @@
+import logging
+import math
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from config import HTTP_CONFIG
+
+_controller = None
+_controller_lock = threading.Lock()
+
+# 视为拥塞信号的状态码：限流与服务端过载
+CONGESTION_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class HostWindow:
+    """单个主机的 AIMD 并发窗口
+
+    - 加性增：一个观察窗口内确实有任务在等待并发名额（窗口已用满）、吞吐量没有下降、
+      且平均延迟没有明显高于历史最低值时，并发上限 +increase_step
+    - 延迟明显升高（超过最低值的 latency_tolerance 倍）时 -1
+    - 乘性减：收到 429 / 5xx、超时或连接错误时乘以 decrease_factor，
+      同一冷却期内的多个拥塞信号只减一次
+    """
+
+    def __init__(self, host, initial, minimum, cap, increase_step=1, decrease_factor=0.5,
+                 latency_tolerance=2.0, adaptive=True):
+        self.host = host
+        self.minimum = max(1, minimum)
+        self.cap = max(self.minimum, cap)
+        self.limit = float(min(max(initial, self.minimum), self.cap)) if adaptive else float(self.cap)
+        self.adaptive = adaptive
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.latency_floor = None
+        self._cooldown_until = 0.0
+        self._start_window(time.monotonic())
+        self._previous_throughput = None
+
+    def _start_window(self, now):
+        self._window_start = now
+        self._window_completed = 0
+        self.saturated = False
+
+    @property
+    def current(self):
+        return max(self.minimum, int(self.limit))
+
+    def on_complete(self, latency, now):
+        """一个任务完成，返回新的并发上限（未变化时返回 None）"""
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if self.latency_floor is None or self.latency_ewma < self.latency_floor:
+            self.latency_floor = self.latency_ewma
+        self._window_completed += 1
+        if not self.adaptive or self._window_completed < max(2, self.current):
+            return None
+
+        elapsed = now - self._window_start
+        throughput = self._window_completed / elapsed if elapsed > 0 else None
+        saturated = self.saturated
+        previous = self._previous_throughput
+        self._previous_throughput = throughput
+        self._start_window(now)
+        if throughput is None or now < self._cooldown_until:
+            return None
+
+        before = self.current
+        if self.latency_ewma > self.latency_floor * self.latency_tolerance:
+            self.limit = max(self.minimum, self.limit - 1)
+            # 延迟基线缓慢上移，避免网络整体变慢后一直无法增加
+            self.latency_floor *= 1.1
+        elif saturated and (previous is None or throughput >= previous * 0.95):
+            self.limit = min(self.cap, self.limit + self.increase_step)
+        return self.current if self.current != before else None
+
+    def on_congestion(self, now):
+        """收到拥塞信号，返回新的并发上限（冷却期内或未变化时返回 None）"""
+        if not self.adaptive or now < self._cooldown_until:
+            return None
+        before = self.current
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        # 冷却期约为一个延迟周期（至少 1 秒），期间已在途的失败不再重复减半
+        self._cooldown_until = now + max(1.0, self.latency_ewma or 0)
+        self._previous_throughput = None
+        self._start_window(now)
+        return self.current if self.current != before else None
+
+
+class Slot:
+    """一次已获得并发名额的任务，完成后必须释放（run() 会自动释放）"""
+
+    __slots__ = ('controller', 'host', 'source', '_released')
+
+    def __init__(self, controller, host, source=None):
+        self.controller = controller
+        self.host = host
+        self.source = source
+        self._released = False
+
+    def run(self, fn, *args, **kwargs):
+        """在名额内执行 fn 后释放名额；只有成功（返回真值）的任务计入延迟与吞吐量统计"""
+        start = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            self.release(time.perf_counter() - start if result else None)
+
+    def release(self, latency=None):
+        if not self._released:
+            self._released = True
+            self.controller._release(self.host, latency, self.source)
+
+
+class ConcurrencyController:
+    """按主机的自适应并发控制器（AIMD），由所有下载线程和下载源共享
+
+    线程池按配置的上限创建，提交任务前调用 acquire(url) 等待该主机的并发名额：
+
+        slot = controller.acquire(url, ceiling=max_workers)
+        executor.submit(slot.run, download, url)
+
+    拥塞信号来自共享 Session 的响应状态（record_status）与下载中的网络异常（record_exception）。
+    adaptive=False 时每个主机固定使用 host_limits / default_host_limit 与 ceiling 中的较小值。
+
+    多个下载源同时运行时可用 set_budget() 设置所有下载源共享的总并发数：每个下载源至少能
+    使用 ⌈总数 / 运行中的下载源数⌉ 个名额，其他下载源没有在等待名额时可以借用空闲名额。
+    """
+
+    def __init__(self, config=None, logger=None):
+        config = config or {}
+        self.adaptive = config.get('adaptive', True)
+        self.initial = config.get('initial', 4)
+        self.minimum = config.get('min', 1)
+        self.host_limits = {host.lower(): limit for host, limit in (config.get('host_limits') or {}).items()}
+        self.default_host_limit = config.get('default_host_limit', 16)
+        self.increase_step = config.get('increase_step', 1)
+        self.decrease_factor = config.get('decrease_factor', 0.5)
+        self.latency_tolerance = config.get('latency_tolerance', 2.0)
+        self.logger = logger or logging.getLogger('ConcurrencyController')
+        self._hosts = {}
+        self._condition = threading.Condition()
+        self.budget = None  # 所有下载源共享的总并发数，None 表示不限制
+        self._active_sources = set()
+        self._source_in_flight = {}
+        self._source_waiting = {}
+
+    @staticmethod
+    def _host(url):
+        return (urlparse(url).hostname or '').lower()
+
+    def _window(self, host):
+        window = self._hosts.get(host)
+        if window is None:
+            window = HostWindow(
+                host, self.initial, self.minimum, self.host_limits.get(host, self.default_host_limit),
+                self.increase_step, self.decrease_factor, self.latency_tolerance, self.adaptive
+            )
+            self._hosts[host] = window
+        return window
+
+    def set_budget(self, budget, sources=()):
+        """设置所有下载源共享的总并发数与参与公平分配的下载源，budget=None 时取消限制"""
+        with self._condition:
+            self.budget = budget
+            self._active_sources = set(sources) if budget else set()
+            self._condition.notify_all()
+
+    def finish_source(self, source):
+        """下载源运行结束，其份额分给仍在运行的下载源"""
+        with self._condition:
+            self._active_sources.discard(source)
+            self._condition.notify_all()
+
+    def _budget_allows(self, source):
+        """总并发数是否允许 source 再占用一个名额"""
+        if not self.budget:
+            return True
+        if sum(self._source_in_flight.values()) >= self.budget:
+            return False
+        if source not in self._active_sources:
+            return True
+        share = math.ceil(self.budget / len(self._active_sources))
+        if self._source_in_flight.get(source, 0) < share:
+            return True
+        # 已用满份额：只有其他下载源都没有在等待名额时才借用空闲名额
+        return not any(count for other, count in self._source_waiting.items() if other != source)
+
+    def acquire(self, url, ceiling=None, source=None):
+        """等待 URL 所属主机的并发名额，返回 Slot
+
+        ceiling 为调用方线程池的大小；source 为下载源名称，设置了总并发数时用于公平分配。
+        """
+        host = self._host(url)
+        with self._condition:
+            window = self._window(host)
+            waiting = False
+            while True:
+                if window.in_flight >= min(window.current, ceiling or window.cap):
+                    if window.in_flight >= window.current:
+                        window.saturated = True  # 受自身窗口（而非线程池大小）限制
+                elif self._budget_allows(source):
+                    break
+                elif not waiting:
+                    # 只统计因总并发数而等待的下载源，受主机窗口限制的等待不影响其他下载源借用名额
+                    waiting = True
+                    self._source_waiting[source] = self._source_waiting.get(source, 0) + 1
+                self._condition.wait()
+            if waiting:
+                self._source_waiting[source] -= 1
+            window.in_flight += 1
+            if window.in_flight >= window.current:
+                window.saturated = True
+            self._source_in_flight[source] = self._source_in_flight.get(source, 0) + 1
+        return Slot(self, host, source)
+
+    def _release(self, host, latency, source=None):
+        with self._condition:
+            window = self._window(host)
+            window.in_flight -= 1
+            self._source_in_flight[source] -= 1
+            if latency is not None:
+                self._log_change(window, window.on_complete(latency, time.monotonic()), '📈')
+            self._condition.notify_all()
+
+    def record_status(self, url, status):
+        """根据响应状态码判断是否拥塞"""
+        if status in CONGESTION_STATUSES:
+            self._congestion(url, f"HTTP {status}")
+
+    def record_exception(self, url, error):
+        """下载中的超时与连接错误视为拥塞，其他异常忽略"""
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            self._congestion(url, type(error).__name__)
+
+    def _congestion(self, url, reason):
+        host = self._host(url)
+        with self._condition:
+            window = self._hosts.get(host)
+            if window is not None:
+                self._log_change(window, window.on_congestion(time.monotonic()), '📉', reason)
+
+    def _log_change(self, window, new_limit, icon, reason=None):
+        if new_limit is not None:
+            suffix = f"（{reason}）" if reason else ''
+            self.logger.debug(f"{icon} {window.host} 并发上限调整为 {new_limit}{suffix}")
+
+    def limits(self):
+        """各主机当前的并发上限 {host: limit}"""
+        with self._condition:
+            return {host: window.current for host, window in self._hosts.items()}
+
+    def source_in_flight(self):
+        """各下载源当前占用的名额 {source: count}"""
+        with self._condition:
+            return {source: count for source, count in self._source_in_flight.items() if source is not None}
+
+
+def get_concurrency_controller():
+    """获取进程内共享的并发控制器（按 HTTP_CONFIG['concurrency'] 创建）"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = ConcurrencyController(HTTP_CONFIG.get('concurrency'))
+    return _controller
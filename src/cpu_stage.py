@@ -0,0 +1,159 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+from config import CPU_CONFIG
+from src.hashing import HASH_CHUNK_SIZE
+from src.image_probe import parse_dimensions
+from src.process_pool import new_process_pool
+from src.stream_writer import MAGIC_BYTES_LENGTH, InvalidImageError
+from src.utils import is_valid_image
+
+_stage = None
+_stage_lock = threading.Lock()
+
+# 文件尾校验（可选，CPU_CONFIG['check_truncation']）：在最后 TAIL_LENGTH 字节内查找结束标记，判断图片是否被截断
+TAIL_LENGTH = 1024
+
+ImageCheck = namedtuple('ImageCheck', ['path', 'md5', 'size', 'valid', 'complete', 'dimensions', 'error',
+                                       'hash_seconds', 'validate_seconds'])
+
+
+def _is_complete(head, tail, size):
+    """根据文件尾的结束标记判断图片是否完整（无法识别的格式视为完整）"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return b'\xff\xd9' in tail  # JPEG EOI，允许其后有少量附加数据
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return b'IEND' in tail[-64:]
+    if head.startswith(b'GIF8'):
+        return b'\x3b' in tail[-16:]  # GIF trailer
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return int.from_bytes(head[4:8], 'little') + 8 <= size
+    return True
+
+
+def check_image(path, content_type='', compute_hash=True, check_truncation=False):
+    """校验文件头并解析宽高，返回 ImageCheck（在 CPU 阶段的子进程中执行）
+
+    compute_hash=True 时顺序读取整个文件一次并计算 MD5；为 False 时（文件名已确定、不需要哈希）
+    只读取文件头所在的块，md5 为 None。check_truncation=True 时还按文件尾的结束标记判断图片是否被截断，
+    否则 complete 与 valid 相同。
+    """
+    try:
+        start = time.perf_counter()
+        digest = hashlib.md5() if compute_hash else None
+        head = tail = b''
+        dimensions = None
+        size = 0
+        with open(path, 'rb') as f:
+            if compute_hash:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    if not size:
+                        head = chunk[:MAGIC_BYTES_LENGTH]
+                        dimensions = parse_dimensions(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tail = (tail + chunk[-TAIL_LENGTH:])[-TAIL_LENGTH:]
+            else:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                head = chunk[:MAGIC_BYTES_LENGTH]
+                dimensions = parse_dimensions(chunk)
+                size = os.fstat(f.fileno()).st_size
+                if check_truncation:
+                    f.seek(max(0, size - TAIL_LENGTH))
+                    tail = f.read(TAIL_LENGTH)
+        # 不计算哈希时读取文件头尾的时间计入校验
+        hashed = time.perf_counter() if compute_hash else start
+        valid = is_valid_image(head, content_type)
+        complete = valid and (not check_truncation or _is_complete(head, tail, size))
+        return ImageCheck(path, digest.hexdigest() if compute_hash else None, size, valid, complete, dimensions,
+                          None, hashed - start, time.perf_counter() - hashed)
+    except OSError as e:
+        return ImageCheck(path, None, 0, False, False, None, str(e), 0.0, 0.0)
+
+
+class CPUStage:
+    """下载后的 CPU 密集阶段（MD5、完整性校验等），在独立的进程池中执行
+
+    下载线程只负责把响应体写入临时文件，关闭文件后把路径交给子进程读取，
+    不在进程间传递图片数据；CPU 工作不再占用下载线程的 GIL，可随核数扩展。
+
+    用法:
+        stage = get_cpu_stage()
+        if stage is not None:
+            stage.process(writer)   # writer 以 inline_hash=False 创建
+        writer.hexdigest            # 子进程计算的 MD5
+    """
+
+    def __init__(self, workers=None, logger=None, check_truncation=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.check_truncation = check_truncation  # 是否按文件尾的结束标记拒绝疑似截断的图片
+        self.logger = logger or logging.getLogger('CPUStage')
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 与文件哈希、感知哈希共用同一种启动方式（forkserver / spawn，见 src.process_pool）
+                self._executor = new_process_pool(self.workers)
+            return self._executor
+
+    def submit(self, path, content_type='', compute_hash=True):
+        """提交一个文件，返回 concurrent.futures.Future[ImageCheck]"""
+        return self._get_executor().submit(check_image, path, content_type, compute_hash, self.check_truncation)
+
+    def check(self, path, content_type='', compute_hash=True):
+        """阻塞等待检查结果；进程池不可用时退回当前线程计算"""
+        try:
+            return self.submit(path, content_type, compute_hash).result()
+        except BrokenProcessPool as e:
+            self.logger.warning(f"⚠️ CPU 进程池不可用，改为在下载线程中计算: {e}")
+            with self._lock:
+                self._executor = None
+            return check_image(path, content_type, compute_hash, self.check_truncation)
+
+    def process(self, writer, compute_hash=True):
+        """关闭 writer 的临时文件并在子进程中检查，结果写回 writer；图片无效或不完整时抛出 InvalidImageError
+
+        compute_hash=False 时只做完整性校验，writer.hexdigest 为 None（用于文件名已确定的数据库下载）。
+        """
+        writer.close_file()
+        apply_check(writer, self.check(writer.temp_path, writer.content_type, compute_hash))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+def apply_check(writer, result):
+    """把 CPU 阶段的检查结果写回 writer"""
+    if result.error:
+        raise OSError(result.error)
+    writer.hash_seconds += result.hash_seconds
+    writer.validate_seconds += result.validate_seconds
+    if not result.valid:
+        raise InvalidImageError(f"无效的图片数据: {os.path.basename(result.path)}")
+    if not result.complete:
+        raise InvalidImageError(f"图片数据不完整（缺少结束标记）: {os.path.basename(result.path)}")
+    writer.digest = result.md5
+    writer.dimensions = result.dimensions
+
+
+def get_cpu_stage():
+    """获取进程内共享的 CPU 阶段（CPU_CONFIG['enabled'] 为 False 时返回 None）"""
+    global _stage
+    if not CPU_CONFIG.get('enabled'):
+        return None
+    if _stage is None:
+        with _stage_lock:
+            if _stage is None:
+                _stage = CPUStage(CPU_CONFIG.get('workers'), check_truncation=CPU_CONFIG.get('check_truncation', False))
+                atexit.register(_stage.shutdown)
+    return _stage
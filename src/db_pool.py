@@ -0,0 +1,107 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_MAX_CONNECTIONS = 5
+DEFAULT_BUSY_TIMEOUT = 30  # 秒
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SQLiteConnectionPool:
+    """有界、线程安全的 SQLite 连接池
+
+    - 连接数不超过 max_connections，池满时等待其他线程归还
+    - 每个连接启用 WAL 日志、synchronous=NORMAL 与 busy_timeout，
+      读写可以并发进行，写冲突时等待而不是立即报 "database is locked"
+    """
+
+    def __init__(self, db_path, max_connections=DEFAULT_MAX_CONNECTIONS, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.busy_timeout = busy_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        return conn
+
+    def acquire(self, timeout=None):
+        """取出一个连接，池已满时最多等待 timeout 秒"""
+        if self._closed:
+            raise sqlite3.ProgrammingError(f"连接池已关闭: {self.db_path}")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._connections) < self.max_connections:
+                conn = self._connect()
+                self._connections.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"等待数据库连接超时: {self.db_path}")
+
+    def release(self, conn):
+        """归还连接"""
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """连接上下文：正常退出时提交，异常时回滚并重新抛出"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """关闭池中所有连接"""
+        with self._lock:
+            self._closed = True
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+
+
+def get_pool(db_path, max_connections=DEFAULT_MAX_CONNECTIONS):
+    """获取 db_path 对应的进程内共享连接池"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None or pool._closed:
+            pool = SQLiteConnectionPool(db_path, max_connections)
+            _pools[db_path] = pool
+        return pool
+
+
+@atexit.register
+def close_all_pools():
+    """关闭所有连接池（进程退出时自动调用）"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
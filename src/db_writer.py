@@ -0,0 +1,139 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 1.0  # 秒
+
+_STOP = object()
+
+
+class BatchedDBWriter(threading.Thread):
+    """后台批量写库线程
+
+    下载线程通过 submit() 把记录放入队列，写库线程攒够 batch_size 条
+    或距上次写入超过 flush_interval 秒时，用一次 executemany + 一次提交写入。
+    批量写入遇到唯一键冲突时，回滚该批并逐行重试，冲突行通过 on_conflict 逐条回调。
+    after_flush(conn, inserted) 在同一事务内调用（只含实际写入的记录），可用于顺带更新其他表。
+    回调抛出的异常只记录日志，不会中断写库线程。
+    传入 metrics（RunMetrics）时，每次提交的耗时计入 db_insert 阶段。
+
+    用法:
+        with BatchedDBWriter(pool, "INSERT INTO images (name, hash, url) VALUES (?, ?, ?)") as writer:
+            writer.submit((name, hash_value, url))
+    """
+
+    def __init__(self, pool, insert_sql, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 on_inserted=None, on_conflict=None, after_flush=None, metrics=None, logger=None):
+        super().__init__(name='BatchedDBWriter', daemon=True)
+        self.pool = pool
+        self.insert_sql = insert_sql
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_inserted = on_inserted
+        self.on_conflict = on_conflict
+        self.after_flush = after_flush
+        self.metrics = metrics
+        self.logger = logger or logging.getLogger('BatchedDBWriter')
+        self._queue = queue.Queue()
+        self.inserted_count = 0
+        self.conflict_count = 0
+        self.error_count = 0
+        self.flush_count = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def submit(self, record):
+        """提交一条待写入的记录（参数元组，与 insert_sql 的占位符一一对应）"""
+        self._queue.put(record)
+
+    def close(self):
+        """写入剩余记录并结束线程"""
+        if self.is_alive():
+            self._queue.put(_STOP)
+            self.join()
+
+    def run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._safe_flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._safe_flush(batch)
+                batch = []
+                deadline = None
+
+    def _safe_flush(self, batch):
+        """写入一批记录；意外异常只记录日志，保证写库线程继续处理后续记录"""
+        try:
+            self._flush(batch)
+        except Exception as e:
+            self.error_count += len(batch)
+            self.logger.error(f"❌ 批量写入数据库出错（{len(batch)} 条）: {e}", exc_info=True)
+
+    def _callback(self, name, callback, *args):
+        """调用回调，异常记录日志后忽略"""
+        try:
+            callback(*args)
+        except Exception as e:
+            self.logger.error(f"❌ 写库回调 {name} 出错: {e}", exc_info=True)
+
+    def _flush(self, batch):
+        """写入一批记录"""
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                try:
+                    conn.executemany(self.insert_sql, batch)
+                    inserted = list(batch)
+                except sqlite3.IntegrityError:
+                    # 批内存在冲突：回滚后逐行插入，以便逐条报告冲突
+                    conn.rollback()
+                    inserted = []
+                    for record in batch:
+                        try:
+                            conn.execute(self.insert_sql, record)
+                            inserted.append(record)
+                        except sqlite3.IntegrityError as e:
+                            self.conflict_count += 1
+                            if self.on_conflict:
+                                self._callback('on_conflict', self.on_conflict, record, e)
+                if self.after_flush and inserted:
+                    self._callback('after_flush', self.after_flush, conn, inserted)
+        except sqlite3.Error as e:
+            self.error_count += len(batch)
+            self.logger.error(f"❌ 批量写入数据库失败（{len(batch)} 条）: {e}")
+            return
+
+        if self.metrics is not None:
+            self.metrics.observe('db_insert', time.perf_counter() - start)
+            self.metrics.inc('db_records_inserted', len(inserted))
+        self.flush_count += 1
+        self.inserted_count += len(inserted)
+        self.logger.debug(f"💾 批量写入 {len(inserted)}/{len(batch)} 条记录")
+        if self.on_inserted:
+            for record in inserted:
+                self._callback('on_inserted', self.on_inserted, record)
@@ -0,0 +1,108 @@
+import logging
+import os
+import sqlite3
+from src.db_pool import get_pool
+from src.phash import DEFAULT_THRESHOLD, HammingIndex, dhash_files, from_hex, to_hex
+
+# 被判定为近似重复的记录标记为 stable=2：数据库下载器不再下载，restore-stable 也不会还原
+STABLE_DUPLICATE = 2
+
+
+def ensure_phash_column(conn):
+    """为 images 表添加 phash 列（已存在时跳过）"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(images)")}
+    if 'phash' not in columns:
+        conn.execute("ALTER TABLE images ADD COLUMN phash TEXT")
+
+
+def update_phashes(db_path, save_dir, workers=None, logger=None):
+    """为尚未计算感知哈希且本地文件存在的记录计算 phash，返回新计算的数量"""
+    logger = logger or logging.getLogger('Dedupe')
+    pool = get_pool(db_path)
+    with pool.connection() as conn:
+        ensure_phash_column(conn)
+        rows = conn.execute("SELECT id, name FROM images WHERE stable = 1 AND phash IS NULL").fetchall()
+
+    ids_by_path = {}
+    for row in rows:
+        path = os.path.join(save_dir, row['name'])
+        if os.path.isfile(path):
+            ids_by_path[path] = row['id']
+    if not ids_by_path:
+        return 0
+
+    logger.info(f"🧮 计算 {len(ids_by_path)} 张图片的感知哈希...")
+    updates = []
+    for path, value, error in dhash_files(ids_by_path, workers):
+        if error:
+            logger.warning(f"⚠️ 感知哈希计算失败: {path} - {error}")
+            continue
+        updates.append((to_hex(value), ids_by_path[path]))
+
+    with pool.connection() as conn:
+        conn.executemany("UPDATE images SET phash = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def find_near_duplicates(sources, threshold=DEFAULT_THRESHOLD, workers=None, mark=False, logger=None):
+    """在一个或多个下载源之间查找近似重复的图片
+
+    sources 为 [(来源名, db_path, save_dir)]。每组重复图片中保留文件最大的一张，
+    返回 [(保留项, [重复项...])]，每项为 (来源名, id, name, 文件大小)。
+    mark=True 时把重复项标记为 stable=2。
+    """
+    logger = logger or logging.getLogger('Dedupe')
+    index = HammingIndex(threshold)
+    groups = {}
+    paths = {}
+
+    for label, db_path, save_dir in sources:
+        try:
+            computed = update_phashes(db_path, save_dir, workers, logger)
+            if computed:
+                logger.info(f"✅ {label}: 新计算 {computed} 个感知哈希")
+            with get_pool(db_path).connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, name, phash FROM images WHERE stable = 1 AND phash IS NOT NULL ORDER BY id"
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"❌ {label}: 读取数据库失败: {e}")
+            continue
+
+        for row in rows:
+            item = (label, row['id'], row['name'])
+            paths[item] = os.path.join(save_dir, row['name'])
+            value = from_hex(row['phash'])
+            matches = index.search(value, threshold)
+            if matches:
+                groups[matches[0][1]].append(item)
+            else:
+                index.add(value, item)
+                groups[item] = [item]
+
+    def with_size(item):
+        try:
+            size = os.path.getsize(paths[item])
+        except OSError:
+            size = 0
+        return item + (size,)
+
+    duplicates = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members = sorted((with_size(item) for item in members), key=lambda m: m[3], reverse=True)
+        duplicates.append((members[0], members[1:]))
+
+    if mark and duplicates:
+        db_paths = {label: db_path for label, db_path, _ in sources}
+        by_source = {}
+        for _, others in duplicates:
+            for label, row_id, _, _ in others:
+                by_source.setdefault(label, []).append((STABLE_DUPLICATE, row_id))
+        for label, updates in by_source.items():
+            with get_pool(db_paths[label]).connection() as conn:
+                conn.executemany("UPDATE images SET stable = ? WHERE id = ?", updates)
+            logger.info(f"🏷️ {label}: 标记 {len(updates)} 条近似重复记录 (stable={STABLE_DUPLICATE})")
+
+    return duplicates
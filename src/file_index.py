@@ -0,0 +1,141 @@
+import logging
+import os
+import sqlite3
+import time
+from src.stream_writer import is_partial_file
+
+# 目录 mtime 距扫描时刻不足该秒数时不作为跳过依据（避免同一时间粒度内的新增文件被漏掉）
+MTIME_SETTLE_SECONDS = 2.0
+
+
+class FileIndex:
+    """保存目录的持久化文件索引（name, size, mtime, inode, hash）
+
+    与 images 表放在同一个数据库中：
+    - 下载器写入图片文件后通过 record() / record_names() 更新索引
+    - hash 列缓存文件内容的 MD5，size 与 mtime 未变化时可直接复用
+    - sync() 用 os.scandir 扫描目录并与索引做差异更新；目录 mtime 未变化时跳过扫描
+    - mark_missing() 用一条集合 UPDATE 把文件已不存在的记录标记为 stable=0
+    """
+
+    def __init__(self, pool, save_dir, logger=None):
+        self.pool = pool
+        self.save_dir = save_dir
+        self.logger = logger or logging.getLogger('FileIndex')
+        self._init_db()
+
+    def _init_db(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS file_index (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    hash TEXT
+                )
+            ''')
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(file_index)")}
+            if 'hash' not in columns:
+                conn.execute("ALTER TABLE file_index ADD COLUMN hash TEXT")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS file_index_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_images_name ON images(name)')
+
+    def _stat_rows(self, entries):
+        rows = []
+        for name, hash_value in entries:
+            try:
+                st = os.stat(os.path.join(self.save_dir, name))
+            except OSError:
+                continue
+            rows.append((name, st.st_size, st.st_mtime_ns, st.st_ino, hash_value))
+        return rows
+
+    @staticmethod
+    def upsert(conn, rows):
+        """在已有事务中写入索引行 (name, size, mtime_ns, inode, hash)"""
+        conn.executemany(
+            "INSERT OR REPLACE INTO file_index (name, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def record_names(self, conn, entries):
+        """在已有事务中登记（或更新）一批文件，entries 为 (name, hash) 列表"""
+        self.upsert(conn, self._stat_rows(entries))
+
+    def record(self, name, hash_value=None):
+        """登记单个文件"""
+        try:
+            with self.pool.connection() as conn:
+                self.record_names(conn, [(name, hash_value)])
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 更新文件索引失败: {name} - {e}")
+
+    def load_hashes(self):
+        """返回已缓存哈希的文件 {name: (size, mtime_ns, hash)}"""
+        with self.pool.connection() as conn:
+            return {row[0]: (row[1], row[2], row[3]) for row in conn.execute(
+                "SELECT name, size, mtime_ns, hash FROM file_index WHERE hash IS NOT NULL"
+            )}
+
+    def _load_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM file_index_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _scan(self):
+        """扫描保存目录，返回 {name: (size, mtime_ns, inode)}；跳过下载中的 .tmp / .part 文件"""
+        entries = {}
+        with os.scandir(self.save_dir) as it:
+            for entry in it:
+                if is_partial_file(entry.name) or not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                entries[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return entries
+
+    def sync(self):
+        """让索引与目录内容保持一致，返回 (新增或变化数, 删除数)；目录未变化时返回 None"""
+        dir_mtime = os.stat(self.save_dir).st_mtime_ns
+
+        with self.pool.connection() as conn:
+            if self._load_meta(conn, 'dir_mtime_ns') == str(dir_mtime):
+                return None
+
+        # 先记录扫描开始时间，扫描期间目录若有变化，下次会重新扫描
+        scan_started = time.time()
+        on_disk = self._scan()
+
+        with self.pool.connection() as conn:
+            indexed = {row[0]: (row[1], row[2], row[3])
+                       for row in conn.execute("SELECT name, size, mtime_ns, inode FROM file_index")}
+            # 文件有变化时哈希失效（置为 NULL）
+            changed = [(name,) + info + (None,) for name, info in on_disk.items() if indexed.get(name) != info]
+            removed = [(name,) for name in indexed.keys() - on_disk.keys()]
+
+            self.upsert(conn, changed)
+            conn.executemany("DELETE FROM file_index WHERE name = ?", removed)
+
+            # 目录 mtime 太新时不保存，避免同一时间粒度内的后续改动被跳过
+            settled = scan_started - dir_mtime / 1e9 >= MTIME_SETTLE_SECONDS
+            conn.execute(
+                "INSERT OR REPLACE INTO file_index_meta (key, value) VALUES ('dir_mtime_ns', ?)",
+                (str(dir_mtime) if settled else None,)
+            )
+
+        if changed or removed:
+            self.logger.debug(f"🗂️ 文件索引更新：新增/变化 {len(changed)} 个，删除 {len(removed)} 个")
+        return len(changed), len(removed)
+
+    def mark_missing(self):
+        """同步索引后，把文件不存在的记录一次性标记为 stable=0，返回更新条数"""
+        self.sync()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE images SET stable = 0 "
+                "WHERE stable = 1 AND NOT EXISTS (SELECT 1 FROM file_index f WHERE f.name = images.name)"
+            )
+            return cursor.rowcount
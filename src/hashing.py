@@ -0,0 +1,29 @@
+import hashlib
+from src.process_pool import map_in_processes
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB，分块读取，内存占用与文件大小无关
+
+
+def md5_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """分块计算文件的 MD5"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_one(path):
+    """子进程中执行：返回 (path, hash, error)"""
+    try:
+        return path, md5_file(path), None
+    except OSError as e:
+        return path, None, str(e)
+
+
+def hash_files(paths, workers=None):
+    """在多个进程中并行计算文件 MD5，按输入顺序逐个产出 (path, hash, error)
+
+    workers 默认为 CPU 核数；文件少于两个时直接在当前进程计算，省去启动进程池的开销。
+    """
+    return map_in_processes(_hash_one, paths, workers)
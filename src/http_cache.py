@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import requests
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config import HTTP_CONFIG
+from src.db_pool import get_pool
+
+DEFAULT_TTL = 300  # 秒
+
+# 不写入缓存 URL 记录中的敏感参数（仍参与缓存键计算）
+SENSITIVE_PARAMS = {'apikey', 'api_key', 'access_token'}
+
+
+def normalize_url(url, params=None):
+    """规范化 URL + 查询参数：scheme/host 小写，参数合并后排序，去掉 fragment"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        for key, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                query.extend((key, str(v)) for v in value)
+            else:
+                query.append((key, str(value)))
+    query.sort()
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+
+
+class CachedResponse:
+    """来自缓存的响应，接口与 requests.Response 中常用的部分一致"""
+
+    def __init__(self, status_code, content, headers=None, url=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+        self.from_cache = True
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        """与 requests.Response.raise_for_status 一致：4xx / 5xx 时抛出 HTTPError"""
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """磁盘上的 HTTP 响应缓存（SQLite）
+
+    - 键为规范化后的 URL + 参数
+    - 每类接口有各自的 TTL：未过期直接返回缓存，过期后带 If-None-Match /
+      If-Modified-Since 发送条件请求，304 时继续使用缓存内容
+    - 总大小超过 max_bytes 时按最近访问时间（LRU）淘汰
+    """
+
+    def __init__(self, db_path, max_bytes=64 * 1024 * 1024, ttls=None, logger=None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {}
+        self.logger = logger or logging.getLogger('ResponseCache')
+        self.pool = get_pool(db_path)
+        self._size_lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._init_db()
+        with self.pool.connection() as conn:
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+
+    def _init_db(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_accessed ON http_cache(accessed_at)')
+
+    @staticmethod
+    def make_key(url, params=None):
+        return hashlib.sha1(normalize_url(url, params).encode('utf-8')).hexdigest()
+
+    def ttl_for(self, kind):
+        return self.ttls.get(kind, DEFAULT_TTL)
+
+    def _load(self, key):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT body, content_type, etag, last_modified, stored_at FROM http_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _touch(self, key, refreshed=False):
+        now = time.time()
+        with self.pool.connection() as conn:
+            if refreshed:
+                conn.execute("UPDATE http_cache SET accessed_at = ?, stored_at = ? WHERE key = ?", (now, now, key))
+            else:
+                conn.execute("UPDATE http_cache SET accessed_at = ? WHERE key = ?", (now, key))
+
+    def _store(self, key, url, params, kind, response):
+        body = response.content
+        now = time.time()
+        safe_params = {k: v for k, v in (params or {}).items() if k not in SENSITIVE_PARAMS}
+        with self.pool.connection() as conn:
+            old = conn.execute("SELECT size FROM http_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(key, url, kind, body, content_type, etag, last_modified, stored_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_url(url, safe_params), kind, body, response.headers.get('Content-Type'),
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now, len(body))
+            )
+        with self._size_lock:
+            self._total_bytes += len(body) - (old[0] if old else 0)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """按 LRU 淘汰，直到总大小降到 max_bytes 的 90% 以下"""
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        with self._size_lock, self.pool.connection() as conn:
+            rows = conn.execute("SELECT key, size FROM http_cache ORDER BY accessed_at").fetchall()
+            doomed = []
+            for key, size in rows:
+                if self._total_bytes <= target:
+                    break
+                doomed.append((key,))
+                self._total_bytes -= size
+            conn.executemany("DELETE FROM http_cache WHERE key = ?", doomed)
+            removed = len(doomed)
+        if removed:
+            self.logger.debug(f"🧹 HTTP 缓存淘汰 {removed} 条记录")
+        return removed
+
+    def get(self, session, url, params=None, headers=None, timeout=None, kind='default'):
+        """带缓存的 GET：返回 requests.Response 或 CachedResponse"""
+        key = self.make_key(url, params)
+        ttl = self.ttl_for(kind)
+        cached = self._load(key) if ttl > 0 else None
+
+        if cached is not None and time.time() - cached['stored_at'] < ttl:
+            self.hits += 1
+            self._touch(key)
+            return CachedResponse(200, cached['body'], {'Content-Type': cached['content_type']}, url)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached['etag']:
+                request_headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                request_headers['If-Modified-Since'] = cached['last_modified']
+
+        response = session.get(url, params=params, headers=request_headers, timeout=timeout)
+
+        if response.status_code == 304 and cached is not None:
+            self.revalidated += 1
+            self._touch(key, refreshed=True)
+            return CachedResponse(200, cached['body'], {'Content-Type': cached['content_type']}, url)
+
+        self.misses += 1
+        if response.status_code == 200 and ttl > 0 and response.content:
+            self._store(key, url, params, kind, response)
+        return response
+
+    def stats(self):
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+                'bytes': self._total_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """获取进程内共享的响应缓存（按 HTTP_CONFIG['cache'] 创建），未启用时返回 None"""
+    global _cache
+    cache_config = HTTP_CONFIG.get('cache') or {}
+    if not cache_config.get('enabled'):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    cache_config.get('db_path', 'http_cache.db'),
+                    max_bytes=cache_config.get('max_bytes', 64 * 1024 * 1024),
+                    ttls=cache_config.get('ttl'),
+                )
+    return _cache
+
+
+def cached_get(session, url, params=None, headers=None, timeout=None, kind=None):
+    """按接口类型 kind 走响应缓存的 GET；kind 为 None 或缓存未启用时直接请求"""
+    cache = get_response_cache() if kind else None
+    if cache is None:
+        return session.get(url, params=params, headers=headers, timeout=timeout)
+    return cache.get(session, url, params=params, headers=headers, timeout=timeout, kind=kind)
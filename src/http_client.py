@@ -0,0 +1,98 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import HTTP_CONFIG, REDDIT_CONFIG, WALLHAVEN_CONFIG
+from src.rate_limiter import get_rate_limiter
+from src.concurrency import get_concurrency_controller
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class RateLimitedSession(requests.Session):
+    """每个请求前按主机取令牌、请求后根据限流响应头调整的 Session
+
+    响应状态与网络异常同时反馈给并发控制器，作为自适应并发的拥塞信号。
+    """
+
+    def __init__(self, rate_limiter=None, concurrency=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.concurrency = concurrency or get_concurrency_controller()
+
+    def request(self, method, url, *args, **kwargs):
+        self.rate_limiter.acquire(url)
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.concurrency.record_exception(url, e)
+            raise
+        self.rate_limiter.update_from_response(url, response.status_code, response.headers)
+        self.concurrency.record_status(url, response.status_code)
+        return response
+
+
+def configured_pool_maxsize():
+    """每个主机的连接池大小：HTTP_CONFIG['pool_maxsize'] 与各下载器线程池大小（max_workers）中的较大值
+
+    所有下载器共用一个 Session，连接池小于下载线程数时，多出的连接用完即被丢弃（"Connection pool is full"），
+    无法复用 keep-alive。
+    """
+    return max([HTTP_CONFIG.get('pool_maxsize', 16)] +
+               [config.get('max_workers', 0) for config in (REDDIT_CONFIG, WALLHAVEN_CONFIG)])
+
+
+def build_session(pool_connections=None, pool_maxsize=None, retries=None, backoff_factor=None,
+                  status_forcelist=None):
+    """创建带连接池、keep-alive、重试策略与按主机限流的 Session
+
+    未传入的参数使用 HTTP_CONFIG 中的配置，pool_maxsize 默认按 configured_pool_maxsize() 计算。
+    """
+    pool_connections = pool_connections or HTTP_CONFIG.get('pool_connections', 10)
+    pool_maxsize = pool_maxsize or configured_pool_maxsize()
+    retries = HTTP_CONFIG.get('retries', 3) if retries is None else retries
+    backoff_factor = HTTP_CONFIG.get('backoff_factor', 0.5) if backoff_factor is None else backoff_factor
+    status_forcelist = status_forcelist or HTTP_CONFIG.get('status_forcelist', [502, 503, 504])
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        # 重试耗尽后返回最后一个响应，由调用方按状态码处理
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = RateLimitedSession()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """获取进程内共享的 Session（懒加载，线程安全）
+
+    urllib3 连接池本身是线程安全的，所有下载线程共用同一个 Session，
+    对同一主机的请求会复用已建立的 TCP/TLS 连接。请求头请在每次调用时单独传入。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def close_session():
+    """关闭共享 Session 并释放所有连接"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,129 @@
+import struct
+
+PROBE_BYTES = 16 * 1024  # Range 探测读取的字节数，足以覆盖绝大多数图片的 SOF / IHDR / VP8 头
+
+# JPEG 中携带宽高的 SOF 段（排除 DHT=C4、JPG=C8、DAC=CC）
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_dimensions(data):
+    """逐段跳过 APPn / EXIF 等，直到 SOF 段"""
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None  # 段结构损坏
+        marker = data[offset + 1]
+        if marker == 0xFF:  # 填充字节
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # 无长度字段的标记
+            offset += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+    return None
+
+
+def _webp_dimensions(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30 and data[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+
+def parse_dimensions(data):
+    """从文件开头的字节解析图片宽高，返回 (宽, 高)；数据不足或格式不支持时返回 None
+
+    支持 JPEG（SOF 段）、PNG（IHDR）、WebP（VP8 / VP8L / VP8X）与 GIF（逻辑屏幕描述符）。
+    """
+    if data.startswith(b'\xff\xd8'):
+        return _jpeg_dimensions(data)
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        if len(data) >= 24 and data[12:16] == b'IHDR':
+            return struct.unpack('>II', data[16:24])
+        return None
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        return _webp_dimensions(data)
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    return None
+
+
+def probe_dimensions(session, url, headers=None, timeout=None, max_bytes=PROBE_BYTES):
+    """只请求图片开头的 max_bytes 字节（Range）并解析宽高，无法解析时返回 None
+
+    服务器忽略 Range（返回 200）时读到足够的字节后就关闭响应，不下载完整图片。
+    """
+    request_headers = dict(headers or {})
+    request_headers['Range'] = f'bytes=0-{max_bytes - 1}'
+    data = b''
+    with session.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 206:
+            # 范围响应体不超过 max_bytes，读完后连接可以放回连接池复用
+            return parse_dimensions(response.content)
+        if response.status_code != 200:
+            return None
+        for chunk in response.iter_content(chunk_size=4096):
+            data += chunk
+            dimensions = parse_dimensions(data)
+            if dimensions is not None:
+                return dimensions
+            if len(data) >= max_bytes:
+                break
+    return None
+
+
+def format_resolution(dimensions):
+    """(宽, 高) -> '1920x1080'，未知时为 'unknown'（与 Wallhaven 数据库一致）"""
+    return f"{dimensions[0]}x{dimensions[1]}" if dimensions else 'unknown'
+
+
+class ResolutionFilter:
+    """分辨率与宽高比过滤，规则写法与 Wallhaven 的 atleast / ratios 参数一致
+
+    Args:
+        min_resolution: 最低分辨率，如 '1920x1080'；None 表示不限制
+        ratios: 'landscape'（宽 > 高）、'portrait'（高 > 宽）、'16x9,21x9' 或 ['16x9', '21x9']；None 表示不限制
+        tolerance: 指定宽高比时允许的相对误差（3440x1440 与 21x9 相差约 2.4%）
+    """
+
+    def __init__(self, min_resolution=None, ratios=None, tolerance=0.03):
+        self.min_size = None
+        if min_resolution:
+            width, height = str(min_resolution).lower().split('x')
+            self.min_size = (int(width), int(height))
+        if isinstance(ratios, str):
+            ratios = [ratio.strip() for ratio in ratios.split(',') if ratio.strip()]
+        self.ratios = list(ratios or [])
+        self.tolerance = tolerance
+
+    @property
+    def active(self):
+        return self.min_size is not None or bool(self.ratios)
+
+    def _ratio_matches(self, width, height, ratio):
+        if ratio == 'landscape':
+            return width > height
+        if ratio == 'portrait':
+            return height > width
+        a, b = (int(part) for part in ratio.lower().split('x'))
+        expected = a / b
+        return abs(width / height - expected) <= expected * self.tolerance
+
+    def check(self, width, height):
+        """符合规则时返回 None，否则返回不符合的原因"""
+        if self.min_size and (width < self.min_size[0] or height < self.min_size[1]):
+            return f"分辨率 {width}x{height} 低于 {self.min_size[0]}x{self.min_size[1]}"
+        if self.ratios and height and not any(self._ratio_matches(width, height, ratio) for ratio in self.ratios):
+            return f"宽高比 {width}x{height} 不符合 {','.join(self.ratios)}"
+        return None
@@ -0,0 +1,114 @@
+import logging
+import re
+import threading
+import time
+from config import REDDIT_CONFIG
+from src.http_cache import cached_get
+from src.http_client import get_session
+
+ALBUM_ID_PATTERN = re.compile(r'imgur\.com/(?:a|gallery)/(?:[\w-]*-)?(\w+)', re.IGNORECASE)
+# 相册页面中的图片直链（与 DIRECT_IMAGE_PATTERN 相同的静态格式）；
+# Imgur 缩略图在 ID 后加一个尺寸字母（s/b/t/m/l/h），ID 本身为 5 或 7 位
+IMAGE_URL_PATTERN = re.compile(rb'https?://i\.imgur\.com/(\w{5}|\w{7})\.(jpe?g|png|webp)\b', re.IGNORECASE)
+
+DEFAULT_TIMEOUT = (3, 5)  # (连接, 读取) 秒
+DEFAULT_SCAN_BYTES = 256 * 1024
+
+
+def album_id(album_url):
+    """从相册链接（imgur.com/a/<id>、imgur.com/gallery/<标题>-<id>）中取出相册 ID，无法识别时返回 None"""
+    match = ALBUM_ID_PATTERN.search(album_url or '')
+    return match.group(1) if match else None
+
+
+def scan_image_urls(chunks, max_bytes=DEFAULT_SCAN_BYTES, deadline=None):
+    """在页面开头最多 max_bytes 字节内按出现顺序查找图片直链（去重），超过 deadline 时停止读取"""
+    data = b''
+    for chunk in chunks:
+        data += chunk
+        if len(data) >= max_bytes or (deadline is not None and time.monotonic() >= deadline):
+            break
+    urls = []
+    for match in IMAGE_URL_PATTERN.finditer(data[:max_bytes]):
+        extension = match.group(2).decode().lower()
+        url = f"https://i.imgur.com/{match.group(1).decode()}.{'jpg' if extension == 'jpeg' else extension}"
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+class ImgurResolver:
+    """Imgur 相册解析：返回相册中全部图片的 (URL, 宽高)，按相册 ID 缓存
+
+    - 配置了 client_id 时请求官方 JSON 接口 /3/album/<id>/images（响应走磁盘缓存，附带宽高）
+    - 否则流式读取相册页面开头 scan_bytes 字节，用正则提取图片直链，不下载、不解析整页 HTML
+    所有请求都有 (连接, 读取) 超时，页面读取另有总时长上限；失败时返回空列表。
+    """
+
+    def __init__(self, session=None, client_id=None, api_base='https://api.imgur.com', timeout=DEFAULT_TIMEOUT,
+                 scan_bytes=DEFAULT_SCAN_BYTES, logger=None):
+        self.session = session or get_session()
+        self.client_id = client_id
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.scan_bytes = scan_bytes
+        self.logger = logger or logging.getLogger('ImgurResolver')
+        self._cache = {}  # 相册 ID -> [(URL, 宽高), ...]
+        self._lock = threading.Lock()
+
+    def resolve(self, album_url):
+        """返回相册中全部图片的 [(URL, 宽高), ...]，宽高未知时为 None"""
+        key = album_id(album_url)
+        if key is None:
+            return []
+        with self._lock:
+            if key in self._cache:
+                return list(self._cache[key])
+        try:
+            images = self._from_api(key) if self.client_id else self._from_page(album_url)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 解析 Imgur 相册失败: {album_url} - {e}")
+            return []
+        with self._lock:
+            self._cache[key] = images
+        self.logger.debug(f"🖼️ Imgur 相册 {key}: {len(images)} 张图片")
+        return list(images)
+
+    def _from_api(self, key):
+        response = cached_get(self.session, f"{self.api_base}/3/album/{key}/images",
+                              headers={'Authorization': f"Client-ID {self.client_id}"},
+                              timeout=self.timeout, kind='imgur_album')
+        response.raise_for_status()
+        images = []
+        for item in response.json().get('data') or []:
+            if not item.get('link') or item.get('animated'):
+                continue
+            dimensions = (int(item['width']), int(item['height'])) if item.get('width') and item.get('height') else None
+            images.append((item['link'], dimensions))
+        return images
+
+    def _from_page(self, album_url):
+        # 读取超时只限制单次等待，服务器持续慢速发送时由总时长上限兜底
+        total = sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+        deadline = time.monotonic() + total if total else None
+        with self.session.get(album_url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            urls = scan_image_urls(response.iter_content(chunk_size=16 * 1024), self.scan_bytes, deadline)
+        return [(url, None) for url in urls]
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_imgur_resolver():
+    """获取进程内共享的 Imgur 相册解析器（配置见 REDDIT_CONFIG['imgur']）"""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                config = REDDIT_CONFIG.get('imgur', {})
+                _resolver = ImgurResolver(client_id=config.get('client_id'),
+                                          timeout=tuple(config.get('timeout', DEFAULT_TIMEOUT)),
+                                          scan_bytes=config.get('scan_bytes', DEFAULT_SCAN_BYTES))
+    return _resolver
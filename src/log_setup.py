@@ -0,0 +1,123 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from config import LOGGING_CONFIG
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging():
+    """配置进程内共享的日志系统（多次调用只生效一次），返回日志文件路径
+
+    下载线程只把日志记录放进内存队列（QueueHandler），由后台监听线程（QueueListener）
+    统一写入文件与控制台，热路径上不再争用文件 / 控制台 handler 的锁，也不等待控制台 I/O。
+    根日志已由调用方配置过时（例如测试或基准测试）保持不变，与 logging.basicConfig 一致。
+    """
+    global _listener
+    with _setup_lock:
+        root = logging.getLogger()
+        if _listener is not None or root.handlers:
+            return getattr(_listener, 'log_path', None)
+
+        formatter = logging.Formatter(LOGGING_CONFIG.get('format', '%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        file_level = logging.getLevelName(LOGGING_CONFIG.get('level', 'INFO'))
+        console_level = logging.getLevelName(LOGGING_CONFIG.get('console_level', 'INFO'))
+
+        log_dir = LOGGING_CONFIG.get('log_dir', 'logs')
+        os.makedirs(log_dir, exist_ok=True)
+        prefix = LOGGING_CONFIG.get('file_prefix', 'wallhub')
+        log_path = os.path.join(log_dir, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+
+        file_handler = logging.FileHandler(log_path, encoding='utf-8')
+        file_handler.setLevel(file_level)
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(console_level)
+        console_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(min(file_level, console_level))
+
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler,
+                                                   respect_handler_level=True)
+        _listener.log_path = log_path
+        _listener.start()
+        # 进程退出前写完队列中剩余的日志
+        atexit.register(shutdown_logging)
+
+        for name in LOGGING_CONFIG.get('quiet_loggers', []):
+            logging.getLogger(name).setLevel(logging.WARNING)
+        return log_path
+
+
+def shutdown_logging():
+    """停止后台监听线程并写完队列中剩余的日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        for handler in list(logging.getLogger().handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                logging.getLogger().removeHandler(handler)
+        _listener = None
+
+
+class ProgressReporter:
+    """限频的下载进度汇总（线程安全）
+
+    逐张图片调用 update()，每隔 interval 秒最多输出一行汇总，结束时调用 finish() 输出最终进度。
+    total 可以是整数，也可以是返回当前总数的函数（边搜索边下载时总数会增长）。
+    """
+
+    def __init__(self, logger, total=None, label='下载', interval=None):
+        self.logger = logger
+        self.total = total
+        self.label = label
+        self.interval = LOGGING_CONFIG.get('progress_interval', 5.0) if interval is None else interval
+        self.succeeded = 0
+        self.failed = 0
+        self._started = time.monotonic()
+        self._last_report = self._started
+        self._lock = threading.Lock()
+
+    def update(self, ok=True):
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            now = time.monotonic()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self._report()
+
+    def track(self, future):
+        """future 完成时更新进度（线程池任务提交后立即调用，提交尚未结束时进度也能实时更新）"""
+        future.add_done_callback(lambda done: self.update(done.exception() is None and bool(done.result())))
+        return future
+
+    def finish(self):
+        self._report()
+
+    def current_total(self):
+        return self.total() if callable(self.total) else self.total
+
+    def _report(self):
+        done = self.succeeded + self.failed
+        total = self.current_total()
+        elapsed = time.monotonic() - self._started
+        rate = self.succeeded / elapsed if elapsed > 0 else 0.0
+        progress = f"{done}/{total}" if total else f"{done}"
+        self.logger.info(f"📊 {self.label}进度: {progress}（成功 {self.succeeded}，失败或跳过 {self.failed}），"
+                         f"{rate:.1f} 张/秒")
@@ -0,0 +1,147 @@
+import hashlib
+import sqlite3
+import threading
+from src.db_pool import get_pool
+
+DIGEST_SIZE = 16  # MD5 摘要长度
+MERGE_THRESHOLD = 4096  # 新增条目超过该数量时并入有序数组
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def text_digest(value):
+    """任意字符串（URL、ID）的 16 字节摘要"""
+    return hashlib.md5(str(value).encode('utf-8')).digest()
+
+
+def hex_digest(value):
+    """MD5 十六进制字符串直接转换为 16 字节，无法解析时退化为 text_digest"""
+    try:
+        digest = bytes.fromhex(value)
+    except (TypeError, ValueError):
+        return text_digest(value)
+    return digest if len(digest) == DIGEST_SIZE else text_digest(value)
+
+
+class DigestSet:
+    """紧凑的 16 字节摘要集合
+
+    已有条目保存在一个按字节序排列的 bytes 中（每条 16 字节，没有 Python 对象开销），
+    查询用二分查找；运行中新增的条目先放进一个小集合，积累到 MERGE_THRESHOLD 后再合并。
+    读操作无锁（合并时整体替换数组），写操作加锁。
+    """
+
+    def __init__(self, sorted_digests=b''):
+        self._array = bytes(sorted_digests)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._array) // DIGEST_SIZE + len(self._pending)
+
+    def _search(self, array, digest):
+        low, high = 0, len(array) // DIGEST_SIZE
+        while low < high:
+            mid = (low + high) // 2
+            offset = mid * DIGEST_SIZE
+            current = array[offset:offset + DIGEST_SIZE]
+            if current < digest:
+                low = mid + 1
+            elif current > digest:
+                high = mid
+            else:
+                return True
+        return False
+
+    def __contains__(self, digest):
+        return digest in self._pending or self._search(self._array, digest)
+
+    def add(self, digest):
+        with self._lock:
+            if digest in self._pending or self._search(self._array, digest):
+                return
+            self._pending.add(digest)
+            if len(self._pending) >= MERGE_THRESHOLD:
+                self._merge()
+
+    def _merge(self):
+        """把新增条目归并进有序数组"""
+        array = self._array
+        merged = bytearray()
+        position = 0
+        for digest in sorted(self._pending):
+            low, high = position // DIGEST_SIZE, len(array) // DIGEST_SIZE
+            while low < high:
+                mid = (low + high) // 2
+                if array[mid * DIGEST_SIZE:(mid + 1) * DIGEST_SIZE] < digest:
+                    low = mid + 1
+                else:
+                    high = mid
+            merged += array[position:low * DIGEST_SIZE]
+            merged += digest
+            position = low * DIGEST_SIZE
+        merged += array[position:]
+        self._array = bytes(merged)
+        self._pending = set()
+
+
+class MembershipIndex:
+    """某个数据库列的进程内成员索引（URL、哈希、Wallhaven ID 等）
+
+    启动时让 SQLite 计算摘要并排序后流式读出，Python 端只保留紧凑的有序字节数组；
+    之后写入数据库的新记录通过 add() 增量加入，无需重新加载。
+    """
+
+    def __init__(self, db_path, column, where=None, digest=text_digest):
+        self.db_path = db_path
+        self.column = column
+        self.where = where
+        self._digest = digest
+        self._set = DigestSet(self._load())
+
+    def _load(self):
+        array = bytearray()
+        last = None
+        where = f" AND ({self.where})" if self.where else ''
+        with get_pool(self.db_path).connection() as conn:
+            conn.create_function('membership_digest', 1, self._digest, deterministic=True)
+            try:
+                rows = conn.execute(
+                    f"SELECT membership_digest({self.column}) AS d FROM images "
+                    f"WHERE {self.column} IS NOT NULL{where} ORDER BY d"
+                )
+                for (digest,) in rows:
+                    if digest != last:
+                        array += digest
+                        last = digest
+            except sqlite3.OperationalError:
+                # 表尚未创建
+                pass
+        return array
+
+    def __len__(self):
+        return len(self._set)
+
+    def __contains__(self, value):
+        return value is not None and self._digest(value) in self._set
+
+    def add(self, value):
+        if value is not None:
+            self._set.add(self._digest(value))
+
+
+def get_membership_index(db_path, column, where=None, digest=text_digest):
+    """获取进程内共享的成员索引（同一数据库列只加载一次）"""
+    key = (db_path, column, where)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = MembershipIndex(db_path, column, where, digest)
+            _indexes[key] = index
+        return index
+
+
+def get_hash_index(db_path, stable_only=False):
+    """图片哈希的成员索引；stable_only=True 时只包含 stable=1 的记录"""
+    return get_membership_index(db_path, 'hash', 'stable = 1' if stable_only else None, hex_digest)
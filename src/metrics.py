@@ -0,0 +1,269 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_CONFIG
+
+# 直方图的桶上界（秒），覆盖从亚毫秒级的哈希 / 写盘到数十秒的大图下载
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 各阶段名称
+STAGES = (
+    'api_page',        # 搜索 / 列表接口分页请求
+    'post_json',       # 帖子 JSON 请求（/api/info.json 批量获取）
+    'image_probe',     # 下载前读取图片文件头（Range）获取宽高
+    'image_transfer',  # 图片网络传输（不含本地校验、哈希与写盘）
+    'validation',      # 文件头校验
+    'hashing',         # 增量 MD5
+    'disk_write',      # 写临时文件 + 原子重命名
+    'db_insert',       # 批量写库（一次提交）
+)
+
+_registry = {}
+_registry_lock = threading.Lock()
+_server = None
+
+
+class Histogram:
+    """固定桶的耗时直方图（线程安全）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """按桶内线性插值估算分位数"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'total_seconds': round(self.sum, 6),
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else None,
+            'p50_ms': _ms(self.quantile(0.50)),
+            'p90_ms': _ms(self.quantile(0.90)),
+            'p99_ms': _ms(self.quantile(0.99)),
+            'max_ms': _ms(self.max) if self.count else None,
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class RunMetrics:
+    """单个下载源的运行指标：各阶段耗时直方图 + 事件计数器
+
+    用法:
+        metrics = get_metrics('reddit')
+        with metrics.timer('api_page'):
+            response = session.get(...)
+        metrics.inc('images_downloaded')
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空指标，开始新一轮统计"""
+        with self._lock:
+            self.started_at = time.time()
+            self.histograms = {}
+            self.counters = {}
+
+    def histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, stage):
+        """统计代码块耗时（异常退出时同样计入）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def record_download(self, writer, elapsed):
+        """记录一次图片下载：elapsed 为请求开始到响应体接收完的时间
+
+        网络传输耗时 = elapsed 减去写入器在接收过程中的本地处理时间（校验、哈希、写盘）；
+        哈希在 CPU 阶段进程池中计算时不在 elapsed 之内，不扣除。
+        """
+        local = writer.validate_seconds + writer.write_seconds
+        if writer.inline_hash:
+            local += writer.hash_seconds
+        self.observe('image_transfer', max(0.0, elapsed - local))
+        self.observe('validation', writer.validate_seconds)
+        self.observe('hashing', writer.hash_seconds)
+        self.observe('disk_write', writer.write_seconds + writer.commit_seconds)
+        self.inc('bytes_downloaded', writer.bytes_written)
+
+    def summary(self):
+        """机器可读的指标摘要"""
+        stages = {stage: histogram.snapshot() for stage, histogram in sorted(
+            list(self.histograms.items()), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))}
+        busiest = max(stages, key=lambda stage: stages[stage]['total_seconds']) if stages else None
+        return {
+            'source': self.source,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.time() - self.started_at, 3),
+            'busiest_stage': busiest,  # 累计耗时最多的阶段（多线程下各阶段时间会重叠，仅供判断瓶颈）
+            'stages': stages,
+            'counters': dict(sorted(list(self.counters.items()))),
+        }
+
+    def render_prometheus(self):
+        """Prometheus 文本格式（不含 HELP / TYPE 头）"""
+        lines = []
+        for stage, histogram in list(self.histograms.items()):
+            labels = f'source="{self.source}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'wallhub_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'wallhub_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'wallhub_stage_seconds_count{{{labels}}} {histogram.count}')
+        for name, value in list(self.counters.items()):
+            lines.append(f'wallhub_events_total{{source="{self.source}",event="{name}"}} {value}')
+        return lines
+
+
+def get_metrics(source):
+    """获取进程内共享的某个下载源的指标对象"""
+    with _registry_lock:
+        metrics = _registry.get(source)
+        if metrics is None:
+            metrics = RunMetrics(source)
+            _registry[source] = metrics
+        return metrics
+
+
+def render_prometheus():
+    """所有下载源的指标（Prometheus 文本格式）"""
+    lines = [
+        '# HELP wallhub_stage_seconds 下载各阶段耗时（秒）',
+        '# TYPE wallhub_stage_seconds histogram',
+    ]
+    with _registry_lock:
+        sources = list(_registry.values())
+    counters = []
+    for metrics in sources:
+        for line in metrics.render_prometheus():
+            (counters if line.startswith('wallhub_events_total') else lines).append(line)
+    lines += ['# HELP wallhub_events_total 下载事件计数', '# TYPE wallhub_events_total counter'] + counters
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body = render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.split('?')[0] == '/metrics.json':
+            with _registry_lock:
+                sources = list(_registry.values())
+            body = json.dumps([m.summary() for m in sources], ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(logger=None):
+    """按 METRICS_CONFIG 启动指标接口（未配置端口或已启动时不做任何事），返回服务器对象"""
+    global _server
+    port = METRICS_CONFIG.get('http_port')
+    if not METRICS_CONFIG.get('enabled') or not port:
+        return None
+    with _registry_lock:
+        if _server is None:
+            logger = logger or logging.getLogger('Metrics')
+            host = METRICS_CONFIG.get('http_host', '127.0.0.1')
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"⚠️ 指标接口启动失败: {host}:{port} - {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='MetricsServer', daemon=True).start()
+            logger.info(f"📈 指标接口: http://{host}:{port}/metrics")
+    return _server
+
+
+def report_summary(metrics, logger=None):
+    """run() 结束时输出指标摘要：逐阶段写日志，并按配置保存 JSON 文件，返回摘要"""
+    logger = logger or logging.getLogger('Metrics')
+    summary = metrics.summary()
+    if not METRICS_CONFIG.get('enabled'):
+        return summary
+
+    for stage, stats in summary['stages'].items():
+        logger.info(f"⏱️ {stage}: {stats['count']} 次，p50 {stats['p50_ms']}ms，"
+                    f"p99 {stats['p99_ms']}ms，累计 {stats['total_seconds']:.2f}s")
+    if summary['busiest_stage']:
+        logger.info(f"🔎 累计耗时最多的阶段: {summary['busiest_stage']}")
+
+    summary_dir = METRICS_CONFIG.get('summary_dir')
+    if summary_dir:
+        os.makedirs(summary_dir, exist_ok=True)
+        path = os.path.join(
+            summary_dir, f"{metrics.source}_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            logger.info(f"📊 指标摘要已保存: {path}")
+        except OSError as e:
+            logger.warning(f"⚠️ 保存指标摘要失败: {path} - {e}")
+    return summary
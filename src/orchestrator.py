@@ -0,0 +1,130 @@
+import logging
+import math
+import threading
+import time
+from config import HTTP_CONFIG, LOGGING_CONFIG
+from src.concurrency import get_concurrency_controller
+from src.log_setup import setup_logging
+
+
+class SourceOrchestrator:
+    """多下载源并发调度器（main.py all / db-all）
+
+    每个下载源的 run() 在独立线程中运行，各自访问不同的主机与数据库，互不等待：
+    - 线程池下载通过共享的并发控制器分配总并发数（global_budget），每个下载源至少获得
+      ⌈总数 / 运行中的下载源数⌉ 个名额，先结束的下载源让出份额
+    - 异步引擎不经过并发控制器，按同样的份额限制每个下载源的连接数
+    - 运行期间每隔 progress_interval 秒输出一行合并进度，结束后输出合并统计
+    """
+
+    def __init__(self, downloaders, budget=None, logger=None):
+        setup_logging()
+        self.downloaders = list(downloaders)
+        if budget is None:
+            budget = HTTP_CONFIG.get('concurrency', {}).get('global_budget')
+        self.budget = budget
+        self.logger = logger or logging.getLogger('SourceOrchestrator')
+        self.controller = get_concurrency_controller()
+        self.results = {}
+        self.use_async = False
+
+    @staticmethod
+    def _source(downloader):
+        return downloader.metrics.source
+
+    def _run_one(self, downloader, use_async):
+        source = self._source(downloader)
+        started = time.monotonic()
+        status = 'ok'
+        try:
+            downloader.run(use_async=use_async)
+        except Exception as e:
+            status = 'error'
+            self.logger.error(f"❌ {source} 运行出错: {e}", exc_info=True)
+        finally:
+            # 份额立即分给仍在运行的下载源
+            self.controller.finish_source(source)
+            self.results[source] = {'status': status, 'elapsed_seconds': round(time.monotonic() - started, 3)}
+            self.logger.info(f"🏁 {source} 结束（{'成功' if status == 'ok' else '出错'}），"
+                             f"耗时 {time.monotonic() - started:.1f}s")
+
+    def run(self, use_async=False):
+        """并发运行所有下载源，返回合并统计"""
+        sources = [self._source(downloader) for downloader in self.downloaders]
+        self.logger.info(f"🎬 并发运行 {len(sources)} 个下载源: {', '.join(sources)}"
+                         + (f"，总并发数 {self.budget}" if self.budget else ''))
+        self.use_async = use_async
+        if use_async and self.budget:
+            share = max(1, math.ceil(self.budget / len(self.downloaders)))
+            for downloader in self.downloaders:
+                downloader.async_max_concurrency = min(downloader.async_max_concurrency, share)
+
+        started = time.monotonic()
+        self.results = {}
+        self.controller.set_budget(self.budget, sources)
+        threads = [
+            threading.Thread(target=self._run_one, args=(downloader, use_async),
+                             name=f"Source-{self._source(downloader)}", daemon=True)
+            for downloader in self.downloaders
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            interval = LOGGING_CONFIG.get('progress_interval', 5.0)
+            while True:
+                alive = [thread for thread in threads if thread.is_alive()]
+                if not alive:
+                    break
+                alive[0].join(interval)
+                if any(thread.is_alive() for thread in threads):
+                    self._report_progress(started)
+        finally:
+            self.controller.set_budget(None)
+        return self._report_summary(time.monotonic() - started)
+
+    def _report_progress(self, started):
+        """合并进度：各下载源的已完成数 / 总数，以及总吞吐量"""
+        parts = []
+        succeeded = failed = 0
+        for downloader in self.downloaders:
+            source = self._source(downloader)
+            progress = downloader.progress
+            if progress is None:
+                parts.append(f"{source} {'已结束' if source in self.results else '准备中'}")
+                continue
+            succeeded += progress.succeeded
+            failed += progress.failed
+            total = progress.current_total()
+            done = progress.succeeded + progress.failed
+            parts.append(f"{source} {done}/{total}" if total else f"{source} {done}")
+        elapsed = time.monotonic() - started
+        budget = ''
+        if self.budget and not self.use_async:
+            budget = f"，占用并发 {sum(self.controller.source_in_flight().values())}/{self.budget}"
+        self.logger.info(f"📊 总进度: {' | '.join(parts)}（成功 {succeeded}，失败或跳过 {failed}），"
+                         f"{succeeded / elapsed if elapsed > 0 else 0.0:.1f} 张/秒{budget}")
+
+    def _report_summary(self, elapsed):
+        """输出并返回合并统计"""
+        summary = {'elapsed_seconds': round(elapsed, 3), 'budget': self.budget, 'sources': {}}
+        totals = {'images_downloaded': 0, 'images_failed': 0, 'bytes_downloaded': 0}
+        self.logger.info("=" * 60)
+        self.logger.info("📊 多源下载统计")
+        for downloader in self.downloaders:
+            source = self._source(downloader)
+            counters = downloader.metrics.summary()['counters']
+            stats = dict(self.results.get(source, {'status': 'error', 'elapsed_seconds': None}))
+            for name in totals:
+                stats[name] = counters.get(name, 0)
+                totals[name] += stats[name]
+            summary['sources'][source] = stats
+            self.logger.info(f"{'✅' if stats['status'] == 'ok' else '❌'} {source}: 成功 {stats['images_downloaded']}，"
+                             f"失败或跳过 {stats['images_failed']}，{stats['bytes_downloaded'] / 1024 / 1024:.1f} MB，"
+                             f"耗时 {stats['elapsed_seconds']}s")
+        summary['totals'] = totals
+        sequential = sum(stats['elapsed_seconds'] or 0 for stats in summary['sources'].values())
+        self.logger.info(f"📦 合计: 成功 {totals['images_downloaded']}，失败或跳过 {totals['images_failed']}，"
+                         f"{totals['bytes_downloaded'] / 1024 / 1024:.1f} MB")
+        self.logger.info(f"⏱️ 总耗时 {elapsed:.1f}s（各下载源耗时之和 {sequential:.1f}s）")
+        self.logger.info("=" * 60)
+        return summary
@@ -0,0 +1,112 @@
+from src.process_pool import map_in_processes
+
+# numpy 与 Pillow 为可选依赖，仅在计算感知哈希时需要：pip install numpy Pillow
+try:
+    import numpy as np
+except ImportError:  # 可选依赖
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:  # 可选依赖
+    Image = None
+
+HASH_SIZE = 8  # 8x8 = 64 位哈希
+DEFAULT_THRESHOLD = 6  # 汉明距离不超过该值视为近似重复
+
+
+def require_dependencies():
+    """检查 numpy / Pillow 是否可用，不可用时给出安装提示"""
+    missing = [name for name, module in (('numpy', np), ('Pillow', Image)) if module is None]
+    if missing:
+        raise ImportError(f"感知哈希需要安装 {' 和 '.join(missing)}: pip install numpy Pillow")
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """计算图片的 dHash，返回 64 位整数哈希
+
+    解码时让 JPEG 解码器直接按缩小后的尺寸解码（draft），再缩放为 (hash_size+1) x hash_size 灰度图，
+    用 NumPy 一次性比较相邻像素得到哈希位。
+    """
+    require_dependencies()
+    with Image.open(path) as image:
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    """两个整数哈希的汉明距离"""
+    return (a ^ b).bit_count()
+
+
+def to_hex(value):
+    return f"{value:016x}"
+
+
+def from_hex(text):
+    return int(text, 16)
+
+
+def _dhash_one(path):
+    """子进程中执行：返回 (path, hash, error)"""
+    try:
+        return path, dhash(path), None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def dhash_files(paths, workers=None):
+    """在多个进程中并行计算 dHash，按输入顺序产出 (path, hash, error)"""
+    require_dependencies()
+    return map_in_processes(_dhash_one, paths, workers)
+
+
+class HammingIndex:
+    """多段索引（multi-index hashing）的汉明距离近邻查找
+
+    把 64 位哈希切成 max_distance + 1 段，每段建一个精确匹配的字典。
+    由鸽巢原理，距离不超过 max_distance 的两个哈希至少有一段完全相同，
+    因此查询只需取出各段命中的候选并逐一校验距离。
+    """
+
+    def __init__(self, max_distance=DEFAULT_THRESHOLD, bits=HASH_SIZE * HASH_SIZE):
+        self.max_distance = max_distance
+        segments = max_distance + 1
+        widths = [bits // segments + (1 if i < bits % segments else 0) for i in range(segments)]
+        self._slices = []
+        shift = bits
+        for width in widths:
+            shift -= width
+            self._slices.append((shift, (1 << width) - 1))
+        self._tables = [{} for _ in self._slices]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item):
+        """插入一个哈希及其关联对象"""
+        entry = (value, item)
+        for table, (shift, mask) in zip(self._tables, self._slices):
+            table.setdefault((value >> shift) & mask, []).append(entry)
+        self._size += 1
+
+    def search(self, value, max_distance=None):
+        """返回与 value 距离不超过 max_distance 的 [(distance, item)]，按距离排序"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        results = []
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._slices):
+            for entry in table.get((value >> shift) & mask, ()):
+                if id(entry) in seen:
+                    continue
+                seen.add(id(entry))
+                distance = (value ^ entry[0]).bit_count()
+                if distance <= max_distance:
+                    results.append((distance, entry[1]))
+        results.sort(key=lambda pair: pair[0])
+        return results
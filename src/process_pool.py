@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_context():
+    """子进程的启动方式：forkserver（不可用时用 spawn）
+
+    调用方进程内通常已有多个线程（下载线程、日志监听线程等），fork 可能复制到被持有的锁；
+    入口脚本需要 if __name__ == "__main__" 保护。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def new_process_pool(workers=None):
+    """创建使用统一启动方式的进程池，workers 默认为 CPU 核数"""
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=process_context())
+
+
+def map_in_processes(func, items, workers=None):
+    """在多个进程中并行执行 func，按输入顺序逐个产出结果
+
+    workers 默认为 CPU 核数；少于两项或 workers == 1 时直接在当前进程执行，省去启动进程池的开销。
+    func 必须是模块级函数（可被子进程导入）。
+    """
+    items = list(items)
+    if len(items) < 2 or workers == 1:
+        for item in items:
+            yield func(item)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(64, len(items) // (workers * 4)))
+    with new_process_pool(workers) as executor:
+        yield from executor.map(func, items, chunksize=chunksize)
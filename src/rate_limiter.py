@@ -0,0 +1,183 @@
+import asyncio
+import email.utils
+import threading
+import time
+from urllib.parse import urlparse
+from config import HTTP_CONFIG
+
+# 收到 429 但没有 Retry-After 时的默认等待时间（秒）
+DEFAULT_RETRY_AFTER = 10
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class TokenBucket:
+    """线程安全的令牌桶
+
+    以 rate 个/秒的速度补充令牌，最多积攒 burst 个。
+    pause_until() 可以让整个桶暂停到指定时间（用于 Retry-After 等服务端限流提示）。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """尝试取一个令牌：成功返回 0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """阻塞直到取得令牌，返回总等待时间"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self):
+        """异步版本的 acquire"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def pause_until(self, deadline):
+        """暂停发放令牌直到 deadline（time.monotonic() 时间），并清空已积攒的令牌"""
+        with self._lock:
+            if deadline > self._paused_until:
+                self._paused_until = deadline
+            self._tokens = 0.0
+            self._updated = max(self._updated, deadline)
+
+    def drain(self):
+        """清空令牌（服务端报告配额已用完时调用）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+def _parse_retry_after(value):
+    """解析 Retry-After：秒数或 HTTP 日期，返回秒数"""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _parse_number(value):
+    """解析 X-RateLimit-* 数值（Reddit 返回 '0.0'、'12.5' 这类小数），无法解析时返回 None"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """按主机划分的令牌桶限流器，由所有下载线程和下载源共享
+
+    limits 形如 {'wallhaven.cc': {'rate': 0.75, 'burst': 5}}，rate 为每秒请求数。
+    未配置的主机不限流（除非服务端返回 429 / Retry-After）。
+    """
+
+    def __init__(self, limits=None):
+        self._limits = limits or {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url):
+        return (urlparse(url).hostname or '').lower()
+
+    def has_limit(self, url):
+        """该 URL 的主机是否配置了速率限制"""
+        return self._host(url) in self._limits
+
+    def bucket(self, url):
+        """获取 URL 所属主机的令牌桶（首次访问时创建）"""
+        host = self._host(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                limit = self._limits.get(host)
+                if limit:
+                    bucket = TokenBucket(limit['rate'], limit.get('burst', 1))
+                else:
+                    # 未配置的主机：令牌实际上不限，只用于响应 Retry-After
+                    bucket = TokenBucket(rate=1e9, burst=1e9)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url):
+        """请求前调用：等待该主机的令牌"""
+        return self.bucket(url).acquire()
+
+    async def acquire_async(self, url):
+        """异步请求前调用：等待该主机的令牌"""
+        return await self.bucket(url).acquire_async()
+
+    def update_from_response(self, url, status, headers):
+        """根据响应调整限流状态
+
+        - 429 / 503 带 Retry-After：暂停该主机直到指定时间
+        - 429 无 Retry-After：暂停 DEFAULT_RETRY_AFTER 秒
+        - X-RateLimit-Remaining 不大于 0（Reddit 为 '0.0' 这样的小数）：清空令牌；有 X-RateLimit-Reset 时暂停到重置时间
+        """
+        bucket = self.bucket(url)
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        if status == 429 and retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        if retry_after is not None and status in (429, 503):
+            bucket.pause_until(time.monotonic() + retry_after)
+            return retry_after
+
+        remaining = _parse_number(headers.get('X-RateLimit-Remaining'))
+        if remaining is not None and remaining <= 0:
+            reset = _parse_number(headers.get('X-RateLimit-Reset'))
+            if reset is not None:
+                # 既可能是 Unix 时间戳，也可能是剩余秒数
+                wait = reset - time.time() if reset > 1e9 else reset
+                if wait > 0:
+                    bucket.pause_until(time.monotonic() + wait)
+                    return wait
+            bucket.drain()
+        return None
+
+
+def get_rate_limiter():
+    """获取进程内共享的限流器（按 HTTP_CONFIG['rate_limits'] 创建）"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(HTTP_CONFIG.get('rate_limits'))
+    return _limiter
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from src.utils import is_valid_image
+
+# 判断图片格式所需的最少文件头字节数（WebP 需要 12 字节）
+MAGIC_BYTES_LENGTH = 12
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# 临时文件与续传文件的前缀，目录扫描时据此跳过未完成的下载
+PARTIAL_PREFIX = '.download_'
+PARTIAL_SUFFIXES = ('.tmp', '.part', '.part.json')
+
+
+def part_path_for(save_dir, url):
+    """同一 URL 的续传文件路径（.download_<URL 哈希>.part）
+
+    所有下载器按 URL 命名续传文件，同一张图片无论由哪个下载器中断，都能被另一个继续下载。
+    """
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:20]
+    return os.path.join(save_dir, f"{PARTIAL_PREFIX}{digest}.part")
+
+
+def is_partial_file(name):
+    """是否为未完成下载的临时文件或续传文件"""
+    return name.startswith(PARTIAL_PREFIX) or name.endswith(PARTIAL_SUFFIXES)
+
+
+class InvalidImageError(ValueError):
+    """下载内容的文件头不是有效图片"""
+
+
+class ImageStreamWriter:
+    """流式写入图片：边下载边写临时文件，同时增量计算 MD5
+
+    用法:
+        with ImageStreamWriter(save_dir, content_type) as writer:
+            for chunk in response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE):
+                writer.write(chunk)
+            writer.commit(final_path)
+
+    内存占用只与 chunk 大小有关，与图片大小无关。未调用 commit 时退出上下文会删除临时文件。
+    inline_hash=False 时下载线程只写文件，MD5 由 CPU 阶段（src.cpu_stage）按路径计算后填入 digest。
+    """
+
+    def __init__(self, save_dir, content_type='', inline_hash=True):
+        os.makedirs(save_dir, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(prefix=PARTIAL_PREFIX, suffix='.tmp', dir=save_dir)
+        self._file = os.fdopen(fd, 'wb')
+        self._md5 = hashlib.md5() if inline_hash else None
+        self.digest = None
+        self.dimensions = None  # CPU 阶段解析出的 (宽, 高)
+        self._head = b''
+        self._validated = False
+        self._committed = False
+        self.content_type = content_type or ''
+        self.bytes_written = 0
+        self._reset_timings()
+
+    def _reset_timings(self):
+        # 本地处理耗时（秒），供 RunMetrics.record_download 统计各阶段
+        self.validate_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.write_seconds = 0.0
+        self.commit_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._committed:
+            self.abort()
+        return False
+
+    def write(self, chunk):
+        """写入一个数据块，首个数据块到达时校验文件头"""
+        if not chunk:
+            return
+        if not self._validated:
+            self._head += chunk[:MAGIC_BYTES_LENGTH]
+            if len(self._head) >= MAGIC_BYTES_LENGTH:
+                self._validate_head()
+        start = time.perf_counter()
+        if self._md5 is not None:
+            self._md5.update(chunk)
+        hashed = time.perf_counter()
+        self._file.write(chunk)
+        self.hash_seconds += hashed - start
+        self.write_seconds += time.perf_counter() - hashed
+        self.bytes_written += len(chunk)
+
+    def _validate_head(self):
+        start = time.perf_counter()
+        try:
+            if not is_valid_image(self._head, self.content_type):
+                raise InvalidImageError(f"无效的图片文件头: {self._head[:MAGIC_BYTES_LENGTH]!r}")
+        finally:
+            self.validate_seconds += time.perf_counter() - start
+        self._validated = True
+
+    @property
+    def committed(self):
+        """是否已重命名为最终文件"""
+        return self._committed
+
+    @property
+    def inline_hash(self):
+        """MD5 是否在下载线程中边写边算"""
+        return self._md5 is not None
+
+    @property
+    def hexdigest(self):
+        """已写入内容的 MD5（inline_hash=False 时为 CPU 阶段填入的 digest）"""
+        if self._md5 is None:
+            return self.digest
+        return self._md5.hexdigest()
+
+    def close_file(self):
+        """结束写入并关闭临时文件（不重命名），之后可按 temp_path 在其他进程中读取"""
+        if not self._validated:
+            self._validate_head()
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+    def commit(self, final_path):
+        """完成写入并原子地重命名为最终文件名"""
+        if not self._validated:
+            # 图片小于文件头长度时，在结束时再校验一次
+            self._validate_head()
+        start = time.perf_counter()
+        self._file.close()
+        os.replace(self.temp_path, final_path)
+        self.commit_seconds += time.perf_counter() - start
+        self._committed = True
+        return final_path
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class ResumableImageWriter(ImageStreamWriter):
+    """支持断点续传的流式写入
+
+    未完成的数据保存在 <part_path>，旁边的 <part_path>.json 日志记录 URL、ETag /
+    Last-Modified 与已接收字节数。再次下载同一 URL 时用 Range + If-Range 请求剩余部分，
+    服务器不支持范围请求（返回 200）或文件已变化时自动回退为完整下载。
+
+    用法:
+        with ResumableImageWriter(part_path_for(save_dir, url), url) as writer:
+            content_type = writer.fetch(session, url, headers, timeout)
+            writer.commit(final_path)
+
+    因网络错误中断时保留 .part 文件与日志；文件头无效或没有校验标识（ETag / Last-Modified）时删除。
+    """
+
+    def __init__(self, part_path, url, content_type='', inline_hash=True):
+        # 不调用父类构造函数：临时文件是固定的 .part 路径而不是随机文件
+        os.makedirs(os.path.dirname(part_path) or '.', exist_ok=True)
+        self.temp_path = part_path
+        self.journal_path = part_path + '.json'
+        self.url = url
+        self.content_type = content_type or ''
+        self._file = None
+        self._md5 = hashlib.md5() if inline_hash else None
+        self.digest = None
+        self.dimensions = None  # CPU 阶段解析出的 (宽, 高)
+        self._head = b''
+        self._validated = False
+        self._committed = False
+        self.bytes_written = 0
+        self._reset_timings()
+        self.etag = None
+        self.last_modified = None
+        self.resume_from = self._load_journal()
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._committed:
+            if exc_type is not None and not issubclass(exc_type, InvalidImageError) and self._can_resume():
+                self.keep()
+            else:
+                self.abort()
+        return False
+
+    def _load_journal(self):
+        """读取续传日志，返回可续传的起始字节（不可续传时清理残留文件并返回 0）"""
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+            size = os.path.getsize(self.temp_path)
+        except (OSError, ValueError):
+            self._remove_partial()
+            return 0
+
+        if journal.get('url') != self.url or not (journal.get('etag') or journal.get('last_modified')):
+            self._remove_partial()
+            return 0
+        self.etag = journal.get('etag')
+        self.last_modified = journal.get('last_modified')
+        # .part 按顺序追加写入，磁盘上的内容总是响应体的前缀
+        return size
+
+    def _write_journal(self):
+        journal = {
+            'url': self.url,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'bytes_received': self.bytes_written,
+        }
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            json.dump(journal, f)
+
+    def _can_resume(self):
+        return self.bytes_written > 0 and bool(self.etag or self.last_modified)
+
+    def _remove_partial(self):
+        for path in (self.temp_path, self.journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def request_headers(self):
+        """续传所需的请求头（无可续传数据时为空）"""
+        if not self.resume_from:
+            return {}
+        return {
+            'Range': f'bytes={self.resume_from}-',
+            'If-Range': self.etag or self.last_modified,
+        }
+
+    def begin(self, status_code, headers, content_type=''):
+        """根据响应决定续传还是重新下载，返回是否为续传"""
+        self.content_type = content_type or self.content_type
+        content_range = headers.get('Content-Range', '')
+        resumed = (status_code == 206 and self.resume_from > 0
+                   and content_range.startswith(f'bytes {self.resume_from}-'))
+
+        if resumed:
+            # 用已下载部分恢复 MD5 与文件头（计入哈希耗时）；不在下载线程计算 MD5 时只读文件头
+            start = time.perf_counter()
+            with open(self.temp_path, 'rb') as f:
+                if self._md5 is None:
+                    self._head = f.read(MAGIC_BYTES_LENGTH)
+                else:
+                    for chunk in iter(lambda: f.read(DEFAULT_CHUNK_SIZE), b''):
+                        self._md5.update(chunk)
+                        if len(self._head) < MAGIC_BYTES_LENGTH:
+                            self._head += chunk[:MAGIC_BYTES_LENGTH - len(self._head)]
+            self.hash_seconds += time.perf_counter() - start
+            if len(self._head) >= MAGIC_BYTES_LENGTH:
+                self._validate_head()
+            self._file = open(self.temp_path, 'ab')
+            self.bytes_written = self.resume_from
+        else:
+            self.etag = headers.get('ETag')
+            self.last_modified = headers.get('Last-Modified')
+            self._file = open(self.temp_path, 'wb')
+            self.resume_from = 0
+
+        if self.etag or self.last_modified:
+            self._write_journal()
+        return resumed
+
+    def fetch(self, session, url, headers=None, timeout=None):
+        """发起（续传）请求并把响应体全部写入 .part，返回 Content-Type"""
+        request_headers = dict(headers or {})
+        request_headers.update(self.request_headers())
+        response = session.get(url, headers=request_headers, stream=True, timeout=timeout)
+        if response.status_code == 416:
+            # 请求范围无效（文件已变化或已完整）：丢弃 .part 重新下载
+            response.close()
+            self._remove_partial()
+            self.resume_from = 0
+            response = session.get(url, headers=headers, stream=True, timeout=timeout)
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', '').lower()
+            if 'image' not in content_type:
+                raise InvalidImageError(f"非图片内容类型: {content_type}")
+            self.begin(response.status_code, response.headers, content_type)
+            for chunk in response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE):
+                self.write(chunk)
+        return content_type
+
+    def keep(self):
+        """保留 .part 与日志，供下次续传"""
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        self._write_journal()
+
+    def commit(self, final_path):
+        """完成写入并原子地重命名为最终文件名，同时删除续传日志"""
+        super().commit(final_path)
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        return final_path
+
+    def abort(self):
+        """放弃写入并删除 .part 与日志"""
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        self._remove_partial()
@@ -1,78 +1,127 @@
-import requests
-import hashlib
-import os
-from bs4 import BeautifulSoup
 import re
-import sqlite3
+from src.membership import get_hash_index
 
 def get_existing_hashes(save_dir, db_path=None):
-    """从数据库获取现有图片的哈希"""
+    """获取数据库中现有图片哈希的成员索引（进程内共享，支持 in / len）"""
     if db_path is None:
         db_path = 'images.db'  # 默认数据库
-    existing_hashes = set()
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT hash FROM images")
-        rows = cursor.fetchall()
-        for row in rows:
-            existing_hashes.add(row[0])
-        conn.close()
-    except sqlite3.Error as e:
-        print(f"数据库错误: {e}")
-    return existing_hashes
+    return get_hash_index(db_path)
 
 def existed_picture(db_path=None):
-    """从数据库获取现有图片的哈希"""
+    """获取 stable=1 的图片哈希的成员索引（进程内共享，支持 in / len）"""
     if db_path is None:
         db_path = 'images.db'  # 默认数据库
-    existing_hashes = set()
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT hash FROM images where stable=1")
-        rows = cursor.fetchall()
-        for row in rows:
-            existing_hashes.add(row[0])
-    except sqlite3.Error as e:
-        print(f"数据库错误: {e}")        
-    return existing_hashes
-def extract_image_url(post_data):
-    """从Reddit API数据中提取图片URL"""
-    try:
-        # 尝试获取图集数据
-        if 'gallery_data' in post_data[0]['data']['children'][0]['data']:
-            gallery = post_data[0]['data']['children'][0]['data']['gallery_data']
-            media_id = gallery['items'][0]['media_id']
-            return f"https://i.redd.it/{media_id}.jpg"
+    return get_hash_index(db_path, stable_only=True)
 
-        # 尝试直接图片链接
-        if 'url' in post_data[0]['data']['children'][0]['data']:
-            url = post_data[0]['data']['children'][0]['data']['url']
 
-            # 过滤有效图片链接
-            if re.match(r'https?://(i\.redd\.it|i\.imgur\.com)/.+\.(jpg|jpeg|png|webp)', url):
-                return url
+DIRECT_IMAGE_PATTERN = re.compile(r'https?://(i\.redd\.it|i\.imgur\.com)/.+\.(jpg|jpeg|png|webp)', re.IGNORECASE)
+# 链接到图集的帖子（reddit.com/gallery/<id>）
+GALLERY_LINK_PATTERN = re.compile(r'reddit\.com/gallery/(\w+)', re.IGNORECASE)
 
-            # 处理Imgur相册链接
-            if 'imgur.com/a/' in url:
-                return get_imgur_album(url)
+# media_metadata 中的 MIME 类型 -> 文件扩展名
+GALLERY_MIME_EXTENSIONS = {
+    'image/jpg': 'jpg',
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
 
-    except (KeyError, IndexError):
-        pass
 
+def _media_dimensions(media):
+    """media_metadata 条目中原图（'s'）的宽高，缺失时返回 None"""
+    source = media.get('s') or {}
+    if source.get('x') and source.get('y'):
+        return int(source['x']), int(source['y'])
     return None
 
-def get_imgur_album(album_url):
-    """获取Imgur相册中的第一张图片"""
+
+def _gallery_images(post):
+    """从帖子的 gallery_data + media_metadata 中按顺序取出所有图集图片的 (URL, 宽高)
+
+    扩展名按 media_metadata 的 MIME 类型（'m'）确定，宽高取原图尺寸（'s' 的 x / y）；
+    处理失败（status 不为 valid）的图片被跳过。
+    """
+    items = (post.get('gallery_data') or {}).get('items') or []
+    metadata = post.get('media_metadata') or {}
+    images = []
+    for item in items:
+        media_id = item.get('media_id')
+        if not media_id:
+            continue
+        media = metadata.get(media_id) or {}
+        if media and media.get('status', 'valid') != 'valid':
+            continue
+        extension = GALLERY_MIME_EXTENSIONS.get(media.get('m', ''), 'jpg')
+        images.append((f"https://i.redd.it/{media_id}.{extension}", _media_dimensions(media)))
+    return images
+
+
+def _preview_dimensions(post):
+    """单图帖子 preview 中原图的宽高，缺失时返回 None"""
     try:
-        response = requests.get(album_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        image = soup.select_one('meta[property="og:image"]')
-        return image['content'] if image else None
-    except:
+        source = post['preview']['images'][0]['source']
+        return int(source['width']), int(source['height'])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def extract_listing_images(post):
+    """直接从列表接口的帖子数据（children[i]['data']）中提取图片的 (URL, 宽高) 列表
+
+    宽高来自 media_metadata / preview，未知时为 None。图集返回全部图片，非图片帖子返回空列表；
+    返回 None 表示列表数据不足以判断（如图集数据缺失、Imgur 相册），需要单独请求帖子。
+    """
+    # 转帖：图片信息在原帖中
+    if not post.get('gallery_data') and post.get('crosspost_parent_list'):
+        post = post['crosspost_parent_list'][0]
+
+    if post.get('gallery_data'):
+        return _gallery_images(post)
+    if post.get('is_gallery'):
         return None
 
+    url = post.get('url_overridden_by_dest') or post.get('url')
+    if not url:
+        return None
+    if DIRECT_IMAGE_PATTERN.match(url):
+        return [(url, _preview_dimensions(post))]
+    if 'imgur.com/a/' in url or '/gallery/' in url:
+        return None
+    return []
+
+
+def info_fullname(post):
+    """列表数据不足时，批量接口 /api/info.json 需要查询的帖子全名（t3_xxx）
+
+    链接到图集的帖子查询被链接的图集帖子，转帖查询原帖，其余查询帖子本身。
+    """
+    match = GALLERY_LINK_PATTERN.search(post.get('url_overridden_by_dest') or post.get('url') or '')
+    if match:
+        return f"t3_{match.group(1)}"
+    if post.get('crosspost_parent'):
+        return post['crosspost_parent']
+    return post.get('name') or (f"t3_{post['id']}" if post.get('id') else None)
+
+
+def extract_info_images(info_data):
+    """解析 /api/info.json 的响应，返回 {帖子全名: [(URL, 宽高), ...]}
+
+    仍无法从帖子数据中解析出图片的帖子对应空列表。
+    """
+    try:
+        children = info_data['data']['children']
+    except (KeyError, TypeError):
+        return {}
+    results = {}
+    for child in children:
+        post = child.get('data') or {}
+        name = post.get('name') or (f"t3_{post['id']}" if post.get('id') else None)
+        if name:
+            results[name] = extract_listing_images(post) or []
+    return results
+
+
 def is_valid_image(data, content_type=''):
     """增强版图片验证函数"""
     if not data:
@@ -86,7 +135,7 @@ def is_valid_image(data, content_type=''):
     elif 'image/gif' in content_type:
         return data.startswith(b'GIF87a') or data.startswith(b'GIF89a')
     elif 'image/webp' in content_type:
-        return data.startswith(b'RIFF') and len(data) > 12 and data[8:12] == b'WEBP'
+        return data.startswith(b'RIFF') and len(data) >= 12 and data[8:12] == b'WEBP'
 
     # 通用文件头验证
     if data.startswith(b'\xff\xd8\xff'):  # JPEG
@@ -95,7 +144,7 @@ def is_valid_image(data, content_type=''):
         return True
     if data.startswith(b'GIF87a') or data.startswith(b'GIF89a'):  # GIF
         return True
-    if len(data) > 12 and data.startswith(b'RIFF') and data[8:12] == b'WEBP':  # WebP
+    if len(data) >= 12 and data.startswith(b'RIFF') and data[8:12] == b'WEBP':  # WebP
         return True
 
     return False
\ No newline at end of file
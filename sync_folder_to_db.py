@@ -4,21 +4,23 @@
 """
 
 import os
-import sqlite3
-import hashlib
+import sys
 import logging
-from datetime import datetime
 from config import WALLHAVEN_CONFIG
-
-def setup_logging():
-    """设置日志"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-
-def sync_folder_to_db():
-    """同步文件夹中的 Wallhaven 图片到数据库"""
+from src.db_pool import get_pool
+from src.db_writer import BatchedDBWriter
+from src.file_index import FileIndex, is_partial_file
+from src.hashing import hash_files
+from src.log_setup import setup_logging
+
+def sync_folder_to_db(workers=None, rehash=False):
+    """同步文件夹中的 Wallhaven 图片到数据库
+
+    - 文件索引中 size 与 mtime 未变化的文件直接复用缓存的哈希，不再读取文件
+    - 其余文件按块读取，在多个进程中并行计算哈希
+    - 已有哈希一次性预加载到集合中，新记录批量写入
+    rehash=True 时忽略哈希缓存，重新计算所有文件。
+    """
     setup_logging()
     logger = logging.getLogger('Sync_Folder_To_Db')
 
@@ -33,80 +35,105 @@ def sync_folder_to_db():
         logger.error(f"数据库文件不存在: {db_path}")
         return
 
-    # 连接数据库
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    pool = get_pool(db_path)
+    file_index = FileIndex(pool, save_dir, logger=logger)
 
     synced_count = 0
     skipped_count = 0
     error_count = 0
     total_files = 0
+    cached_count = 0
 
     # 扫描文件夹
     logger.info(f"🔍 开始扫描文件夹: {save_dir}")
-    for filename in os.listdir(save_dir):
-        total_files += 1
-        if not filename.startswith('wallhaven_'):
-            continue
-
-        filepath = os.path.join(save_dir, filename)
-        if not os.path.isfile(filepath):
-            continue
-
-        # 计算哈希
-        try:
-            with open(filepath, 'rb') as f:
-                data = f.read()
-            image_hash = hashlib.md5(data).hexdigest()
-        except Exception as e:
-            logger.error(f"计算哈希失败 {filename}: {e}")
-            error_count += 1
-            continue
-
-        # 检查数据库中是否已有此哈希
-        cursor.execute("SELECT id FROM images WHERE hash = ?", (image_hash,))
-        if cursor.fetchone():
-            logger.debug(f"图片已存在于数据库: {filename}")
-            skipped_count += 1
-            continue
-
-        # 提取 wallhaven_id
-        try:
-            id_part = filename.split('_')[1].split('.')[0]
-        except IndexError:
-            logger.warning(f"无法提取 ID: {filename}")
+    candidates = {}
+    with os.scandir(save_dir) as it:
+        for entry in it:
+            total_files += 1
+            filename = entry.name
+            # 跳过下载中的临时文件与续传文件（与文件索引相同的规则）
+            if is_partial_file(filename) or not filename.startswith('wallhaven_'):
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            st = entry.stat(follow_symlinks=False)
+            candidates[filename] = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    # 复用哈希缓存，只对新增或变化的文件计算哈希
+    hash_cache = {} if rehash else file_index.load_hashes()
+    hashes = {}
+    to_hash = []
+    for filename, (size, mtime_ns, inode) in candidates.items():
+        cached = hash_cache.get(filename)
+        if cached and cached[0] == size and cached[1] == mtime_ns:
+            hashes[filename] = cached[2]
+            cached_count += 1
+        else:
+            to_hash.append(filename)
+
+    if to_hash:
+        logger.info(f"🧮 计算 {len(to_hash)} 个文件的哈希（{cached_count} 个使用缓存）...")
+    index_rows = []
+    for filepath, image_hash, error in hash_files((os.path.join(save_dir, name) for name in to_hash), workers):
+        filename = os.path.basename(filepath)
+        if error:
+            logger.error(f"计算哈希失败 {filename}: {error}")
             error_count += 1
             continue
-
-        # 构造 URL
-        wallhaven_url = f'https://wallhaven.cc/w/{id_part}'
-        source_url = wallhaven_url
-
-        # 插入数据库
-        try:
-            cursor.execute(
-                "INSERT INTO images (wallhaven_id, name, hash, url, source_url, resolution, stable) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (id_part, filename, image_hash, wallhaven_url, source_url, 'unknown', 1)
-            )
-            synced_count += 1
-            logger.info(f"✅ 添加图片到数据库: {filename}")
-        except sqlite3.IntegrityError as e:
-            logger.warning(f"插入失败 (可能重复): {filename} - {e}")
-            skipped_count += 1
-        except Exception as e:
-            logger.error(f"插入数据库失败: {filename} - {e}")
-            error_count += 1
-
-    # 提交更改
-    conn.commit()
-    conn.close()
+        hashes[filename] = image_hash
+        index_rows.append((filename,) + candidates[filename] + (image_hash,))
+
+    with pool.connection() as conn:
+        FileIndex.upsert(conn, index_rows)
+        known_hashes = {row[0] for row in conn.execute("SELECT hash FROM images")}
+
+    def report_conflict(record, error):
+        nonlocal skipped_count
+        logger.warning(f"插入失败 (可能重复): {record[1]} - {error}")
+        skipped_count += 1
+
+    insert_sql = ("INSERT INTO images (wallhaven_id, name, hash, url, source_url, resolution, stable) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    with BatchedDBWriter(pool, insert_sql, batch_size=500, on_conflict=report_conflict,
+                         on_inserted=lambda record: logger.info(f"✅ 添加图片到数据库: {record[1]}"),
+                         logger=logger) as writer:
+        for filename, image_hash in hashes.items():
+            # 检查数据库中是否已有此哈希
+            if image_hash in known_hashes:
+                logger.debug(f"图片已存在于数据库: {filename}")
+                skipped_count += 1
+                continue
+
+            # 提取 wallhaven_id
+            try:
+                id_part = filename.split('_')[1].split('.')[0]
+            except IndexError:
+                logger.warning(f"无法提取 ID: {filename}")
+                error_count += 1
+                continue
+
+            # 构造 URL
+            wallhaven_url = f'https://wallhaven.cc/w/{id_part}'
+            source_url = wallhaven_url
+
+            known_hashes.add(image_hash)
+            writer.submit((id_part, filename, image_hash, wallhaven_url, source_url, 'unknown', 1))
+
+    synced_count = writer.inserted_count
+    error_count += writer.error_count
 
     logger.info("📊 同步统计:")
     logger.info(f"🔍 扫描文件总数: {total_files}")
+    logger.info(f"🧮 使用哈希缓存: {cached_count}")
     logger.info(f"✅ 新增图片: {synced_count}")
     logger.info(f"⏭️  跳过已存在: {skipped_count}")
     logger.info(f"❌ 处理错误: {error_count}")
     logger.info("🎉 同步完成")
 
 if __name__ == "__main__":
-    sync_folder_to_db()
+    # --rehash: 忽略哈希缓存重新计算；--workers N: 哈希进程数（默认 CPU 核数）
+    args = sys.argv[1:]
+    workers = None
+    if '--workers' in args:
+        workers = int(args[args.index('--workers') + 1])
+    sync_folder_to_db(workers=workers, rehash='--rehash' in args)
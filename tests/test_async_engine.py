@@ -0,0 +1,62 @@
+"""
+异步下载引擎测试（离线运行，请求发往本地模拟服务器）
+"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import MockServer
+from src.async_engine import WRITE_BUFFER_SIZE, AsyncDownloadEngine, DownloadJob
+from src.stream_writer import ImageStreamWriter
+
+
+def test_queued_jobs_do_not_time_out():
+    """任务数远多于单主机并发数时，排队等待的任务不计入下载超时"""
+    with MockServer(image_size=16 * 1024, latency=0.3) as server, tempfile.TemporaryDirectory() as save_dir:
+        def finalize(writer, content_type):
+            writer.commit(os.path.join(save_dir, os.path.basename(writer.temp_path) + '.jpg'))
+            return True
+
+        jobs = [DownloadJob(f"{server.base_url}/engine/img/reddit-{i}.jpg", save_dir, finalize) for i in range(12)]
+        # 12 个任务 / 每批 2 个，每批约 0.3 秒：总耗时约 1.8 秒，远超 1 秒的单任务超时
+        engine = AsyncDownloadEngine(download_timeout=1, max_concurrency=10, per_host_limit=2)
+        assert engine.run(jobs) == [True] * 12
+        assert len([name for name in os.listdir(save_dir) if name.endswith('.jpg')]) == 12
+
+
+def test_writes_run_off_the_event_loop():
+    """响应体按 WRITE_BUFFER_SIZE 分块在线程池中写盘，事件循环线程不执行文件写入与哈希"""
+    writes = []
+    original_write = ImageStreamWriter.write
+
+    def recording_write(self, chunk):
+        writes.append((threading.current_thread() is threading.main_thread(), len(chunk)))
+        return original_write(self, chunk)
+
+    image_size = 3 * WRITE_BUFFER_SIZE + 1000
+    with MockServer(image_size=image_size) as server, tempfile.TemporaryDirectory() as save_dir:
+        def finalize(writer, content_type):
+            writer.commit(os.path.join(save_dir, 'a.jpg'))
+            return True
+
+        ImageStreamWriter.write = recording_write
+        try:
+            engine = AsyncDownloadEngine(download_timeout=5)
+            assert engine.run([DownloadJob(f"{server.base_url}/write/img/reddit-a.jpg", save_dir, finalize)]) == [True]
+        finally:
+            ImageStreamWriter.write = original_write
+        with open(os.path.join(save_dir, 'a.jpg'), 'rb') as f:
+            assert f.read() == server.image_body('reddit-a')
+
+    assert writes and not any(on_loop for on_loop, _ in writes)
+    assert sum(size for _, size in writes) == image_size
+    assert all(size >= WRITE_BUFFER_SIZE for _, size in writes[:-1])
+
+
+if __name__ == "__main__":
+    test_queued_jobs_do_not_time_out()
+    test_writes_run_off_the_event_loop()
+    print("✅ 异步下载引擎测试全部通过")
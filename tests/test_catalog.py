@@ -0,0 +1,184 @@
+"""
+统一图片目录测试（离线运行，使用临时数据库）
+"""
+
+import sys
+import os
+import contextlib
+import io
+import logging
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from config import CATALOG_CONFIG, REDDIT_CONFIG, WALLHAVEN_CONFIG
+from src.catalog import Catalog
+from src.db_pool import get_pool
+from src.WallhavenImageDownloader import WallhavenImageDownloader
+
+REDDIT_SQL = '''
+    CREATE TABLE images (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        hash TEXT NOT NULL UNIQUE,
+        url TEXT NOT NULL UNIQUE,
+        stable INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        resolution TEXT DEFAULT 'unknown'
+    )
+'''
+
+WALLHAVEN_SQL = '''
+    CREATE TABLE images (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        wallhaven_id TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        hash TEXT NOT NULL UNIQUE,
+        url TEXT NOT NULL UNIQUE,
+        source_url TEXT,
+        resolution TEXT,
+        stable INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def _source_db(tmp, name, schema, rows):
+    db_path = os.path.join(tmp, name)
+    conn = sqlite3.connect(db_path)
+    conn.execute(schema)
+    if schema is WALLHAVEN_SQL:
+        conn.executemany("INSERT INTO images (wallhaven_id, name, hash, url, source_url, resolution, stable) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    else:
+        conn.executemany("INSERT INTO images (name, hash, url, stable) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _reddit_rows(count):
+    return [(f"r{i}.jpg", f"rh{i}", f"https://i.redd.it/r{i}.jpg", 1) for i in range(count)]
+
+
+def _wallhaven_rows(count):
+    return [(f"w{i}", f"wallhaven_w{i}.jpg", f"wh{i}", f"https://w.wallhaven.cc/full/w{i}.jpg",
+             f"https://wallhaven.cc/w/w{i}", '1920x1080', 1) for i in range(count)]
+
+
+def test_import_source_and_find():
+    """首次导入全部新增，再次导入只同步状态；导入后可按哈希或 URL 查到来源"""
+    with tempfile.TemporaryDirectory() as tmp:
+        reddit_db = _source_db(tmp, 'reddit.db', REDDIT_SQL, _reddit_rows(3))
+        wallhaven_db = _source_db(tmp, 'wallhaven.db', WALLHAVEN_SQL, _wallhaven_rows(2))
+        catalog = Catalog(os.path.join(tmp, 'catalog.db'))
+        try:
+            assert catalog.import_source('reddit', reddit_db) == (3, 0)
+            assert catalog.import_source('wallhaven', wallhaven_db) == (2, 0)
+
+            conn = sqlite3.connect(reddit_db)
+            conn.execute("UPDATE images SET stable = 0 WHERE name = 'r1.jpg'")
+            conn.execute("INSERT INTO images (name, hash, url) VALUES ('r3.jpg', 'rh3', 'https://i.redd.it/r3.jpg')")
+            conn.commit()
+            conn.close()
+            assert catalog.import_source('reddit', reddit_db) == (1, 3)
+            assert catalog.counts() == {'reddit': (4, 3), 'wallhaven': (2, 2)}
+
+            assert catalog.find(hash_value='wh1') == 'wallhaven'
+            assert catalog.find(url='https://i.redd.it/r3.jpg') == 'reddit'
+            assert catalog.find(hash_value='none', url='https://example.com/none.jpg') is None
+            with catalog.pool.connection() as conn:
+                assert conn.execute("SELECT source_id FROM images WHERE hash = 'wh0'").fetchone()[0] == 'w0'
+
+            assert catalog.import_source('reddit', os.path.join(tmp, 'missing.db')) == (0, 0)
+        finally:
+            catalog.pool.close()
+
+
+def test_find_prefers_own_source_and_aliases():
+    """同一哈希在多个来源中存在时优先返回查询方自己的来源；被跳过的 URL 通过别名查到所属来源"""
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = Catalog(os.path.join(tmp, 'catalog.db'))
+        try:
+            catalog.add(('wallhaven', 'w0', 'wallhaven_w0.jpg', 'same', 'https://w.wallhaven.cc/w0.jpg', None, None))
+            catalog.add(('reddit', None, 'r0.jpg', 'same', 'https://i.redd.it/r0.jpg', None, None))
+            assert catalog.find(hash_value='same', source='reddit') == 'reddit'
+            assert catalog.find(hash_value='same', source='wallhaven') == 'wallhaven'
+            # 哈希未命中时按 URL 查找
+            assert catalog.find(hash_value='other', url='https://i.redd.it/r0.jpg', source='wallhaven') == 'reddit'
+
+            assert catalog.find(url='https://i.redd.it/r1.jpg') is None
+            catalog.add_alias('reddit', 'https://i.redd.it/r1.jpg', 'wallhaven', 'same')
+            assert catalog.find(url='https://i.redd.it/r1.jpg', source='reddit') == 'wallhaven'
+        finally:
+            catalog.pool.close()
+
+
+class _Writer:
+    def __init__(self, hexdigest):
+        self.hexdigest = hexdigest
+        self.committed = False
+
+    def commit(self, path):
+        self.committed = True
+
+
+def test_cross_source_skip_recorded():
+    """下载后发现其他来源已有相同图片：不保存并记录别名，下次运行在下载前跳过"""
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = Catalog(os.path.join(tmp, 'catalog.db'))
+        downloader = WallhavenImageDownloader.__new__(WallhavenImageDownloader)
+        downloader.catalog = catalog
+        downloader.save_dir = tmp
+        downloader.logger = logging.getLogger('test_catalog')
+        try:
+            catalog.add(('reddit', None, 'r0.jpg', 'same', 'https://i.redd.it/r0.jpg', None, None))
+            url = 'https://w.wallhaven.cc/full/ab/wallhaven-ab12cd.jpg'
+            assert downloader.precheck_catalog(url)
+
+            writer = _Writer('same')
+            assert downloader._finalize_download(writer, 'image/jpeg', url, 'ab12cd', {}) is False
+            assert not writer.committed
+            assert not downloader.precheck_catalog(url)
+            assert downloader.owned_elsewhere(url=url) == 'reddit'
+        finally:
+            catalog.pool.close()
+
+
+def test_catalog_migrate_command():
+    """catalog-migrate 依次导入 Reddit 与 Wallhaven 数据库并输出各来源的导入条数"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {
+            'catalog': os.path.join(tmp, 'catalog.db'),
+            'reddit': _source_db(tmp, 'reddit.db', REDDIT_SQL, _reddit_rows(3)),
+            'wallhaven': _source_db(tmp, 'wallhaven.db', WALLHAVEN_SQL, _wallhaven_rows(2)),
+        }
+        configs = {'catalog': CATALOG_CONFIG, 'reddit': REDDIT_CONFIG, 'wallhaven': WALLHAVEN_CONFIG}
+        originals = {name: config['db_path'] for name, config in configs.items()}
+        outputs = []
+        try:
+            for name, config in configs.items():
+                config['db_path'] = paths[name]
+            for _ in range(2):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    main.cmd_catalog_migrate([], False)
+                outputs.append(output.getvalue())
+        finally:
+            for name, config in configs.items():
+                config['db_path'] = originals[name]
+            get_pool(paths['catalog']).close()
+
+        assert 'reddit: 新增 3 条，同步 0 条' in outputs[0]
+        assert 'wallhaven: 新增 2 条，同步 0 条' in outputs[0]
+        assert 'reddit: 新增 0 条，同步 3 条' in outputs[1]
+        assert '📊 wallhaven: 共 2 条，stable 2 条' in outputs[1]
+
+
+if __name__ == "__main__":
+    test_import_source_and_find()
+    test_find_prefers_own_source_and_aliases()
+    test_cross_source_skip_recorded()
+    test_catalog_migrate_command()
+    print("✅ 统一图片目录测试全部通过")
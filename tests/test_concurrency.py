@@ -0,0 +1,139 @@
+"""
+自适应并发控制器测试（离线运行，不访问网络）
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from src.concurrency import ConcurrencyController, HostWindow
+
+
+def run_window(window, now, latency=0.1):
+    """模拟一个用满并发的观察窗口，返回窗口结束时间"""
+    window.saturated = True
+    result = None
+    for _ in range(window.current):
+        now += 0.01
+        result = window.on_complete(latency, now)
+    return now, result
+
+
+def test_additive_increase_up_to_cap():
+    """窗口用满、延迟稳定时逐步增加，且不超过主机上限"""
+    window = HostWindow('i.redd.it', initial=2, minimum=1, cap=6)
+    now = 0.0
+    for _ in range(10):
+        now, _ = run_window(window, now)
+    assert window.current == 6
+
+
+def test_no_increase_when_not_saturated():
+    """并发名额没有用满（任务供给不足）时不增加"""
+    window = HostWindow('i.redd.it', initial=2, minimum=1, cap=6)
+    now = 0.0
+    for _ in range(5):
+        now += 0.01
+        window.on_complete(0.1, now)
+    assert window.current == 2
+
+
+def test_multiplicative_decrease_with_cooldown():
+    """拥塞信号减半，冷却期内的重复信号不再减少"""
+    window = HostWindow('wallhaven.cc', initial=8, minimum=1, cap=16)
+    assert window.on_congestion(100.0) == 4
+    assert window.on_congestion(100.1) is None
+    assert window.current == 4
+    assert window.on_congestion(102.0) == 2
+
+
+def test_latency_inflation_backs_off():
+    """平均延迟明显高于历史最低值时减少并发"""
+    window = HostWindow('i.redd.it', initial=4, minimum=1, cap=16)
+    now, _ = run_window(window, 0.0, latency=0.1)
+    for _ in range(5):
+        now, _ = run_window(window, now, latency=1.0)
+    assert window.current < 4
+
+
+def test_controller_limits_in_flight_per_host():
+    """同一主机的同时任务数不超过并发上限，拥塞信号只影响对应主机"""
+    controller = ConcurrencyController({'initial': 2, 'host_limits': {'a.example': 4}})
+    peak = 0
+    running = 0
+    lock = threading.Lock()
+
+    def task():
+        nonlocal peak, running
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return False  # 不计入吞吐量，保持并发上限不变
+
+    threads = []
+    for _ in range(8):
+        slot = controller.acquire('https://a.example/x.jpg')
+        thread = threading.Thread(target=slot.run, args=(task,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+
+    controller.acquire('https://b.example/y.jpg').release()
+    controller.record_exception('https://a.example/x.jpg', requests.exceptions.ReadTimeout())
+    controller.record_exception('https://b.example/y.jpg', ValueError())
+    assert controller.limits() == {'a.example': 1, 'b.example': 2}
+
+
+def test_global_budget_is_shared_fairly():
+    """总并发数用满时，已超出份额的下载源要让其他正在等待的下载源先获得名额"""
+    controller = ConcurrencyController({'adaptive': False, 'default_host_limit': 16})
+    controller.set_budget(4, ['a', 'b'])
+    # b 没有任务时 a 可以借用全部空闲名额
+    a_slots = [controller.acquire('https://a.example/x.jpg', source='a') for _ in range(4)]
+    acquired = []
+
+    def acquire(source, host):
+        acquired.append((source, controller.acquire(f'https://{host}/x.jpg', source=source)))
+
+    waiting_b = threading.Thread(target=acquire, args=('b', 'b.example'))
+    waiting_b.start()
+    while not controller._source_waiting.get('b'):
+        time.sleep(0.005)
+    waiting_a = threading.Thread(target=acquire, args=('a', 'a.example'))
+    waiting_a.start()
+    time.sleep(0.05)
+    assert acquired == []
+
+    a_slots.pop().release()
+    waiting_b.join(1)
+    assert [source for source, _ in acquired] == ['b']
+    assert waiting_a.is_alive()
+
+    # a 回到份额（2）以内且没有其他下载源等待时继续获得名额
+    a_slots.pop().release()
+    waiting_a.join(1)
+    assert [source for source, _ in acquired] == ['b', 'a']
+    assert controller.source_in_flight() == {'a': 3, 'b': 1}
+
+    controller.set_budget(None)
+    for slot in a_slots + [slot for _, slot in acquired]:
+        slot.release()
+    assert controller.source_in_flight() == {'a': 0, 'b': 0}
+
+
+if __name__ == "__main__":
+    test_additive_increase_up_to_cap()
+    test_no_increase_when_not_saturated()
+    test_multiplicative_decrease_with_cooldown()
+    test_latency_inflation_backs_off()
+    test_controller_limits_in_flight_per_host()
+    test_global_budget_is_shared_fairly()
+    print("✅ 自适应并发测试全部通过")
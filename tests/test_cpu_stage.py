@@ -0,0 +1,110 @@
+"""
+CPU 阶段测试（离线运行）
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.cpu_stage import CPUStage, check_image
+from src.stream_writer import ImageStreamWriter, InvalidImageError
+
+# 填充数据不含 0xFF，截断后的文件尾不会偶然出现 JPEG 结束标记
+FILLER = bytes(range(255)) * 1300
+JPEG = b'\xff\xd8\xff\xe0' + FILLER + b'\xff\xd9'
+PNG = b'\x89PNG\r\n\x1a\n' + FILLER[:4096] + b'\x00\x00\x00\x00IEND\xaeB`\x82'
+WEBP = b'RIFF' + (4 + 1000).to_bytes(4, 'little') + b'WEBP' + FILLER[:1000]
+
+
+def _write(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_check_image_detects_truncation():
+    """开启 check_truncation 时完整的 JPEG / PNG / WebP 通过校验，截断的文件被识别"""
+    with tempfile.TemporaryDirectory() as directory:
+        for name, data in (('a.jpg', JPEG), ('a.png', PNG), ('a.webp', WEBP)):
+            result = check_image(_write(directory, name, data), check_truncation=True)
+            assert result.valid and result.complete, name
+            assert result.md5 == hashlib.md5(data).hexdigest()
+            assert result.size == len(data)
+
+            truncated = check_image(_write(directory, 'cut_' + name, data[:len(data) // 2]), check_truncation=True)
+            assert truncated.valid and not truncated.complete, name
+
+        assert not check_image(_write(directory, 'a.txt', b'<html>not an image</html>')).valid
+        assert check_image(os.path.join(directory, 'missing.jpg')).error
+
+
+def test_trailing_data_accepted_by_default():
+    """结束标记之后附加了数据的有效图片默认不被拒绝（与下载线程中的文件头校验一致）"""
+    with tempfile.TemporaryDirectory() as directory:
+        for name, data in (('a.jpg', JPEG), ('a.png', PNG)):
+            path = _write(directory, name, data + FILLER[:4096])
+            for compute_hash in (True, False):
+                result = check_image(path, compute_hash=compute_hash)
+                assert result.valid and result.complete, name
+            assert not check_image(path, check_truncation=True).complete, name
+
+
+def test_check_image_without_hash():
+    """compute_hash=False 时只读文件头尾：校验结果、大小与宽高不变，不返回 MD5"""
+    with tempfile.TemporaryDirectory() as directory:
+        for name, data in (('a.jpg', JPEG), ('a.png', PNG), ('a.webp', WEBP)):
+            path = _write(directory, name, data)
+            hashed = check_image(path, check_truncation=True)
+            unhashed = check_image(path, compute_hash=False, check_truncation=True)
+            assert unhashed.md5 is None and unhashed.hash_seconds == 0
+            assert unhashed[2:6] == hashed[2:6], name
+
+            cut = _write(directory, 'cut_' + name, data[:len(data) // 2])
+            assert (check_image(cut, compute_hash=False, check_truncation=True)[2:6]
+                    == check_image(cut, check_truncation=True)[2:6]), name
+
+
+def test_process_writer_in_pool():
+    """下载线程只写文件，MD5 由子进程按路径计算后写回 writer"""
+    stage = CPUStage(workers=2, check_truncation=True)
+    try:
+        with tempfile.TemporaryDirectory() as save_dir:
+            with ImageStreamWriter(save_dir, 'image/jpeg', inline_hash=False) as writer:
+                for offset in range(0, len(JPEG), 64 * 1024):
+                    writer.write(JPEG[offset:offset + 64 * 1024])
+                assert writer.hexdigest is None
+                stage.process(writer)
+                writer.commit(os.path.join(save_dir, 'a.jpg'))
+            assert writer.hexdigest == hashlib.md5(JPEG).hexdigest()
+            assert writer.hash_seconds > 0
+
+            writer = ImageStreamWriter(save_dir, 'image/jpeg', inline_hash=False)
+            writer.write(JPEG[:100 * 1024])
+            try:
+                stage.process(writer)
+                assert False, "截断的图片应被拒绝"
+            except InvalidImageError:
+                pass
+            finally:
+                writer.abort()
+            assert os.listdir(save_dir) == ['a.jpg']
+
+            # 数据库下载：文件名已确定，只做完整性校验
+            with ImageStreamWriter(save_dir, 'image/jpeg', inline_hash=False) as writer:
+                writer.write(JPEG)
+                stage.process(writer, compute_hash=False)
+                writer.commit(os.path.join(save_dir, 'b.jpg'))
+            assert writer.hexdigest is None
+    finally:
+        stage.shutdown()
+
+
+if __name__ == "__main__":
+    test_check_image_detects_truncation()
+    test_trailing_data_accepted_by_default()
+    test_check_image_without_hash()
+    test_process_writer_in_pool()
+    print("✅ CPU 阶段测试全部通过")
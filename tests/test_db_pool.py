@@ -0,0 +1,75 @@
+"""
+SQLite 连接池测试（离线运行）
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db_pool import SQLiteConnectionPool, get_pool
+
+
+def test_pool_bound():
+    """连接数不超过上限，池满时等待归还，超时报错"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = SQLiteConnectionPool(os.path.join(tmp, 'pool.db'), max_connections=2)
+        try:
+            first, second = pool.acquire(), pool.acquire()
+            assert first is not second
+            assert first.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            try:
+                pool.acquire(timeout=0.05)
+                assert False, "池满时应等待超时"
+            except sqlite3.OperationalError:
+                pass
+
+            # 其他线程归还后，等待中的 acquire 取得同一个连接
+            threading.Timer(0.1, pool.release, args=(first,)).start()
+            started = time.monotonic()
+            assert pool.acquire(timeout=5) is first
+            assert time.monotonic() - started >= 0.05
+            assert len(pool._connections) == 2
+        finally:
+            pool.close()
+
+
+def test_get_pool_shared_and_close():
+    """同一路径共享连接池；关闭后不能再取连接，get_pool 重新创建"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'shared.db')
+        pool = get_pool(db_path)
+        assert get_pool(db_path) is pool
+        assert get_pool(os.path.join(tmp, 'other.db')) is not pool
+
+        with pool.connection() as conn:
+            conn.execute('CREATE TABLE t (x INTEGER)')
+            conn.execute('INSERT INTO t VALUES (1)')
+        try:
+            with pool.connection() as conn:
+                conn.execute('INSERT INTO t VALUES (2)')
+                raise RuntimeError('回滚')
+        except RuntimeError:
+            pass
+        with pool.connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+
+        pool.close()
+        try:
+            pool.acquire()
+            assert False, "关闭后不能再取连接"
+        except sqlite3.ProgrammingError:
+            pass
+        reopened = get_pool(db_path)
+        assert reopened is not pool
+        reopened.close()
+        get_pool(os.path.join(tmp, 'other.db')).close()
+
+
+if __name__ == "__main__":
+    test_pool_bound()
+    test_get_pool_shared_and_close()
+    print("✅ SQLite 连接池测试全部通过")
@@ -0,0 +1,92 @@
+"""
+批量写库线程测试（离线运行）
+"""
+
+import sys
+import os
+import logging
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db_pool import SQLiteConnectionPool
+from src.db_writer import BatchedDBWriter
+
+INSERT_SQL = "INSERT INTO images (name, hash) VALUES (?, ?)"
+
+
+def _pool(tmp):
+    pool = SQLiteConnectionPool(os.path.join(tmp, 'writer.db'))
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE images (id INTEGER PRIMARY KEY, name TEXT, hash TEXT UNIQUE)')
+    return pool
+
+
+def _count(pool):
+    with pool.connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+
+def test_batching():
+    """攒够 batch_size 条提交一次，close() 写入剩余记录"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _pool(tmp)
+        try:
+            with BatchedDBWriter(pool, INSERT_SQL, batch_size=3, flush_interval=3600) as writer:
+                for i in range(7):
+                    writer.submit((f"{i}.jpg", f"h{i}"))
+            assert writer.flush_count == 3  # 3 + 3 + 关闭时的 1
+            assert writer.inserted_count == 7 and _count(pool) == 7
+        finally:
+            pool.close()
+
+
+def test_conflict_fallback():
+    """批内冲突时逐行重试：冲突行回调 on_conflict，after_flush / on_inserted 只收到实际写入的记录"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _pool(tmp)
+        conflicts, flushed, inserted = [], [], []
+        try:
+            writer = BatchedDBWriter(pool, INSERT_SQL, batch_size=4, flush_interval=3600,
+                                     on_conflict=lambda record, e: conflicts.append(record),
+                                     after_flush=lambda conn, records: flushed.extend(records),
+                                     on_inserted=inserted.append)
+            with writer:
+                for record in [('a.jpg', 'h1'), ('b.jpg', 'h2'), ('dup.jpg', 'h1'), ('c.jpg', 'h3')]:
+                    writer.submit(record)
+            assert conflicts == [('dup.jpg', 'h1')]
+            assert flushed == inserted == [('a.jpg', 'h1'), ('b.jpg', 'h2'), ('c.jpg', 'h3')]
+            assert writer.conflict_count == 1 and _count(pool) == 3
+        finally:
+            pool.close()
+
+
+def test_flush_interval_and_callback_errors():
+    """不足一批的记录在 flush_interval 后写入；回调出错不会中断写库线程"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _pool(tmp)
+        logger = logging.getLogger('test_db_writer')
+        logger.disabled = True
+
+        def failing(record):
+            raise RuntimeError('回调出错')
+
+        try:
+            with BatchedDBWriter(pool, INSERT_SQL, batch_size=100, flush_interval=0.1,
+                                 on_inserted=failing, logger=logger) as writer:
+                writer.submit(('a.jpg', 'h1'))
+                deadline = time.monotonic() + 5
+                while _count(pool) < 1 and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                assert _count(pool) == 1 and writer.is_alive()
+                writer.submit(('b.jpg', 'h2'))
+            assert _count(pool) == 2 and writer.flush_count == 2
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    test_batching()
+    test_conflict_fallback()
+    test_flush_interval_and_callback_errors()
+    print("✅ 批量写库线程测试全部通过")
@@ -0,0 +1,121 @@
+"""
+近似重复检测测试（离线运行，使用临时目录与数据库；需要 numpy 与 Pillow）
+"""
+
+import sys
+import os
+import contextlib
+import io
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+import main
+from config import REDDIT_CONFIG, WALLHAVEN_CONFIG
+from src.db_pool import get_pool
+from src.dedupe import STABLE_DUPLICATE, find_near_duplicates
+from src.phash import dhash, hamming
+
+
+def _pattern(kind, width=640, height=360):
+    y, x = np.mgrid[0:height, 0:width]
+    if kind == 'waves':
+        pixels = 128 + 60 * np.sin(x / 37.0) + 60 * np.cos(y / 23.0)
+    else:
+        pixels = np.where((x // 40 + y // 40) % 2, 220, 30) + 0.0
+    return Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).convert('RGB')
+
+
+def _source(tmp, label, images):
+    """创建一个下载源：保存目录中的图片与对应的 images 表记录"""
+    save_dir = os.path.join(tmp, label)
+    os.makedirs(save_dir)
+    for name, image, quality in images:
+        image.save(os.path.join(save_dir, name), quality=quality)
+    db_path = os.path.join(tmp, f"{label}.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE images (id INTEGER PRIMARY KEY, name TEXT NOT NULL, stable INTEGER NOT NULL DEFAULT 1)')
+    conn.executemany('INSERT INTO images (name) VALUES (?)', [(name,) for name, _, _ in images])
+    conn.commit()
+    conn.close()
+    return label, db_path, save_dir
+
+
+def _sources(tmp):
+    waves = _pattern('waves')
+    return [
+        _source(tmp, 'Reddit', [('waves_small.jpg', waves.resize((320, 180)), 60),
+                                ('checker.jpg', _pattern('checker'), 90)]),
+        _source(tmp, 'Wallhaven', [('waves_full.jpg', waves, 95)]),
+    ]
+
+
+def _stable(db_path):
+    with get_pool(db_path).connection() as conn:
+        return dict(conn.execute('SELECT name, stable FROM images').fetchall())
+
+
+def _close(sources):
+    for _, db_path, _ in sources:
+        get_pool(db_path).close()
+
+
+def test_near_duplicate_keeps_largest():
+    """缩小并重新压缩的图片与原图哈希相近；每组保留文件最大的一张，mark=True 时重复项标记为 stable=2"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = _sources(tmp)
+        try:
+            reddit_dir, wallhaven_dir = sources[0][2], sources[1][2]
+            assert hamming(dhash(os.path.join(reddit_dir, 'waves_small.jpg')),
+                           dhash(os.path.join(wallhaven_dir, 'waves_full.jpg'))) <= 6
+            assert hamming(dhash(os.path.join(reddit_dir, 'checker.jpg')),
+                           dhash(os.path.join(wallhaven_dir, 'waves_full.jpg'))) > 6
+
+            duplicates = find_near_duplicates(sources, workers=1)
+            assert [(keep[:1] + keep[2:3], [other[:1] + other[2:3] for other in others])
+                    for keep, others in duplicates] == [(('Wallhaven', 'waves_full.jpg'),
+                                                          [('Reddit', 'waves_small.jpg')])]
+            keep, (other,) = duplicates[0]
+            assert keep[3] == os.path.getsize(os.path.join(wallhaven_dir, 'waves_full.jpg')) > other[3]
+            assert _stable(sources[0][1]) == {'waves_small.jpg': 1, 'checker.jpg': 1}
+
+            assert len(find_near_duplicates(sources, workers=1, mark=True)) == 1
+            assert _stable(sources[0][1]) == {'waves_small.jpg': STABLE_DUPLICATE, 'checker.jpg': 1}
+            assert _stable(sources[1][1]) == {'waves_full.jpg': 1}
+            # 已标记的记录不再参与检测
+            assert find_near_duplicates(sources, workers=1) == []
+        finally:
+            _close(sources)
+
+
+def test_dedupe_command():
+    """python main.py dedupe --mark 检测 Reddit 与 Wallhaven 之间的重复并输出统计"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = _sources(tmp)
+        originals = [(config, dict(config)) for config in (REDDIT_CONFIG, WALLHAVEN_CONFIG)]
+        output = io.StringIO()
+        try:
+            for config, (_, db_path, save_dir) in zip((REDDIT_CONFIG, WALLHAVEN_CONFIG), sources):
+                config.update(db_path=db_path, save_dir=save_dir)
+            with contextlib.redirect_stdout(output):
+                main.cmd_dedupe(['dedupe', '--mark', '--threshold', '6'], False)
+            assert _stable(sources[0][1])['waves_small.jpg'] == STABLE_DUPLICATE
+        finally:
+            for config, original in originals:
+                config.clear()
+                config.update(original)
+            _close(sources)
+
+        text = output.getvalue()
+        assert '汉明距离 ≤ 6' in text
+        assert '保留 [Wallhaven] waves_full.jpg' in text and '重复 [Reddit] waves_small.jpg' in text
+        assert '共发现 1 组、1 张近似重复图片，已标记为 stable=2' in text
+
+
+if __name__ == "__main__":
+    test_near_duplicate_keeps_largest()
+    test_dedupe_command()
+    print("✅ 近似重复检测测试全部通过")
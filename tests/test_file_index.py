@@ -0,0 +1,114 @@
+"""
+保存目录文件索引测试（离线运行，使用临时目录与数据库）
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db_pool import SQLiteConnectionPool
+from src.file_index import MTIME_SETTLE_SECONDS, FileIndex
+
+
+def _setup(tmp):
+    save_dir = os.path.join(tmp, 'images')
+    os.makedirs(save_dir)
+    pool = SQLiteConnectionPool(os.path.join(tmp, 'images.db'))
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE images (id INTEGER PRIMARY KEY, name TEXT, stable INTEGER DEFAULT 1)')
+    return save_dir, pool, FileIndex(pool, save_dir)
+
+
+def _write(save_dir, name, data=b'data'):
+    with open(os.path.join(save_dir, name), 'wb') as f:
+        f.write(data)
+
+
+def _settle(save_dir):
+    """把目录 mtime 调到 MTIME_SETTLE_SECONDS 之前，模拟一段时间没有变化的目录"""
+    past = time.time() - MTIME_SETTLE_SECONDS - 10
+    os.utime(save_dir, (past, past))
+
+
+def _indexed(pool):
+    with pool.connection() as conn:
+        return {row[0] for row in conn.execute('SELECT name FROM file_index')}
+
+
+def test_unchanged_directory_skipped():
+    """目录 mtime 稳定且未变化时跳过扫描；有新增、删除时重新扫描"""
+    with tempfile.TemporaryDirectory() as tmp:
+        save_dir, pool, index = _setup(tmp)
+        try:
+            _write(save_dir, 'a.jpg')
+            _write(save_dir, 'b.jpg')
+            _settle(save_dir)
+            assert index.sync() == (2, 0)
+            assert index.sync() is None
+
+            os.remove(os.path.join(save_dir, 'b.jpg'))
+            _settle(save_dir)
+            assert index.sync() == (0, 1)
+            assert _indexed(pool) == {'a.jpg'}
+        finally:
+            pool.close()
+
+
+def test_recent_directory_mtime_not_trusted():
+    """目录 mtime 距扫描不足 MTIME_SETTLE_SECONDS 时不保存，下次仍会扫描，同一时间粒度内的新文件不会漏掉"""
+    with tempfile.TemporaryDirectory() as tmp:
+        save_dir, pool, index = _setup(tmp)
+        try:
+            _write(save_dir, 'a.jpg')
+            assert index.sync() == (1, 0)
+
+            # 保持目录 mtime 不变地新增文件（等同于在同一时间粒度内写入）
+            mtime_ns = os.stat(save_dir).st_mtime_ns
+            _write(save_dir, 'b.jpg')
+            os.utime(save_dir, ns=(mtime_ns, mtime_ns))
+            assert index.sync() == (1, 0)
+            assert _indexed(pool) == {'a.jpg', 'b.jpg'}
+        finally:
+            pool.close()
+
+
+def test_partial_files_not_indexed():
+    """下载中的临时文件与续传文件不进入索引"""
+    with tempfile.TemporaryDirectory() as tmp:
+        save_dir, pool, index = _setup(tmp)
+        try:
+            for name in ('a.jpg', '.download_abc123.tmp', '.download_0123abcd.part', '.download_0123abcd.part.json'):
+                _write(save_dir, name)
+            assert index.sync() == (1, 0)
+            assert _indexed(pool) == {'a.jpg'}
+        finally:
+            pool.close()
+
+
+def test_mark_missing():
+    """文件已不存在的记录一次性标记为 stable=0，其余记录不变"""
+    with tempfile.TemporaryDirectory() as tmp:
+        save_dir, pool, index = _setup(tmp)
+        try:
+            _write(save_dir, 'a.jpg')
+            _write(save_dir, 'b.jpg')
+            with pool.connection() as conn:
+                conn.executemany('INSERT INTO images (name, stable) VALUES (?, ?)',
+                                 [('a.jpg', 1), ('b.jpg', 1), ('gone.jpg', 1), ('old.jpg', 0)])
+            assert index.mark_missing() == 1
+            with pool.connection() as conn:
+                stable = dict(conn.execute('SELECT name, stable FROM images'))
+            assert stable == {'a.jpg': 1, 'b.jpg': 1, 'gone.jpg': 0, 'old.jpg': 0}
+            assert index.mark_missing() == 0
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    test_unchanged_directory_skipped()
+    test_recent_directory_mtime_not_trusted()
+    test_partial_files_not_indexed()
+    test_mark_missing()
+    print("✅ 文件索引测试全部通过")
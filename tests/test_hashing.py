@@ -0,0 +1,110 @@
+"""
+文件哈希与哈希缓存测试（离线运行，使用临时目录与数据库）
+"""
+
+import sys
+import os
+import hashlib
+import logging
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_folder_to_db as sync_module
+from config import WALLHAVEN_CONFIG
+from src.db_pool import get_pool
+from src.hashing import hash_files, md5_file
+from src.process_pool import new_process_pool, process_context
+
+IMAGES_SQL = '''
+    CREATE TABLE images (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        wallhaven_id TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        hash TEXT NOT NULL UNIQUE,
+        url TEXT NOT NULL UNIQUE,
+        source_url TEXT,
+        resolution TEXT,
+        stable INTEGER NOT NULL DEFAULT 1
+    )
+'''
+
+
+def _write(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_hash_files_in_processes():
+    """多进程计算的结果与单进程一致并保持输入顺序，读取失败的文件返回错误"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [_write(tmp, f"{i}.jpg", bytes([i]) * (i * 1000 + 1)) for i in range(6)]
+        paths.append(os.path.join(tmp, 'missing.jpg'))
+        results = list(hash_files(paths, workers=2))
+        assert [path for path, _, _ in results] == paths
+        for path, value, error in results[:-1]:
+            assert error is None and value == md5_file(path)
+        assert results[-1][1] is None and results[-1][2]
+        with open(paths[1], 'rb') as f:
+            assert results[1][1] == hashlib.md5(f.read()).hexdigest()
+
+
+def test_explicit_start_method():
+    """进程池使用 forkserver / spawn，不随平台默认的 fork"""
+    assert process_context().get_start_method() in ('forkserver', 'spawn')
+    with new_process_pool(1) as executor:
+        assert executor._mp_context.get_start_method() == process_context().get_start_method()
+
+
+def test_sync_reuses_hash_cache():
+    """再次同步时未变化的文件复用缓存的哈希，修改过的文件重新计算"""
+    with tempfile.TemporaryDirectory() as tmp:
+        save_dir = os.path.join(tmp, 'images')
+        os.makedirs(save_dir)
+        db_path = os.path.join(tmp, 'wallhaven.db')
+        pool = get_pool(db_path)
+        with pool.connection() as conn:
+            conn.execute(IMAGES_SQL)
+        _write(save_dir, 'wallhaven_aaa.jpg', b'a' * 100)
+        _write(save_dir, 'wallhaven_bbb.jpg', b'b' * 100)
+
+        hashed = []
+        original_config = dict(WALLHAVEN_CONFIG)
+        original_hash_files = sync_module.hash_files
+
+        def recording_hash_files(paths, workers=None):
+            paths = list(paths)
+            hashed.append(sorted(os.path.basename(path) for path in paths))
+            return original_hash_files(paths, 1)
+
+        WALLHAVEN_CONFIG.update(save_dir=save_dir, db_path=db_path)
+        sync_module.hash_files = recording_hash_files
+        try:
+            sync_module.sync_folder_to_db()
+            sync_module.sync_folder_to_db()
+            path = _write(save_dir, 'wallhaven_bbb.jpg', b'B' * 120)
+            os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+            sync_module.sync_folder_to_db()
+        finally:
+            WALLHAVEN_CONFIG.clear()
+            WALLHAVEN_CONFIG.update(original_config)
+            sync_module.hash_files = original_hash_files
+
+        try:
+            assert hashed == [['wallhaven_aaa.jpg', 'wallhaven_bbb.jpg'], [], ['wallhaven_bbb.jpg']]
+            with pool.connection() as conn:
+                cached = dict(conn.execute('SELECT name, hash FROM file_index'))
+                assert conn.execute('SELECT COUNT(*) FROM images').fetchone()[0] == 2
+            assert cached == {'wallhaven_aaa.jpg': hashlib.md5(b'a' * 100).hexdigest(),
+                              'wallhaven_bbb.jpg': hashlib.md5(b'B' * 120).hexdigest()}
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    test_hash_files_in_processes()
+    test_explicit_start_method()
+    test_sync_reuses_hash_cache()
+    print("✅ 文件哈希测试全部通过")
@@ -0,0 +1,126 @@
+"""
+HTTP 响应缓存测试（离线运行，请求由模拟 Session 应答）
+"""
+
+import sys
+import os
+import json
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db_pool import get_pool
+import requests
+from src.http_cache import CachedResponse, ResponseCache
+
+
+class _Response:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Session:
+    """按顺序返回预设响应，并记录每次请求带的请求头"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def _cache(tmp, **kwargs):
+    return ResponseCache(os.path.join(tmp, 'http_cache.db'), **kwargs)
+
+
+def test_ttl_expiry():
+    """TTL 内直接返回缓存，不发请求；过期后重新请求并更新缓存"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = _cache(tmp, ttls={'search': 0.2})
+        session = _Session(_Response(200, b'{"v": 1}'), _Response(200, b'{"v": 2}'))
+        try:
+            url = 'https://wallhaven.cc/api/v1/search'
+            assert cache.get(session, url, params={'page': 1}, kind='search').json() == {'v': 1}
+            cached = cache.get(session, url, params={'page': 1}, kind='search')
+            assert cached.from_cache and cached.json() == {'v': 1}
+            assert len(session.requests) == 1
+
+            time.sleep(0.3)
+            assert cache.get(session, url, params={'page': 1}, kind='search').json() == {'v': 2}
+            assert len(session.requests) == 2
+            assert cache.get(session, url, params={'page': 1}, kind='search').json() == {'v': 2}
+            assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+        finally:
+            cache.pool.close()
+
+
+def test_revalidation_with_304():
+    """过期的缓存带 If-None-Match / If-Modified-Since 重新验证，304 时返回缓存内容并刷新 TTL"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = _cache(tmp, ttls={'listing': 0.2})
+        headers = {'ETag': '"abc"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}
+        session = _Session(_Response(200, b'listing', headers), _Response(304))
+        try:
+            url = 'https://www.reddit.com/r/wallpapers/hot.json'
+            cache.get(session, url, kind='listing')
+            time.sleep(0.3)
+            response = cache.get(session, url, headers={'User-Agent': 'test'}, kind='listing')
+            assert response.from_cache and response.status_code == 200 and response.content == b'listing'
+            assert session.requests[1] == {'User-Agent': 'test', 'If-None-Match': '"abc"',
+                                           'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'}
+            assert cache.revalidated == 1
+
+            # 304 刷新了存储时间，TTL 内不再发请求
+            assert cache.get(session, url, kind='listing').content == b'listing'
+            assert len(session.requests) == 2
+        finally:
+            cache.pool.close()
+
+
+def test_cached_response_interface():
+    """缓存响应提供调用方常用的 requests.Response 接口（ok / raise_for_status / json）"""
+    response = CachedResponse(200, b'{"data": []}', url='https://api.imgur.com/3/album/x/images')
+    assert response.ok and response.json() == {'data': []}
+    response.raise_for_status()
+    try:
+        CachedResponse(404, b'').raise_for_status()
+        assert False, "4xx 应抛出 HTTPError"
+    except requests.exceptions.HTTPError:
+        pass
+
+
+def test_lru_eviction():
+    """总大小超过 max_bytes 时淘汰最久未访问的条目，最近读过的条目保留"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = _cache(tmp, max_bytes=250, ttls={'default': 60})
+        urls = [f"https://api.imgur.com/3/album/{i}/images" for i in range(3)]
+        session = _Session(*[_Response(200, bytes(100)) for _ in range(3)])
+        try:
+            cache.get(session, urls[0], kind='default')
+            cache.get(session, urls[1], kind='default')
+            time.sleep(0.01)
+            cache.get(session, urls[0], kind='default')  # 命中缓存，更新访问时间
+            time.sleep(0.01)
+            cache.get(session, urls[2], kind='default')  # 超过 250 字节，淘汰 urls[1]
+
+            with get_pool(cache.db_path).connection() as conn:
+                kept = {row[0] for row in conn.execute('SELECT url FROM http_cache')}
+            assert kept == {urls[0], urls[2]}
+            assert cache.stats()['bytes'] == 200
+        finally:
+            cache.pool.close()
+
+
+if __name__ == "__main__":
+    test_ttl_expiry()
+    test_revalidation_with_304()
+    test_cached_response_interface()
+    test_lru_eviction()
+    print("✅ HTTP 响应缓存测试全部通过")
@@ -0,0 +1,69 @@
+"""
+共享 HTTP Session 测试（离线运行，请求发往本地模拟服务器）
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import MockServer
+from config import HTTP_CONFIG, WALLHAVEN_CONFIG
+from src.http_client import build_session, close_session, get_session
+
+
+def test_shared_session():
+    """get_session 在进程内返回同一个 Session，close_session 之后重新创建"""
+    session = get_session()
+    assert get_session() is session
+    close_session()
+    assert get_session() is not session
+    close_session()
+
+
+def test_pool_sized_for_workers():
+    """连接池大小不小于各下载器的线程池大小（max_workers），显式传入时以参数为准"""
+    original = WALLHAVEN_CONFIG['max_workers']
+    WALLHAVEN_CONFIG['max_workers'] = HTTP_CONFIG['pool_maxsize'] + 8
+    try:
+        session = build_session()
+        assert session.get_adapter('https://w.wallhaven.cc')._pool_maxsize == WALLHAVEN_CONFIG['max_workers']
+        session.close()
+    finally:
+        WALLHAVEN_CONFIG['max_workers'] = original
+    session = build_session(pool_maxsize=4)
+    assert session.get_adapter('https://w.wallhaven.cc')._pool_maxsize == 4
+    session.close()
+
+
+def test_retry_on_5xx():
+    """502/503/504 自动重试；重试耗尽后返回最后一个响应而不是抛出异常"""
+    with MockServer() as server:
+        session = build_session(retries=2, backoff_factor=0)
+        try:
+            assert session.get(f"{server.base_url}/retry/flaky/2/a", timeout=5).status_code == 200
+            assert session.get(f"{server.base_url}/retry/flaky/3/b", timeout=5).status_code == 503
+            assert server.hit('/retry/flaky/3/b') == 4  # 1 次请求 + 2 次重试
+        finally:
+            session.close()
+
+
+def test_keep_alive_reuses_connection():
+    """对同一主机的连续请求复用同一个连接"""
+    with MockServer(image_size=4096) as server:
+        session = build_session(pool_maxsize=4)
+        try:
+            for i in range(5):
+                response = session.get(f"{server.base_url}/keepalive/img/reddit-{i}.jpg", timeout=5)
+                assert response.status_code == 200 and len(response.content) == 4096
+            pools = session.get_adapter(server.base_url).poolmanager.pools
+            assert [pools[key].num_connections for key in pools.keys()] == [1]
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    test_shared_session()
+    test_pool_sized_for_workers()
+    test_retry_on_5xx()
+    test_keep_alive_reuses_connection()
+    print("✅ 共享 HTTP Session 测试全部通过")
@@ -0,0 +1,68 @@
+"""
+图片文件头尺寸解析与分辨率过滤测试（离线运行，探测请求发往本地模拟服务器）
+"""
+
+import sys
+import os
+import struct
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from benchmarks.mock_server import MockServer, synthetic_jpeg
+from src.image_probe import ResolutionFilter, format_resolution, parse_dimensions, probe_dimensions
+
+
+def test_parse_dimensions():
+    """JPEG（跳过 APP / COM 段）、PNG、WebP 三种编码、GIF"""
+    jpeg = synthetic_jpeg('probe', 64 * 1024, width=3840, height=2160)
+    assert parse_dimensions(jpeg) == (3840, 2160)
+    exif = b'\xff\xe1' + struct.pack('>H', 8002) + b'\x00' * 8000
+    assert parse_dimensions(jpeg[:2] + exif + jpeg[2:]) == (3840, 2160)
+    assert parse_dimensions(jpeg[:20]) is None  # 数据不足
+
+    png = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 1080, 1920) + b'\x08\x02\x00\x00\x00'
+    assert parse_dimensions(png) == (1080, 1920)
+
+    vp8 = b'RIFF\x00\x00\x00\x00WEBPVP8 ' + b'\x00' * 4 + b'\x00\x00\x00\x9d\x01\x2a' + struct.pack('<HH', 2560, 1440)
+    assert parse_dimensions(vp8) == (2560, 1440)
+    bits = (1920 - 1) | ((1080 - 1) << 14)
+    vp8l = b'RIFF\x00\x00\x00\x00WEBPVP8L' + b'\x00' * 4 + b'\x2f' + bits.to_bytes(4, 'little')
+    assert parse_dimensions(vp8l) == (1920, 1080)
+    vp8x = b'RIFF\x00\x00\x00\x00WEBPVP8X' + b'\x00' * 8 + (3439).to_bytes(3, 'little') + (1439).to_bytes(3, 'little')
+    assert parse_dimensions(vp8x) == (3440, 1440)
+
+    assert parse_dimensions(b'GIF89a' + struct.pack('<HH', 640, 480)) == (640, 480)
+    assert parse_dimensions(b'<html>') is None
+
+
+def test_resolution_filter():
+    """最低分辨率、横竖屏与指定宽高比"""
+    rules = ResolutionFilter('1920x1080', 'landscape')
+    assert rules.active
+    assert rules.check(2560, 1440) is None
+    assert '低于' in rules.check(1280, 720)
+    assert '宽高比' in rules.check(2160, 3840)
+
+    ratios = ResolutionFilter(ratios='16x9,21x9')
+    assert ratios.check(1920, 1080) is None
+    assert ratios.check(3440, 1440) is None
+    assert ratios.check(1920, 1200) is not None
+    assert not ResolutionFilter().active
+    assert format_resolution((1920, 1080)) == '1920x1080'
+    assert format_resolution(None) == 'unknown'
+
+
+def test_probe_reads_only_header():
+    """Range 探测只传输文件开头的字节"""
+    with MockServer(image_size=2 * 1024 * 1024) as server, requests.Session() as session:
+        url = f"{server.base_url}/probe/img/reddit-1.jpg"
+        response = session.get(url, headers={'Range': 'bytes=0-1023'})
+        assert response.status_code == 206 and len(response.content) == 1024
+        assert probe_dimensions(session, url, timeout=5, max_bytes=4096) == (1920, 1080)
+
+
+if __name__ == "__main__":
+    test_parse_dimensions()
+    test_resolution_filter()
+    test_probe_reads_only_header()
+    print("✅ 图片尺寸探测测试全部通过")
@@ -0,0 +1,71 @@
+"""
+Imgur 相册解析测试（离线运行，请求发往本地模拟服务器）
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from benchmarks.mock_server import MockServer
+from config import HTTP_CONFIG
+from src import http_cache
+from src.imgur import ImgurResolver, album_id, scan_image_urls
+
+
+def test_album_id_and_scan():
+    """相册 ID 识别；页面扫描按顺序去重，忽略缩略图与读取上限之后的内容"""
+    assert album_id('https://imgur.com/a/AbC12xy') == 'AbC12xy'
+    assert album_id('https://imgur.com/gallery/anime-wallpapers-AbC12xy') == 'AbC12xy'
+    assert album_id('https://i.imgur.com/AbC12xy.jpg') is None
+
+    page = (b'<meta property="og:image" content="https://i.imgur.com/aaaaaaa.jpeg?fb">'
+            b'<img src="https://i.imgur.com/aaaaaaah.jpg"> https://i.imgur.com/bbbbbbb.png '
+            b'https://i.imgur.com/aaaaaaa.jpg')
+    chunks = [page[i:i + 10] for i in range(0, len(page), 10)]
+    assert scan_image_urls(iter(chunks)) == ['https://i.imgur.com/aaaaaaa.jpg', 'https://i.imgur.com/bbbbbbb.png']
+    assert scan_image_urls(iter(chunks), max_bytes=80) == ['https://i.imgur.com/aaaaaaa.jpg']
+    assert scan_image_urls(iter(chunks), deadline=time.monotonic() - 1) == []
+
+
+def test_resolver_page_and_api():
+    """无 client_id 时扫描相册页面，有 client_id 时使用 JSON 接口；结果按相册 ID 缓存"""
+    with MockServer() as server, requests.Session() as session:
+        expected = [image['link'] for image in server.imgur_album('pageAlb')]
+        resolver = ImgurResolver(session=session, scan_bytes=64 * 1024)
+        album_url = f"{server.base_url}/imgur.com/a/pageAlb"  # 模拟服务器的 run 段充当域名
+        assert resolver.resolve(album_url) == [(url, None) for url in expected]
+
+        server.stop()  # 缓存命中时不再发出请求
+        assert resolver.resolve(album_url.replace('/a/', '/a/title-')) == [(url, None) for url in expected]
+        assert resolver.resolve(f"{server.base_url}/imgur.com/a/otherAl") == []
+
+    # JSON 接口走磁盘响应缓存：缓存放在临时目录，新的解析器（下次运行）从缓存得到相同的图片
+    cache_config, shared_cache = HTTP_CONFIG.get('cache'), http_cache._cache
+    with tempfile.TemporaryDirectory() as tmp:
+        HTTP_CONFIG['cache'] = dict(cache_config or {}, enabled=True, db_path=os.path.join(tmp, 'http_cache.db'))
+        http_cache._cache = None
+        try:
+            with MockServer() as server, requests.Session() as session:
+                expected = [(image['link'], (image['width'], image['height']))
+                            for image in server.imgur_album('apiAlbm')]
+                api_base = f"{server.base_url}/imgur"
+                resolver = ImgurResolver(session=session, client_id='test', api_base=api_base)
+                assert resolver.resolve('https://imgur.com/a/apiAlbm') == expected
+
+                resolver = ImgurResolver(session=session, client_id='test', api_base=api_base)
+                assert resolver.resolve('https://imgur.com/a/apiAlbm') == expected
+                assert http_cache.get_response_cache().hits == 1
+                assert server.hit('/imgur/3/album/apiAlbm/images') == 1
+        finally:
+            if http_cache._cache is not None:
+                http_cache._cache.pool.close()
+            HTTP_CONFIG['cache'], http_cache._cache = cache_config, shared_cache
+
+
+if __name__ == "__main__":
+    test_album_id_and_scan()
+    test_resolver_page_and_api()
+    print("✅ Imgur 相册解析测试全部通过")
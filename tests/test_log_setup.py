@@ -0,0 +1,68 @@
+"""
+日志与进度汇总测试（离线运行）
+"""
+
+import sys
+import os
+import logging
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.log_setup import ProgressReporter
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _logger():
+    logger = logging.getLogger('test_log_setup')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = _ListHandler()
+    logger.handlers = [handler]
+    return logger, handler
+
+
+def test_progress_rate_limited():
+    """间隔内的多次更新最多输出一行，finish() 输出最终进度"""
+    logger, handler = _logger()
+    progress = ProgressReporter(logger, total=100, interval=3600)
+
+    def worker():
+        for i in range(25):
+            progress.update(i % 5 != 0)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.messages == []
+
+    progress.finish()
+    assert len(handler.messages) == 1
+    assert handler.messages[0].startswith('📊 下载进度: 100/100（成功 80，失败或跳过 20）')
+
+
+def test_progress_dynamic_total():
+    """total 为函数时按当前值输出，interval=0 时每次更新都输出"""
+    logger, handler = _logger()
+    items = ['a', 'b']
+    progress = ProgressReporter(logger, total=lambda: len(items), label='同步', interval=0)
+    progress.update()
+    items.append('c')
+    progress.update(False)
+    assert handler.messages[0].startswith('📊 同步进度: 1/2')
+    assert handler.messages[1].startswith('📊 同步进度: 2/3（成功 1，失败或跳过 1）')
+
+
+if __name__ == "__main__":
+    test_progress_rate_limited()
+    test_progress_dynamic_total()
+    print("✅ 日志进度汇总测试全部通过")
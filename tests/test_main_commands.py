@@ -0,0 +1,69 @@
+"""
+命令行子命令注册表测试（离线运行，不执行任何下载）
+"""
+
+import sys
+import os
+import contextlib
+import io
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('requests', 'aiohttp', 'bs4', 'numpy', 'PIL')
+
+
+def _run_main(argv):
+    calls = []
+    original_argv, original_commands = sys.argv, dict(main.COMMANDS)
+    for name in main.COMMANDS:
+        main.COMMANDS[name] = lambda args, use_async, name=name: calls.append((name, args, use_async))
+    sys.argv = ['main.py'] + argv
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            main.main()
+    finally:
+        sys.argv = original_argv
+        main.COMMANDS.update(original_commands)
+    return calls, output.getvalue()
+
+
+def test_import_is_lazy():
+    """导入 main 不会加载下载器模块与 requests / aiohttp 等重依赖"""
+    code = ("import sys, main; "
+            f"loaded = [m for m in sys.modules if m.startswith('src.') or m.split('.')[0] in {HEAVY_MODULES!r}]; "
+            "print(','.join(sorted(loaded)))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_dispatch():
+    """按第一个参数分发到注册的处理函数，--async 被移除并作为 use_async 传入，默认命令为 reddit"""
+    assert _run_main(['wallhaven-db', '--async']) == ([('wallhaven-db', ['wallhaven-db'], True)], '')
+    assert _run_main(['DB-ALL', '--sequential'])[0] == [('db-all', ['DB-ALL', '--sequential'], False)]
+    assert _run_main([])[0] == [('reddit', [], False)]
+
+
+def test_unknown_command_and_usage():
+    """未知命令打印使用说明并以状态码 1 退出；每个注册的命令都出现在使用说明中"""
+    try:
+        _run_main(['nope'])
+        assert False, "未知命令应退出"
+    except SystemExit as e:
+        assert e.code == 1
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        main.print_usage()
+    for name in main.COMMANDS:
+        assert f"python main.py {name} " in output.getvalue(), name
+
+
+if __name__ == "__main__":
+    test_import_is_lazy()
+    test_dispatch()
+    test_unknown_command_and_usage()
+    print("✅ 命令行子命令测试全部通过")
@@ -0,0 +1,65 @@
+"""
+紧凑成员索引测试（离线运行）
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.membership as membership
+from src.membership import DigestSet, MembershipIndex, hex_digest
+
+
+def test_digest_set_merge_keeps_order():
+    """新增条目合并进有序数组后仍可查到，且数组保持有序"""
+    original = membership.MERGE_THRESHOLD
+    membership.MERGE_THRESHOLD = 16
+    try:
+        digests = [os.urandom(16) for _ in range(100)]
+        digest_set = DigestSet()
+        for digest in digests:
+            digest_set.add(digest)
+            digest_set.add(digest)
+        assert len(digest_set) == 100
+        assert all(digest in digest_set for digest in digests)
+        assert os.urandom(16) not in digest_set
+
+        array = digest_set._array
+        chunks = [array[i:i + 16] for i in range(0, len(array), 16)]
+        assert chunks == sorted(chunks)
+    finally:
+        membership.MERGE_THRESHOLD = original
+
+
+def test_membership_index_loads_column():
+    """从数据库列加载，支持条件过滤与增量添加"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'images.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE images (url TEXT, hash TEXT, stable INTEGER)")
+        conn.executemany("INSERT INTO images VALUES (?, ?, ?)", [
+            ('https://i.redd.it/a.jpg', '0' * 32, 1),
+            ('https://i.redd.it/b.jpg', 'f' * 32, 0),
+        ])
+        conn.commit()
+        conn.close()
+
+        urls = MembershipIndex(db_path, 'url')
+        assert len(urls) == 2
+        assert 'https://i.redd.it/a.jpg' in urls
+        assert 'https://i.redd.it/c.jpg' not in urls
+        urls.add('https://i.redd.it/c.jpg')
+        assert 'https://i.redd.it/c.jpg' in urls
+
+        stable_hashes = MembershipIndex(db_path, 'hash', 'stable = 1', hex_digest)
+        assert '0' * 32 in stable_hashes
+        assert 'f' * 32 not in stable_hashes
+        membership.get_pool(db_path).close()
+
+
+if __name__ == "__main__":
+    test_digest_set_merge_keeps_order()
+    test_membership_index_loads_column()
+    print("✅ 成员索引测试全部通过")
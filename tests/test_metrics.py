@@ -0,0 +1,58 @@
+"""
+运行指标测试（离线运行）
+"""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.metrics import Histogram, RunMetrics
+from src.stream_writer import ImageStreamWriter
+
+PNG_HEADER = b'\x89PNG\r\n\x1a\n' + b'\x00' * 8
+
+
+def test_histogram_quantiles():
+    """分位数落在正确的桶内，最大值与总和准确"""
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.5] * 10:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert abs(histogram.sum - 5.45) < 1e-9
+    assert histogram.quantile(0.5) <= 0.01
+    assert 0.1 <= histogram.quantile(0.99) <= 0.5
+    assert histogram.snapshot()['max_ms'] == 500.0
+
+
+def test_record_download_and_prometheus():
+    """一次下载拆分为传输 / 校验 / 哈希 / 写盘，并能导出为文本格式"""
+    metrics = RunMetrics('test')
+    with tempfile.TemporaryDirectory() as save_dir:
+        with ImageStreamWriter(save_dir, 'image/png') as writer:
+            writer.write(PNG_HEADER + os.urandom(256 * 1024))
+            writer.commit(os.path.join(save_dir, 'a.png'))
+        metrics.record_download(writer, elapsed=1.0)
+
+    with metrics.timer('db_insert'):
+        pass
+    metrics.inc('images_downloaded')
+
+    summary = metrics.summary()
+    assert list(summary['stages']) == ['image_transfer', 'validation', 'hashing', 'disk_write', 'db_insert']
+    assert summary['busiest_stage'] == 'image_transfer'
+    assert summary['counters'] == {'bytes_downloaded': len(PNG_HEADER) + 256 * 1024, 'images_downloaded': 1}
+
+    lines = metrics.render_prometheus()
+    assert 'wallhub_stage_seconds_count{source="test",stage="hashing"} 1' in lines
+    assert 'wallhub_stage_seconds_bucket{source="test",stage="image_transfer",le="+Inf"} 1' in lines
+    assert 'wallhub_events_total{source="test",event="images_downloaded"} 1' in lines
+
+    metrics.reset()
+    assert metrics.summary()['stages'] == {}
+
+
+if __name__ == "__main__":
+    test_histogram_quantiles()
+    test_record_download_and_prometheus()
+    print("✅ 运行指标测试全部通过")
@@ -0,0 +1,45 @@
+"""
+感知哈希汉明距离索引测试（离线运行，不需要 numpy / Pillow）
+"""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.phash import HammingIndex, hamming
+
+
+def test_index_finds_near_duplicates():
+    """距离不超过阈值的哈希都能被找到，且按距离排序"""
+    rng = random.Random(42)
+    index = HammingIndex(max_distance=6)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    for i, value in enumerate(hashes):
+        index.add(value, i)
+
+    target = hashes[123]
+    query = target ^ (1 << 3) ^ (1 << 40) ^ (1 << 63)
+    results = index.search(query)
+    assert results[0] == (3, 123)
+    assert all(distance <= 6 for distance, _ in results)
+    assert [d for d, _ in results] == sorted(d for d, _ in results)
+
+
+def test_index_matches_brute_force():
+    """结果与暴力比较一致"""
+    rng = random.Random(7)
+    index = HammingIndex(max_distance=4)
+    base = rng.getrandbits(64)
+    hashes = [base ^ rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64) for _ in range(500)]
+    for i, value in enumerate(hashes):
+        index.add(value, i)
+
+    expected = sorted(i for i, value in enumerate(hashes) if hamming(base, value) <= 4)
+    assert sorted(item for _, item in index.search(base)) == expected
+
+
+if __name__ == "__main__":
+    test_index_finds_near_duplicates()
+    test_index_matches_brute_force()
+    print("✅ 感知哈希索引测试全部通过")
@@ -0,0 +1,72 @@
+"""
+令牌桶限流器测试（离线运行，不访问网络）
+"""
+
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from requests.structures import CaseInsensitiveDict
+from src.rate_limiter import TokenBucket, RateLimiter
+
+
+def test_token_bucket_burst_then_rate():
+    """突发额度用完后按速率发放令牌"""
+    bucket = TokenBucket(rate=20, burst=3)
+    for _ in range(3):
+        assert bucket.try_acquire() == 0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 1 / 20 + 0.01
+
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= wait * 0.5
+
+
+def test_retry_after_pauses_host():
+    """429 + Retry-After 暂停对应主机，其他主机不受影响"""
+    limiter = RateLimiter({'wallhaven.cc': {'rate': 100, 'burst': 5}})
+    url = 'https://wallhaven.cc/api/v1/search'
+    assert limiter.has_limit(url)
+    assert not limiter.has_limit('https://w.wallhaven.cc/full/ab/wallhaven-abc.jpg')
+
+    waited = limiter.update_from_response(url, 429, {'Retry-After': '2'})
+    assert waited == 2
+    assert limiter.bucket(url).try_acquire() > 1.5
+    assert limiter.bucket('https://i.redd.it/x.jpg').try_acquire() == 0
+
+
+def test_ratelimit_remaining_zero_drains_tokens():
+    """X-RateLimit-Remaining 为 0 时清空令牌"""
+    limiter = RateLimiter({'wallhaven.cc': {'rate': 1, 'burst': 5}})
+    url = 'https://wallhaven.cc/api/v1/search'
+    limiter.update_from_response(url, 200, {'X-RateLimit-Remaining': '0'})
+    assert limiter.bucket(url).try_acquire() > 0
+
+
+def test_reddit_float_ratelimit_headers():
+    """Reddit 的 X-Ratelimit-Remaining 为小数：'0.0' 视为用尽并暂停到重置时间，'12.5' 不影响"""
+    limiter = RateLimiter({'www.reddit.com': {'rate': 100, 'burst': 5}})
+    url = 'https://www.reddit.com/r/Animewallpaper/.json'
+    # 与 requests / aiohttp 一样，响应头名称不区分大小写
+    headers = CaseInsensitiveDict({'X-Ratelimit-Remaining': '12.5', 'X-Ratelimit-Reset': '30'})
+    assert limiter.update_from_response(url, 200, headers) is None
+    assert limiter.bucket(url).try_acquire() == 0
+
+    headers['X-Ratelimit-Remaining'] = '0.0'
+    waited = limiter.update_from_response(url, 200, headers)
+    assert waited == 30
+    assert limiter.bucket(url).try_acquire() > 25
+
+    other = 'https://wallhaven.cc/api/v1/search'
+    limiter.update_from_response(other, 200, {'X-RateLimit-Remaining': 'n/a'})
+    assert limiter.bucket(other).try_acquire() == 0
+
+
+if __name__ == "__main__":
+    test_token_bucket_burst_then_rate()
+    test_retry_after_pauses_host()
+    test_ratelimit_remaining_zero_drains_tokens()
+    test_reddit_float_ratelimit_headers()
+    print("✅ 限流器测试全部通过")
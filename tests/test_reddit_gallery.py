@@ -0,0 +1,75 @@
+"""
+Reddit 图集展开与 /api/info.json 批量解析测试（离线运行）
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from benchmarks.mock_server import MockServer
+from src.utils import extract_info_images, extract_listing_images, info_fullname
+
+GALLERY_POST = {
+    'name': 't3_abc',
+    'is_gallery': True,
+    'url': 'https://www.reddit.com/gallery/abc',
+    'gallery_data': {'items': [{'media_id': 'one'}, {'media_id': 'two'}, {'media_id': 'bad'}, {'media_id': 'three'}]},
+    'media_metadata': {
+        'one': {'status': 'valid', 'm': 'image/png', 's': {'x': 3840, 'y': 2160, 'u': '...'}},
+        'two': {'status': 'valid', 'm': 'image/webp', 's': {'x': 2560, 'y': 1440}},
+        'bad': {'status': 'failed'},
+        'three': {'status': 'valid', 'm': 'image/jpg', 's': {}},
+    },
+}
+
+
+def test_gallery_expanded_with_metadata():
+    """图集展开为全部图片，扩展名与宽高来自 media_metadata，处理失败的图片被跳过"""
+    assert extract_listing_images(GALLERY_POST) == [
+        ('https://i.redd.it/one.png', (3840, 2160)),
+        ('https://i.redd.it/two.webp', (2560, 1440)),
+        ('https://i.redd.it/three.jpg', None),
+    ]
+
+    single = {'url': 'https://i.redd.it/x.jpg',
+              'preview': {'images': [{'source': {'url': '...', 'width': 1920, 'height': 1080}}]}}
+    assert extract_listing_images(single) == [('https://i.redd.it/x.jpg', (1920, 1080))]
+
+    # 图集数据缺失、链接到图集的帖子需要通过 /api/info.json 获取
+    assert extract_listing_images({'name': 't3_a', 'is_gallery': True}) is None
+    link = {'name': 't3_b', 'url': 'https://www.reddit.com/gallery/abc'}
+    assert extract_listing_images(link) is None
+    assert info_fullname(link) == 't3_abc'
+    assert info_fullname({'id': 'c', 'crosspost_parent': 't3_orig', 'is_gallery': True}) == 't3_orig'
+    assert info_fullname({'id': 'd', 'is_gallery': True}) == 't3_d'
+
+
+def test_extract_info_images():
+    """批量接口的响应按帖子全名返回图片列表"""
+    info = {'kind': 'Listing', 'data': {'children': [
+        {'kind': 't3', 'data': GALLERY_POST},
+        {'kind': 't3', 'data': {'id': 'text', 'url': 'https://www.reddit.com/r/a/comments/text/'}},
+    ]}}
+    images = extract_info_images(info)
+    assert [url for url, _ in images['t3_abc']] == ['https://i.redd.it/one.png', 'https://i.redd.it/two.webp',
+                                                    'https://i.redd.it/three.jpg']
+    assert images['t3_text'] == []
+    assert extract_info_images({'error': 404}) == {}
+
+
+def test_info_batch_from_mock_server():
+    """一次 /api/info.json 请求返回多个帖子"""
+    with MockServer() as server, requests.Session() as session:
+        names = [f"t3_infox{i}" for i in range(100)]
+        response = session.get(f"{server.base_url}/info/api/info.json", params={'id': ','.join(names)})
+        data = response.json()
+        assert list(extract_info_images(data)) == names
+        assert data['data']['children'][7]['data']['url'] == f"{server.base_url}/info/img/reddit-infox7.jpg"
+
+
+if __name__ == "__main__":
+    test_gallery_expanded_with_metadata()
+    test_extract_info_images()
+    test_info_batch_from_mock_server()
+    print("✅ Reddit 图集展开测试全部通过")
@@ -0,0 +1,156 @@
+"""
+流式写入测试（离线运行）
+"""
+
+import sys
+import os
+import hashlib
+import json
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from benchmarks.mock_server import MockServer
+from src.stream_writer import ImageStreamWriter, InvalidImageError, ResumableImageWriter, is_partial_file, part_path_for
+
+BODY = bytes(range(256)) * 256
+IMAGES = {
+    'image/jpeg': b'\xff\xd8\xff\xe0' + BODY,
+    'image/png': b'\x89PNG\r\n\x1a\n' + BODY,
+    'image/webp': b'RIFF' + (4 + len(BODY)).to_bytes(4, 'little') + b'WEBP' + BODY,
+}
+
+
+def _stream(writer, data, chunk_size):
+    for offset in range(0, len(data), chunk_size):
+        writer.write(data[offset:offset + chunk_size])
+
+
+def test_stream_writer_formats():
+    """JPEG / PNG / WebP 逐块写入后通过校验并得到正确的 MD5，文件头恰好 12 字节时也能判断"""
+    with tempfile.TemporaryDirectory() as save_dir:
+        for content_type, data in IMAGES.items():
+            for chunk_size in (5, 12, 64 * 1024):
+                for declared in (content_type, ''):
+                    final_path = os.path.join(save_dir, f"{content_type.split('/')[1]}_{chunk_size}")
+                    with ImageStreamWriter(save_dir, declared) as writer:
+                        _stream(writer, data, chunk_size)
+                        writer.commit(final_path)
+                    assert writer.hexdigest == hashlib.md5(data).hexdigest()
+                    with open(final_path, 'rb') as f:
+                        assert f.read() == data
+        assert not [name for name in os.listdir(save_dir) if name.endswith('.tmp')]
+
+
+def test_stream_writer_rejects_non_image():
+    """非图片内容在首个数据块到达时被拒绝，退出上下文后临时文件被删除"""
+    with tempfile.TemporaryDirectory() as save_dir:
+        for declared in ('image/jpeg', ''):
+            try:
+                with ImageStreamWriter(save_dir, declared) as writer:
+                    writer.write(b'<html><body>not found</body></html>')
+                assert False, "非图片内容应被拒绝"
+            except InvalidImageError:
+                pass
+
+        # 短于文件头长度的内容在提交时校验
+        try:
+            with ImageStreamWriter(save_dir) as writer:
+                writer.write(b'RIFF')
+                writer.commit(os.path.join(save_dir, 'short.webp'))
+            assert False, "不完整的文件头应被拒绝"
+        except InvalidImageError:
+            pass
+        assert os.listdir(save_dir) == []
+
+
+def _interrupt(session, url, part_path, keep_bytes):
+    """模拟一次中断的下载：只接收前 keep_bytes 字节后保留 .part 与续传日志"""
+    writer = ResumableImageWriter(part_path, url)
+    with session.get(url, stream=True) as response:
+        writer.begin(response.status_code, response.headers, response.headers['content-type'])
+        writer.write(response.raw.read(keep_bytes))
+    writer.keep()
+    return writer
+
+
+def test_part_path_shared_by_url():
+    """续传文件按 URL 命名，与下载器无关；临时文件与续传文件都能被识别"""
+    url = 'https://w.wallhaven.cc/full/ab/wallhaven-abc123.jpg'
+    assert part_path_for('/tmp/a', url) == part_path_for('/tmp/a', url)
+    assert part_path_for('/tmp/a', url) != part_path_for('/tmp/a', url + '?v=2')
+    name = os.path.basename(part_path_for('/tmp/a', url))
+    assert is_partial_file(name) and is_partial_file(name + '.json')
+    assert is_partial_file('.download_x1y2.tmp') and not is_partial_file('0123abcd.jpg')
+
+
+def test_resume_from_journal():
+    """中断后再次下载同一 URL：按日志从已接收的字节处续传，合并后的内容与 MD5 正确"""
+    with MockServer(image_size=256 * 1024) as server, requests.Session() as session, \
+            tempfile.TemporaryDirectory() as save_dir:
+        url = f"{server.base_url}/resume/img/part-1.jpg"
+        part_path = part_path_for(save_dir, url)
+        _interrupt(session, url, part_path, 100 * 1024)
+        with open(part_path + '.json', encoding='utf-8') as f:
+            assert json.load(f)['etag'] == server.image_etag('part-1')
+
+        with ResumableImageWriter(part_path, url) as writer:
+            assert writer.resume_from == 100 * 1024
+            assert writer.request_headers() == {'Range': 'bytes=102400-', 'If-Range': server.image_etag('part-1')}
+            writer.fetch(session, url)
+            final_path = writer.commit(os.path.join(save_dir, 'part-1.jpg'))
+        body = server.image_body('part-1')
+        with open(final_path, 'rb') as f:
+            assert f.read() == body
+        assert writer.hexdigest == hashlib.md5(body).hexdigest()
+        assert os.listdir(save_dir) == ['part-1.jpg']
+
+
+def test_if_range_mismatch_restarts():
+    """文件在两次下载之间发生变化：服务器忽略 Range 返回 200，丢弃旧数据重新下载"""
+    with MockServer(image_size=256 * 1024) as server, requests.Session() as session, \
+            tempfile.TemporaryDirectory() as save_dir:
+        url = f"{server.base_url}/resume/img/part-2.jpg"
+        part_path = part_path_for(save_dir, url)
+        _interrupt(session, url, part_path, 100 * 1024)
+        server.image_version = 2
+
+        with ResumableImageWriter(part_path, url) as writer:
+            assert writer.resume_from == 100 * 1024
+            writer.fetch(session, url)
+            assert writer.resume_from == 0 and writer.etag == server.image_etag('part-2')
+            final_path = writer.commit(os.path.join(save_dir, 'part-2.jpg'))
+        with open(final_path, 'rb') as f:
+            assert f.read() == server.image_body('part-2')
+
+
+def test_range_not_satisfiable_falls_back():
+    """续传起点超出文件大小（416）时删除 .part 并完整下载"""
+    with MockServer(image_size=64 * 1024) as server, requests.Session() as session, \
+            tempfile.TemporaryDirectory() as save_dir:
+        url = f"{server.base_url}/resume/img/part-3.jpg"
+        part_path = part_path_for(save_dir, url)
+        body = server.image_body('part-3')
+        with open(part_path, 'wb') as f:
+            f.write(body + b'stale')
+        with open(part_path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'etag': server.image_etag('part-3'), 'bytes_received': len(body) + 5}, f)
+
+        with ResumableImageWriter(part_path, url) as writer:
+            assert writer.resume_from == len(body) + 5
+            writer.fetch(session, url)
+            assert writer.resume_from == 0
+            final_path = writer.commit(os.path.join(save_dir, 'part-3.jpg'))
+        with open(final_path, 'rb') as f:
+            assert f.read() == body
+        assert os.listdir(save_dir) == ['part-3.jpg']
+
+
+if __name__ == "__main__":
+    test_stream_writer_formats()
+    test_stream_writer_rejects_non_image()
+    test_part_path_shared_by_url()
+    test_resume_from_journal()
+    test_if_range_mismatch_restarts()
+    test_range_not_satisfiable_falls_back()
+    print("✅ 流式写入测试全部通过")
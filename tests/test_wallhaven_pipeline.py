@@ -0,0 +1,68 @@
+"""
+Wallhaven 搜索流水线测试（离线运行，不创建下载目录与数据库）
+"""
+
+import sys
+import os
+import logging
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.WallhavenImageDownloader import WallhavenImageDownloader
+
+
+class _NoLimit:
+    def has_limit(self, url):
+        return True  # 跳过固定间隔的 sleep
+
+
+def _downloader(events, pages):
+    """只设置 iter_unique_images 用到的属性，搜索接口由 pages 模拟"""
+    downloader = WallhavenImageDownloader.__new__(WallhavenImageDownloader)
+    downloader.logger = logging.getLogger('test_wallhaven_pipeline')
+    downloader.default_pages = 1
+    downloader.max_pages = len(pages)
+    downloader.api_url = 'https://wallhaven.cc/api/v1/search'
+    downloader.sleep_time = 0
+    downloader.rate_limiter = _NoLimit()
+    downloader.get_existing_urls = lambda: {'https://w.wallhaven.cc/full/ex/wallhaven-old.jpg'}
+    downloader.get_existing_wallhaven_ids = lambda: {'known'}
+
+    def search_wallhaven(page=1):
+        events.append(('fetch', page))
+        return {'data': [{'id': wallhaven_id, 'path': f"https://w.wallhaven.cc/full/xx/wallhaven-{wallhaven_id}.jpg"}
+                         for wallhaven_id in pages[page - 1]]}
+
+    downloader.search_wallhaven = search_wallhaven
+    return downloader
+
+
+def test_pages_are_pipelined():
+    """每页的新图片在请求下一页之前产出；已有、重复的图片被跳过；达到目标数量后不再请求"""
+    events = []
+    pages = [['a', 'known', 'b'], ['b', 'c', 'd'], ['e', 'f'], ['g']]
+    downloader = _downloader(events, pages)
+    for url, wallhaven_id, item in downloader.iter_unique_images(5):
+        assert url == item['path']
+        events.append(('yield', wallhaven_id))
+
+    assert events == [
+        ('fetch', 1), ('yield', 'a'), ('yield', 'b'),
+        ('fetch', 2), ('yield', 'c'), ('yield', 'd'),
+        ('fetch', 3), ('yield', 'e'),
+    ]
+
+
+def test_consumer_controls_paging():
+    """调用方停止迭代时不会请求后续页面"""
+    events = []
+    downloader = _downloader(events, [['a', 'b'], ['c', 'd']])
+    stream = downloader.iter_unique_images(10)
+    assert next(stream)[1] == 'a'
+    stream.close()
+    assert events == [('fetch', 1)]
+
+
+if __name__ == "__main__":
+    test_pages_are_pipelined()
+    test_consumer_controls_paging()
+    print("✅ Wallhaven 搜索流水线测试全部通过")